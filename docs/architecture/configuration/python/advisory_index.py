@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# advisory_index.py - Offline vulnerability advisory index with interval lookups
+
+import bisect
+import json
+import os
+import re
+from functools import lru_cache
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+
+ECOSYSTEMS = {'pypi': 'pypi', 'npm': 'npm'}
+
+# 區間端點的哨兵鍵：所有版本鍵都以整數開頭，因此可與兩者比較
+MIN_KEY = (-1,)
+MAX_KEY = (float('inf'),)
+
+_PEP440 = re.compile(
+    r'^v?(?:(?P<epoch>\d+)!)?(?P<release>\d+(?:\.\d+)*)'
+    r'(?:[-_.]?(?P<pre_l>a|alpha|b|beta|c|rc|pre|preview)[-_.]?(?P<pre_n>\d*))?'
+    r'(?:-(?P<post_n1>\d+)|[-_.]?(?:post|rev|r)[-_.]?(?P<post_n2>\d*))?'
+    r'(?:[-_.]?dev[-_.]?(?P<dev_n>\d*))?'
+    r'(?:\+[a-z0-9]+(?:[-_.][a-z0-9]+)*)?$', re.IGNORECASE)
+_SEMVER = re.compile(r'^v?(\d+)(?:\.(\d+))?(?:\.(\d+))?(?:-([0-9A-Za-z.-]+))?(?:\+[0-9A-Za-z.-]+)?$')
+_PRE_PHASES = {'a': 0, 'alpha': 0, 'b': 1, 'beta': 1, 'c': 2, 'rc': 2, 'pre': 2, 'preview': 2}
+_COMPARATOR = re.compile(r'^(<=|>=|==|!=|<|>|=)?\s*(\S+)$')
+_SEVERITIES = {'critical': 'critical', 'high': 'high', 'moderate': 'moderate',
+               'medium': 'moderate', 'low': 'low'}
+
+
+def normalize_name(ecosystem: str, name: str) -> str:
+    """PyPI包名按PEP 503規範化，npm包名保持原樣"""
+    if ecosystem == 'pypi':
+        return re.sub(r'[-_.]+', '-', name).lower()
+    return name
+
+
+# 漏洞庫中同一版本號大量重複出現，緩存解析結果
+@lru_cache(maxsize=1 << 16)
+def version_key(ecosystem: str, version: str) -> Optional[tuple]:
+    """把版本號轉換為可比較的元組，無法解析時返回None"""
+    version = version.strip()
+    if ecosystem == 'npm':
+        m = _SEMVER.match(version)
+        if m is None:
+            return None
+        release = tuple(int(part or 0) for part in m.group(1, 2, 3))
+        if m.group(4) is None:
+            return (0, release, (1,))
+        # 預發布版本排在正式版之前；數字標識符排在字母標識符之前
+        identifiers = tuple((0, int(p), '') if p.isdigit() else (1, 0, p)
+                            for p in m.group(4).split('.'))
+        return (0, release, (0, identifiers))
+
+    m = _PEP440.match(version)
+    if m is None:
+        return None
+    release = tuple(int(part) for part in m.group('release').split('.'))
+    while len(release) > 1 and release[-1] == 0:
+        release = release[:-1]
+    post = m.group('post_n1') or m.group('post_n2')
+    has_post = m.group('post_n1') is not None or m.group('post_n2') is not None
+    dev = m.group('dev_n')
+    has_dev = dev is not None
+    if m.group('pre_l'):
+        pre = (_PRE_PHASES[m.group('pre_l').lower()], int(m.group('pre_n') or 0))
+    elif has_dev and not has_post:
+        pre = (-1, 0)
+    else:
+        pre = (3, 0)
+    return (int(m.group('epoch') or 0), release, pre,
+            int(post or 0) if has_post else -1,
+            int(dev or 0) if has_dev else float('inf'))
+
+
+class Interval(NamedTuple):
+    """受影響的版本區間"""
+    low: tuple
+    low_inclusive: bool
+    high: tuple
+    high_inclusive: bool
+    advisory: int
+
+    def contains(self, key: tuple) -> bool:
+        if key < self.low or (key == self.low and not self.low_inclusive):
+            return False
+        return key < self.high or (key == self.high and self.high_inclusive)
+
+
+def parse_specifiers(ecosystem: str, spec: str) -> List[Tuple[tuple, bool, tuple, bool]]:
+    """解析版本範圍表達式，例如 '>=1.0,<1.2.3'、'<2.0.0 || >=3.0.0 <3.1.0'、'==1.4'
+
+    逗號或空格分隔的比較式取交集，'||' 分隔的部分取並集；'!=' 不受支持並被忽略。
+    """
+    intervals = []
+    for alternative in spec.split('||'):
+        low, low_inclusive, high, high_inclusive = MIN_KEY, True, MAX_KEY, True
+        if alternative.strip() == '*':
+            intervals.append((low, low_inclusive, high, high_inclusive))
+            continue
+        comparators = [c for c in re.split(r'[,\s]+', alternative) if c]
+        valid = True
+        # 允許運算符與版本號之間有空格，例如 '>= 1.0'
+        merged: List[str] = []
+        for comparator in comparators:
+            if merged and merged[-1] in ('<', '<=', '>', '>=', '==', '='):
+                merged[-1] += comparator
+            else:
+                merged.append(comparator)
+        for comparator in merged:
+            m = _COMPARATOR.match(comparator)
+            if m is None:
+                valid = False
+                break
+            op, key = m.group(1) or '==', version_key(ecosystem, m.group(2))
+            if key is None:
+                valid = False
+                break
+            if op in ('==', '='):
+                low, low_inclusive, high, high_inclusive = key, True, key, True
+            elif op in ('>', '>=') and (key, op == '>') > (low, not low_inclusive):
+                low, low_inclusive = key, op == '>='
+            elif op in ('<', '<=') and (key, op == '<=') < (high, high_inclusive):
+                high, high_inclusive = key, op == '<='
+        if valid and merged:
+            intervals.append((low, low_inclusive, high, high_inclusive))
+    return intervals
+
+
+class AdvisoryIndex:
+    """漏洞公告索引 - 按(生態系統, 包名)保存按下界排序的受影響版本區間"""
+
+    def __init__(self):
+        self.advisories: List[Dict] = []
+        self.skipped_records = 0
+        self._pending: Dict[Tuple[str, str], List[Interval]] = {}
+        # (生態系統, 包名) -> (下界列表, 區間列表, 上界前綴最大值)
+        self._index: Dict[Tuple[str, str], Tuple[List[tuple], List[Interval], List[tuple]]] = {}
+
+    @classmethod
+    def from_file(cls, path: str) -> 'AdvisoryIndex':
+        """從JSON數組或NDJSON文件加載公告並建立索引"""
+        index = cls()
+        for record in _iter_records(path):
+            index.add(record)
+        index.build()
+        return index
+
+    def add(self, record: Dict):
+        """添加一條公告，支持簡化格式和OSV格式"""
+        if 'affected' in record and isinstance(record['affected'], list) and \
+                record['affected'] and isinstance(record['affected'][0], dict):
+            entries = list(_osv_entries(record))
+        else:
+            entries = list(_flat_entries(record))
+        if not entries:
+            self.skipped_records += 1
+            return
+
+        advisory = len(self.advisories)
+        self.advisories.append({
+            'id': record.get('id', f'advisory-{advisory}'),
+            'severity': _severity(record),
+            'summary': record.get('summary') or (record.get('details') or '')[:200],
+            'fixed_in': record.get('fixed_in')
+        })
+        for ecosystem, name, low, low_inclusive, high, high_inclusive in entries:
+            self._pending.setdefault((ecosystem, name), []).append(
+                Interval(low, low_inclusive, high, high_inclusive, advisory))
+
+    def build(self):
+        """按下界排序區間並計算上界的前綴最大值，供二分查找使用"""
+        for key, intervals in self._pending.items():
+            if key in self._index:
+                intervals = self._index[key][1] + intervals
+            intervals.sort(key=lambda i: (i.low, not i.low_inclusive))
+            prefix_max = []
+            highest = MIN_KEY
+            for interval in intervals:
+                highest = max(highest, interval.high)
+                prefix_max.append(highest)
+            self._index[key] = ([i.low for i in intervals], intervals, prefix_max)
+        self._pending = {}
+
+    def match(self, ecosystem: str, name: str, version: str) -> List[Dict]:
+        """返回影響指定版本的公告"""
+        entry = self._index.get((ecosystem, normalize_name(ecosystem, name)))
+        key = version_key(ecosystem, version)
+        if entry is None or key is None:
+            return []
+
+        lows, intervals, prefix_max = entry
+        matched = []
+        seen = set()
+        # 只有下界不大於該版本的區間才可能包含它；向前回溯直到前綴最大上界小於該版本
+        position = bisect.bisect_right(lows, key) - 1
+        while position >= 0 and prefix_max[position] >= key:
+            interval = intervals[position]
+            if interval.contains(key) and interval.advisory not in seen:
+                seen.add(interval.advisory)
+                matched.append(self.advisories[interval.advisory])
+            position -= 1
+        return matched
+
+    def stats(self) -> Dict:
+        return {
+            'advisories': len(self.advisories),
+            'packages': len(self._index),
+            'intervals': sum(len(entry[1]) for entry in self._index.values()),
+            'skipped_records': self.skipped_records
+        }
+
+
+class Dependency(NamedTuple):
+    """依賴清單中的一個已固定版本的包"""
+    ecosystem: str
+    name: str
+    version: str
+    source: str
+
+
+def parse_requirements(path: str, seen: Optional[set] = None) -> Tuple[List[Dependency], int]:
+    """解析requirements文件中 name==version 形式的依賴，返回(依賴, 未固定版本的條目數)
+
+    seen記錄已解析的文件，跨多次調用共享時 -r 引用的文件不會重複計入。
+    """
+    seen = seen if seen is not None else set()
+    real_path = os.path.realpath(path)
+    if real_path in seen:
+        return [], 0
+    seen.add(real_path)
+
+    dependencies = []
+    unpinned = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        logical_lines = f.read().replace('\\\n', ' ').splitlines()
+    for line in logical_lines:
+        line = re.sub(r'(^|\s)#.*$', '', line).strip()
+        if not line:
+            continue
+        include = re.match(r'^(?:-r|--requirement)(?:\s*=?\s*)(\S+)$', line)
+        if include is not None:
+            nested, nested_unpinned = parse_requirements(
+                os.path.join(os.path.dirname(path), include.group(1)), seen)
+            dependencies.extend(nested)
+            unpinned += nested_unpinned
+            continue
+        if line.startswith('-'):
+            continue
+        requirement = line.split(';', 1)[0].split(' --', 1)[0].strip()
+        m = re.match(r'^([A-Za-z0-9][A-Za-z0-9._-]*)(?:\[[^\]]*\])?\s*===?\s*([^\s,]+)$', requirement)
+        if m is None:
+            unpinned += 1
+            continue
+        dependencies.append(Dependency('pypi', normalize_name('pypi', m.group(1)), m.group(2), path))
+    return dependencies, unpinned
+
+
+def parse_package_lock(path: str) -> List[Dependency]:
+    """解析package-lock.json / npm-shrinkwrap.json（lockfileVersion 1-3）"""
+    with open(path, 'r', encoding='utf-8') as f:
+        lock = json.load(f)
+
+    dependencies = []
+    packages = lock.get('packages')
+    if isinstance(packages, dict):
+        for location, info in packages.items():
+            if not location or not isinstance(info, dict) or info.get('link'):
+                continue
+            version = info.get('version')
+            if version:
+                name = info.get('name') or location.rsplit('node_modules/', 1)[-1]
+                dependencies.append(Dependency('npm', name, version, path))
+        return dependencies
+
+    stack = list((lock.get('dependencies') or {}).items())
+    while stack:
+        name, info = stack.pop()
+        if not isinstance(info, dict):
+            continue
+        if info.get('version'):
+            dependencies.append(Dependency('npm', name, info['version'], path))
+        stack.extend((info.get('dependencies') or {}).items())
+    return dependencies
+
+
+def _iter_records(path: str) -> Iterator[Dict]:
+    """逐條讀取公告：JSON數組、{"advisories": [...]} 或每行一條的NDJSON"""
+    with open(path, 'r', encoding='utf-8') as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        f.seek(0)
+        if head in ('[', '{'):
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError:
+                data = None
+            if data is not None:
+                if isinstance(data, dict):
+                    data = data.get('advisories', [data])
+                yield from (r for r in data if isinstance(r, dict))
+                return
+            f.seek(0)
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def _flat_entries(record: Dict) -> Iterator[tuple]:
+    """簡化格式：{"ecosystem", "package", "affected": ">=1.0,<1.2" 或列表}"""
+    ecosystem = ECOSYSTEMS.get(str(record.get('ecosystem', '')).lower())
+    name = record.get('package')
+    if ecosystem is None or not name:
+        return
+    specs = record.get('affected') or record.get('specs') or []
+    if isinstance(specs, str):
+        specs = [specs]
+    for spec in specs:
+        for interval in parse_specifiers(ecosystem, spec):
+            yield (ecosystem, normalize_name(ecosystem, name)) + interval
+
+
+def _osv_entries(record: Dict) -> Iterator[tuple]:
+    """OSV格式：affected[].ranges[].events 以及 affected[].versions"""
+    for affected in record['affected']:
+        package = affected.get('package') or {}
+        ecosystem = ECOSYSTEMS.get(str(package.get('ecosystem', '')).lower())
+        name = package.get('name')
+        if ecosystem is None or not name:
+            continue
+        name = normalize_name(ecosystem, name)
+
+        for version in affected.get('versions') or []:
+            key = version_key(ecosystem, version)
+            if key is not None:
+                yield ecosystem, name, key, True, key, True
+
+        for osv_range in affected.get('ranges') or []:
+            if osv_range.get('type') not in ('ECOSYSTEM', 'SEMVER'):
+                continue
+            low = None
+            for event in osv_range.get('events') or []:
+                if 'introduced' in event:
+                    low = MIN_KEY if event['introduced'] == '0' else version_key(ecosystem, event['introduced'])
+                elif low is not None and ('fixed' in event or 'last_affected' in event):
+                    high = version_key(ecosystem, event.get('fixed') or event.get('last_affected'))
+                    if high is not None:
+                        yield ecosystem, name, low, True, high, 'last_affected' in event
+                    low = None
+            if low is not None:
+                yield ecosystem, name, low, True, MAX_KEY, True
+
+
+def _severity(record: Dict) -> str:
+    severity = record.get('severity')
+    if not isinstance(severity, str):
+        severity = (record.get('database_specific') or {}).get('severity')
+    return _SEVERITIES.get(str(severity).lower(), 'unknown') if severity else 'unknown'
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# archive_validation.py - Validate configuration files inside zip/tar archives without extracting them
+
+import codecs
+import fnmatch
+import json
+import tarfile
+import zipfile
+import zlib
+from functools import partial
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+import yaml
+
+from ignore_rules import DEFAULT_IGNORE_PATTERNS, IgnoreRules
+from schema_validation import KUBERNETES_SCHEMA_FILE, load_registry
+from secret_detection import DEFAULT_ENTROPY_THRESHOLD, SecretDetector, SecretStreamScanner
+from streaming_syntax import check_json_stream, check_yaml_stream
+
+
+# 歸檔模式下查找的壓縮包
+ARCHIVE_PATTERNS = ['*.zip', '*.tar', '*.tar.gz', '*.tgz', '*.tar.bz2', '*.tbz2', '*.tar.xz', '*.txz']
+
+# 報告中壓縮包路徑與成員路徑之間的分隔符：archive.zip!/path/inside
+ARCHIVE_SEPARATOR = '!/'
+
+# 成員類別及其文件名模式，與目錄模式的各項驗證一致
+MEMBER_PATTERNS = {
+    'yaml': ['*.yml', '*.yaml'],
+    'json': ['*.json'],
+    'env': ['.env*']
+}
+
+# 任一上級目錄名在此集合中的YAML成員按Kubernetes清單檢查（壓縮包通常帶有頂層目錄）
+KUBERNETES_DIRS = {'k8s', 'kubernetes', '.kube'}
+
+_READ_SIZE = 1 << 20
+
+
+def in_kubernetes_dir(name: str) -> bool:
+    """成員是否位於Kubernetes目錄中（任一上級目錄）"""
+    return not KUBERNETES_DIRS.isdisjoint(name.split('/')[:-1])
+
+
+def member_kind(name: str) -> Optional[str]:
+    """按文件名判斷成員類別，不需要驗證的成員返回None"""
+    basename = name.rsplit('/', 1)[-1]
+    for kind, patterns in MEMBER_PATTERNS.items():
+        if any(fnmatch.fnmatch(basename, pattern) for pattern in patterns):
+            return kind
+    return None
+
+
+def iter_members(path: str) -> Iterator[Tuple[str, int, object]]:
+    """依次產出壓縮包中的常規文件成員(名稱, 解壓後大小, 二進制流)
+
+    tar以流模式順序讀取（壓縮的tar也不需要隨機訪問）；產出的流只在下一個成員之前有效。
+    """
+    if zipfile.is_zipfile(path):
+        with zipfile.ZipFile(path) as zf:
+            for info in zf.infolist():
+                if info.is_dir():
+                    continue
+                with zf.open(info) as stream:
+                    yield info.filename, info.file_size, stream
+        return
+
+    with tarfile.open(path, 'r|*') as tf:
+        for member in tf:
+            if not member.isfile():
+                continue
+            stream = tf.extractfile(member)
+            if stream is not None:
+                # 以 tar -C dir . 打包的成員帶有./前綴
+                name = member.name[2:] if member.name.startswith('./') else member.name
+                yield name, member.size, stream
+
+
+class _TeeReader:
+    """包裝成員流：解析器讀取的每一塊數據同時交給密鑰檢測，成員只解壓一次"""
+
+    def __init__(self, stream, sink=None):
+        self.stream = stream
+        self.sink = sink
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.stream.read(size)
+        if data and self.sink is not None:
+            self.sink(data)
+        return data
+
+    def drain(self):
+        """讀完解析器未消費的剩餘數據（解析出錯時提前停止）"""
+        if self.sink is not None:
+            while self.read(_READ_SIZE):
+                pass
+
+
+def member_results() -> Dict:
+    """check_members填寫的結果結構"""
+    return {
+        'members_checked': {kind: 0 for kind in MEMBER_PATTERNS},
+        'bytes': 0,
+        'kubernetes': {'valid': 0, 'invalid': 0, 'unknown_kinds': {}},
+        'errors': [],
+        'warnings': [],
+        'issues': [],
+        'findings': []
+    }
+
+
+def validate_archive(path: str, loader: type = yaml.SafeLoader, syntax_only: bool = False,
+                     stream_threshold: int = 64 * 1024 * 1024, secret_scan: bool = True,
+                     entropy_threshold: float = DEFAULT_ENTROPY_THRESHOLD) -> Dict:
+    """流式驗證單個壓縮包中的YAML/JSON/.env成員（可在工作進程中執行）
+
+    結果只記錄成員名（按內容緩存，與壓縮包路徑無關），壓縮包本身的錯誤member為None。
+    """
+    results = member_results()
+    try:
+        check_members(iter_members(path), results, loader=loader, syntax_only=syntax_only,
+                      stream_threshold=stream_threshold, secret_scan=secret_scan,
+                      entropy_threshold=entropy_threshold,
+                      ignore=IgnoreRules(defaults=DEFAULT_IGNORE_PATTERNS))
+    except (OSError, EOFError, zlib.error, zipfile.BadZipFile, tarfile.TarError) as e:
+        # 無法打開或tar流損壞：已檢查的成員結果保留
+        results['errors'].append({'member': None, 'check': 'archive', 'error': str(e)})
+    return results
+
+
+def check_members(members: Iterable[Tuple[str, int, object]], results: Dict,
+                  loader: type = yaml.SafeLoader, syntax_only: bool = False,
+                  stream_threshold: int = 64 * 1024 * 1024, secret_scan: bool = True,
+                  entropy_threshold: float = DEFAULT_ENTROPY_THRESHOLD,
+                  ignore: Optional[IgnoreRules] = None,
+                  is_kubernetes: Callable[[str], bool] = in_kubernetes_dir, compose: bool = False):
+    """流式驗證(名稱, 大小, 二進制流)形式的成員，結果寫入results（member_results的結構）
+
+    成員不落盤：流直接交給解析器，同時經_TeeReader做密鑰檢測。
+    超過stream_threshold的成員（或syntax_only時）只做流式語法檢查，內存與成員大小無關。
+    compose為True時，文件名符合Compose命名的YAML成員同時做Compose檢查。
+    """
+    # 延遲導入，避免與config_validator循環導入
+    from config_validator import (COMPOSE_FILE_PATTERN, check_compose_documents, check_env_lines,
+                                  format_yaml_error, kubernetes_manifest_errors)
+
+    detector = SecretDetector(entropy_threshold) if secret_scan else None
+    check_manifest = partial(kubernetes_manifest_errors, schemas=load_registry(KUBERNETES_SCHEMA_FILE),
+                             unknown_kinds=results['kubernetes']['unknown_kinds'])
+
+    for name, size, stream in members:
+        kind = member_kind(name)
+        if kind is None or (ignore is not None and ignore.is_ignored(name)):
+            continue
+        results['members_checked'][kind] += 1
+        results['bytes'] += size
+
+        scanner = SecretStreamScanner(detector, kind == 'env') if detector is not None else None
+        reader = _TeeReader(stream, scanner.feed if scanner is not None else None)
+        streaming = syntax_only or size >= stream_threshold
+
+        try:
+            if kind == 'json':
+                error = check_json_stream(reader) if streaming else _check_json_member(reader)
+                if error is not None:
+                    results['errors'].append({'member': name, 'check': 'json', 'error': error})
+
+            elif kind == 'yaml':
+                text = codecs.getreader('utf-8')(reader)
+                kubernetes = is_kubernetes(name)
+                is_compose = compose and COMPOSE_FILE_PATTERN.match(name.rsplit('/', 1)[-1]) is not None
+                if streaming and not (kubernetes or is_compose):
+                    error = check_yaml_stream(text, loader)
+                    if error is not None:
+                        results['errors'].append({'member': name, 'check': 'yaml', 'error': error})
+                else:
+                    # 逐個文檔加載，內存只保留當前文檔（Compose文件需要保留全部文檔）
+                    documents = [] if is_compose else None
+                    try:
+                        for manifest in yaml.load_all(text, Loader=loader):
+                            if documents is not None:
+                                documents.append(manifest)
+                            if kubernetes and manifest:
+                                _record_manifest(results, name, check_manifest, manifest)
+                    except (yaml.YAMLError, UnicodeDecodeError) as e:
+                        error = format_yaml_error(e)
+                        results['errors'].append({'member': name, 'check': 'yaml', 'error': error})
+                        if kubernetes:
+                            results['errors'].append({'member': name, 'check': 'kubernetes',
+                                                      'error': error})
+                            results['kubernetes']['invalid'] += 1
+                        if is_compose:
+                            results['errors'].append({'member': name, 'check': 'docker_compose',
+                                                      'error': error})
+                            documents = None
+                    if documents is not None:
+                        checked = check_compose_documents(documents)
+                        for key in ('errors', 'warnings'):
+                            results[key].extend({'member': name, 'check': 'docker_compose', **item}
+                                                for item in checked[key])
+
+            else:
+                lines = codecs.getreader('utf-8')(reader, errors='replace').read().splitlines()
+                results['issues'].extend({'member': name, **issue}
+                                         for issue in check_env_lines(lines)['issues'])
+
+            reader.drain()
+        except (zipfile.BadZipFile, zlib.error) as e:
+            # zip成員相互獨立，單個成員損壞（如CRC錯誤）不影響其餘成員
+            results['errors'].append({'member': name, 'check': kind, 'error': str(e)})
+
+        if scanner is not None:
+            results['findings'].extend({'member': name, **finding} for finding in scanner.close())
+
+
+def _record_manifest(results: Dict, name: str, check, manifest):
+    """記錄單個Kubernetes清單的檢查結果（check返回錯誤列表）"""
+    try:
+        errors = check(manifest)
+    except Exception as e:
+        # 非映射類型的文檔
+        errors = [str(e)]
+    for error in errors:
+        results['errors'].append({'member': name, 'check': 'kubernetes', 'error': error})
+    if errors:
+        results['kubernetes']['invalid'] += 1
+    else:
+        results['kubernetes']['valid'] += 1
+
+
+def _check_json_member(reader: _TeeReader) -> Optional[str]:
+    """完整加載JSON成員，錯誤信息與目錄模式一致"""
+    try:
+        json.loads(reader.read().decode('utf-8'))
+        return None
+    except (json.JSONDecodeError, UnicodeDecodeError) as e:
+        return str(e)
@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+# batch_runner.py - Validate and scan many projects on one shared worker pool
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from datetime import datetime
+from functools import partial
+from typing import Dict, List, Optional
+
+from archive_validation import ARCHIVE_PATTERNS
+from config_validator import ConfigValidator
+from file_inventory import DEFAULT_PATTERNS, FileInventory
+from ignore_rules import IgnoreRules
+from security_scanner import BANDIT_INCLUDES, SecurityScanner
+
+
+# 驗證器和Bandit共用一次遍歷：登記兩者需要的全部模式
+BATCH_PATTERNS = list(dict.fromkeys(DEFAULT_PATTERNS + BANDIT_INCLUDES))
+
+# 每個任務塊最多包含的文件數；塊越小，大項目和小項目之間的輪轉越細
+MAX_CHUNK_ITEMS = 32
+
+DEFAULT_INDEX_FILE = os.path.join('reports', 'batch', 'batch-index.json')
+
+
+def read_manifest(path: str) -> List[str]:
+    """讀取項目清單：每行一個項目根目錄，忽略空行和#註釋，相對路徑相對於清單文件所在目錄"""
+    base = os.path.dirname(os.path.abspath(path))
+    roots = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line:
+                roots.append(os.path.normpath(os.path.join(base, line)))
+    return roots
+
+
+def _run_chunk(func, items: List) -> List:
+    """在工作進程中依次處理一個任務塊"""
+    return [func(item) for item in items]
+
+
+class _Lane:
+    """單個項目的任務通道，提供與Executor.map相同的接口，供ConfigValidator._map使用"""
+
+    def __init__(self, scheduler: 'FairScheduler', name: str):
+        self.scheduler = scheduler
+        self.name = name
+        self.chunks = 0
+        self.items = 0
+        # 任務塊從入隊到提交給進程池的累計等待時間
+        self.queue_wait = 0.0
+
+    def map(self, func, items, chunksize: int = 1):
+        """把items切成任務塊排入本通道，按順序產出結果"""
+        items = list(items)
+        size = max(1, min(chunksize, MAX_CHUNK_ITEMS))
+        futures = [self.scheduler.enqueue(self, func, items[i:i + size])
+                   for i in range(0, len(items), size)]
+        return (result for future in futures for result in future.result())
+
+    def stats(self) -> Dict:
+        return {'chunks': self.chunks, 'items': self.items, 'queue_wait_s': round(self.queue_wait, 3)}
+
+
+class FairScheduler:
+    """共享進程池上的公平調度
+
+    每個項目一個通道，任務塊按通道輪轉提交，同時在進程池中的任務塊不超過max_in_flight；
+    大項目一次提交的大量任務只在自己的通道中排隊，不會讓其他項目的任務等在其後。
+    提交由專門的分派線程完成，進程池的回調中不再提交新任務。
+    """
+
+    def __init__(self, executor, max_in_flight: int):
+        self.executor = executor
+        self.max_in_flight = max(1, max_in_flight)
+        self.dispatched = 0
+        self._cond = threading.Condition()
+        self._queues: Dict[_Lane, deque] = {}
+        # 有待提交任務塊的通道，按輪轉順序
+        self._ring: deque = deque()
+        self._in_flight = 0
+        self._closed = False
+        self._thread = threading.Thread(target=self._dispatch, name='batch-dispatch', daemon=True)
+        self._thread.start()
+
+    def lane(self, name: str) -> _Lane:
+        return _Lane(self, name)
+
+    def enqueue(self, lane: _Lane, func, items: List) -> Future:
+        future = Future()
+        with self._cond:
+            queue = self._queues.setdefault(lane, deque())
+            if not queue:
+                self._ring.append(lane)
+            queue.append((func, items, future, time.monotonic()))
+            self._cond.notify()
+        return future
+
+    def close(self):
+        """等待已排隊的任務塊全部提交後停止分派線程"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _dispatch(self):
+        while True:
+            with self._cond:
+                while self._in_flight >= self.max_in_flight or not self._ring:
+                    if self._closed and not self._ring:
+                        return
+                    self._cond.wait()
+                lane = self._ring.popleft()
+                queue = self._queues[lane]
+                func, items, future, queued = queue.popleft()
+                if queue:
+                    self._ring.append(lane)
+                else:
+                    del self._queues[lane]
+                lane.chunks += 1
+                lane.items += len(items)
+                lane.queue_wait += time.monotonic() - queued
+                self._in_flight += 1
+                self.dispatched += 1
+
+            try:
+                submitted = self.executor.submit(_run_chunk, func, items)
+            except Exception as e:
+                # 進程池已損壞或已關閉
+                self._finish(future, None, e)
+                continue
+            submitted.add_done_callback(partial(self._collect, future))
+
+    def _collect(self, future: Future, submitted: Future):
+        if submitted.cancelled():
+            self._finish(future, None, None, cancelled=True)
+        else:
+            self._finish(future, submitted.result() if submitted.exception() is None else None,
+                         submitted.exception())
+
+    def _finish(self, future: Future, result, error: Optional[BaseException], cancelled: bool = False):
+        with self._cond:
+            self._in_flight -= 1
+            self._cond.notify()
+        if cancelled:
+            future.cancel()
+        elif error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+
+class BatchRunner:
+    """批量驗證多個項目
+
+    所有項目共用一個進程池（解釋器只啟動一次）；每個項目在協調線程中遍歷一次目錄樹，
+    驗證器和安全掃描器共用這份清單，解析任務經FairScheduler按項目輪轉分派。
+    各項目的報告照常寫入其 reports/ 目錄，另外生成一份匯總索引。
+    """
+
+    def __init__(self, projects: List[str], jobs: int = 0, max_active: Optional[int] = None,
+                 security: bool = False, index_file: str = DEFAULT_INDEX_FILE,
+                 validator_options: Optional[Dict] = None, scanner_options: Optional[Dict] = None):
+        # 同一項目只處理一次（按真實路徑判斷）
+        self.projects = list({os.path.realpath(p): p for p in reversed(projects)}.values())[::-1]
+        # jobs <= 0 表示使用全部CPU核心
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        # 同時處理的項目數；每個活動項目佔用一個通道和各自的解析緩存
+        self.max_active = max(1, max_active or self.jobs * 2)
+        self.security = security
+        self.index_file = index_file
+        self.validator_options = validator_options or {}
+        self.scanner_options = scanner_options or {}
+        # 安全掃描的外部工具不在進程池中運行，同時掃描的項目數不超過jobs
+        self._security_slots = threading.Semaphore(self.jobs)
+        self._scheduler: Optional[FairScheduler] = None
+
+    def run(self) -> Dict:
+        """處理所有項目，寫出匯總索引並返回"""
+        started = time.monotonic()
+        print(f"📚 Processing {len(self.projects)} projects with {self.jobs} workers "
+              f"({self.max_active} projects at a time)...")
+
+        executor = None
+        if self.jobs > 1:
+            executor = ProcessPoolExecutor(max_workers=self.jobs)
+            # fork方式的進程池在首次提交時創建全部工作進程：在啟動協調線程之前完成
+            executor.submit(os.getpid).result()
+            # 進程池內部的隊列按提交順序執行，只讓每個工作進程各有一個任務塊，其餘留在通道中輪轉
+            self._scheduler = FairScheduler(executor, max_in_flight=self.jobs)
+
+        entries: Dict[str, Dict] = {}
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_active, thread_name_prefix='project') as threads:
+                futures = {threads.submit(self._run_project, root): root for root in self.projects}
+                for future in as_completed(futures):
+                    entry = future.result()
+                    entries[futures[future]] = entry
+                    self._print_entry(len(entries), entry)
+        finally:
+            if self._scheduler is not None:
+                self._scheduler.close()
+            if executor is not None:
+                executor.shutdown()
+
+        projects = [entries[root] for root in self.projects]
+        index = {
+            'timestamp': datetime.now().isoformat(),
+            'workers': self.jobs,
+            'max_active': self.max_active,
+            'duration_s': round(time.monotonic() - started, 3),
+            'summary': self._summarize(projects),
+            'projects': projects
+        }
+        os.makedirs(os.path.dirname(os.path.abspath(self.index_file)), exist_ok=True)
+        with open(self.index_file, 'w') as f:
+            json.dump(index, f, indent=2, ensure_ascii=False)
+
+        print(f"\n✅ Batch completed in {index['duration_s']}s. Index saved to {self.index_file}")
+        return index
+
+    def _run_project(self, root: str) -> Dict:
+        """驗證（和掃描）單個項目；異常只記錄在該項目的條目中，不影響其他項目"""
+        started = time.monotonic()
+        entry = {'project': os.path.abspath(root), 'status': 'error'}
+        lane = self._scheduler.lane(root) if self._scheduler is not None else None
+        try:
+            if not os.path.isdir(root):
+                raise NotADirectoryError(f'Not a directory: {root}')
+            ignore = IgnoreRules.for_project(root)
+            patterns = BATCH_PATTERNS + ARCHIVE_PATTERNS if self.validator_options.get('archives') else BATCH_PATTERNS
+            inventory = FileInventory(root, patterns=patterns, ignore=ignore).scan()
+            entry['files'] = len(inventory.entries)
+
+            # 階段計時依賴進程級的RSS高水位，多個項目並行時沒有意義，批量模式下關閉
+            validator = ConfigValidator(root, inventory=inventory, jobs=self.jobs, ignore=ignore,
+                                        instrument=False, executor=lane, **self.validator_options)
+            try:
+                results = validator.collect_results(verbose=False)
+            finally:
+                validator.close()
+            entry['config'] = {'summary': results['summary'], 'report': validator.write_report(results)}
+            passed = results['summary']['passed']
+
+            if self.security:
+                with self._security_slots:
+                    scanner = SecurityScanner(root, inventory=inventory, ignore=ignore, instrument=False,
+                                              **self.scanner_options)
+                    scan = scanner.run_all_scans(verbose=False)
+                entry['security'] = {'summary': scan['summary'],
+                                     'report': os.path.join(scanner.reports_dir, 'security-summary.json')}
+                passed = passed and scan['summary']['passed']
+
+            entry['status'] = 'passed' if passed else 'failed'
+        except Exception as e:
+            entry['error'] = f'{type(e).__name__}: {e}'
+
+        if lane is not None:
+            entry['scheduler'] = lane.stats()
+        entry['duration_s'] = round(time.monotonic() - started, 3)
+        return entry
+
+    def _print_entry(self, done: int, entry: Dict):
+        prefix = f"[{done}/{len(self.projects)}] {entry['project']}"
+        if entry['status'] == 'error':
+            print(f"  💥 {prefix}: {entry['error']}")
+            return
+        summary = entry['config']['summary']
+        line = f"{summary['total_errors']} errors, {summary['total_warnings']} warnings"
+        if 'security' in entry:
+            line += f", {entry['security']['summary']['total_issues']} security issues"
+        status = '✅' if entry['status'] == 'passed' else '❌'
+        print(f"  {status} {prefix}: {line} ({entry['duration_s']}s)")
+
+    @staticmethod
+    def _summarize(projects: List[Dict]) -> Dict:
+        """匯總所有項目的結果"""
+        summary = {
+            'projects': len(projects),
+            'passed': 0,
+            'failed': 0,
+            'errors': 0,
+            'total_errors': 0,
+            'total_warnings': 0,
+            'security_issues': 0,
+            'critical': 0,
+            'high': 0
+        }
+        for entry in projects:
+            summary[{'passed': 'passed', 'failed': 'failed', 'error': 'errors'}[entry['status']]] += 1
+            if 'config' in entry:
+                summary['total_errors'] += entry['config']['summary']['total_errors']
+                summary['total_warnings'] += entry['config']['summary']['total_warnings']
+            if 'security' in entry:
+                summary['security_issues'] += entry['security']['summary']['total_issues']
+                summary['critical'] += entry['security']['summary']['critical']
+                summary['high'] += entry['security']['summary']['high']
+        summary['all_passed'] = summary['passed'] == len(projects)
+        return summary
+
+
+if __name__ == "__main__":
+    import sys
+    import argparse
+
+    from config_validator import YAML_BACKENDS
+    from security_scanner import DEFAULT_TOOL_TIMEOUT
+
+    parser = argparse.ArgumentParser(description='Validate (and optionally security-scan) many projects '
+                                                 'on one shared worker pool')
+    parser.add_argument('projects', nargs='*', help='Project root directories')
+    parser.add_argument('--manifest', help='File listing project roots, one per line (# comments allowed)')
+    parser.add_argument('--jobs', '-j', type=int, default=0,
+                        help='Worker processes shared by all projects (0 = all CPU cores)')
+    parser.add_argument('--max-active', type=int,
+                        help='Projects processed at the same time (default: 2 x jobs)')
+    parser.add_argument('--index', default=DEFAULT_INDEX_FILE,
+                        help='Aggregated index report path')
+    parser.add_argument('--security', action='store_true',
+                        help='Also run security_scanner.py checks for every project')
+    parser.add_argument('--advisory-db',
+                        help='Offline advisory dump for the security scan (see security_scanner.py --advisory-db)')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TOOL_TIMEOUT,
+                        help='Per-tool timeout in seconds for the security scan (0 = no timeout)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Revalidate every file instead of reusing each project\'s validation cache')
+    parser.add_argument('--yaml-backend', choices=YAML_BACKENDS, default='auto')
+    parser.add_argument('--syntax-only', action='store_true',
+                        help='Check YAML/JSON syntax with streaming parsers instead of loading documents')
+    parser.add_argument('--no-secret-scan', action='store_true',
+                        help='Skip secret detection in YAML/JSON/.env files')
+    parser.add_argument('--archives', action='store_true',
+                        help='Also validate configuration files inside zip and tar archives')
+    args = parser.parse_args()
+
+    projects = list(args.projects)
+    if args.manifest:
+        projects.extend(read_manifest(args.manifest))
+    if not projects:
+        parser.error('no projects given (pass project roots or --manifest)')
+
+    runner = BatchRunner(projects, jobs=args.jobs, max_active=args.max_active, security=args.security,
+                         index_file=args.index,
+                         validator_options={'use_cache': not args.no_cache,
+                                            'yaml_backend': args.yaml_backend,
+                                            'syntax_only': args.syntax_only,
+                                            'secret_scan': not args.no_secret_scan,
+                                            'archives': args.archives},
+                         scanner_options={'advisory_db': args.advisory_db,
+                                          'tool_timeout': args.timeout or None})
+    index = runner.run()
+
+    summary = index['summary']
+    print("\n" + "="*60)
+    print("Batch Summary")
+    print("="*60)
+    print(f"Projects: {summary['projects']} ({summary['passed']} passed, {summary['failed']} failed, "
+          f"{summary['errors']} errors)")
+    print(f"Total Errors: {summary['total_errors']}")
+    print(f"Total Warnings: {summary['total_warnings']}")
+    if args.security:
+        print(f"Security Issues: {summary['security_issues']} "
+              f"(critical {summary['critical']}, high {summary['high']})")
+    print(f"Status: {'✅ PASSED' if summary['all_passed'] else '❌ FAILED'}")
+
+    sys.exit(0 if summary['all_passed'] else 1)
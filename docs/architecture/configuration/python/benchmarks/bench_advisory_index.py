@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# bench_advisory_index.py - Benchmark the offline advisory index against a linear scan
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from advisory_index import AdvisoryIndex, normalize_name, version_key  # noqa: E402
+
+
+def generate_advisories(path: str, count: int, packages: int, seed: int):
+    """生成NDJSON漏洞庫，包名和版本區間隨機分佈"""
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(count):
+            ecosystem = 'npm' if i % 2 else 'PyPI'
+            package = f'package-{rng.randrange(packages)}'
+            major = rng.randrange(10)
+            minor = rng.randrange(20)
+            if ecosystem == 'npm':
+                affected = f'>={major}.{minor}.0 <{major}.{minor}.{rng.randrange(1, 30)}'
+            else:
+                affected = f'>={major}.{minor},<{major}.{minor}.{rng.randrange(1, 30)}'
+            record = {
+                'id': f'ADV-{i:06d}',
+                'ecosystem': ecosystem,
+                'package': package,
+                'affected': affected,
+                'severity': rng.choice(['low', 'moderate', 'high', 'critical'])
+            }
+            f.write(json.dumps(record) + '\n')
+
+
+def generate_dependencies(count: int, packages: int, seed: int):
+    rng = random.Random(seed + 1)
+    return [('npm' if i % 2 else 'pypi', f'package-{rng.randrange(packages)}',
+             f'{rng.randrange(10)}.{rng.randrange(20)}.{rng.randrange(30)}')
+            for i in range(count)]
+
+
+def linear_match(records, ecosystem: str, name: str, version: str):
+    """基線：逐條檢查所有公告的區間"""
+    key = version_key(ecosystem, version)
+    return [advisory for record_ecosystem, record_name, interval, advisory in records
+            if record_ecosystem == ecosystem and record_name == name and interval.contains(key)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline advisory index benchmark')
+    parser.add_argument('--advisories', type=int, default=120000)
+    parser.add_argument('--packages', type=int, default=20000)
+    parser.add_argument('--dependencies', type=int, default=5000)
+    parser.add_argument('--linear-sample', type=int, default=200,
+                        help='Number of lookups timed with the linear-scan baseline')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'advisories.ndjson')
+        generate_advisories(path, args.advisories, args.packages, args.seed)
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        print(f"Advisory DB: {args.advisories} advisories ({size_mb:.1f} MB NDJSON)")
+
+        start = time.perf_counter()
+        index = AdvisoryIndex.from_file(path)
+        load_time = time.perf_counter() - start
+        print(f"  load+index  {load_time:8.3f}s  {index.stats()}")
+
+        dependencies = generate_dependencies(args.dependencies, args.packages, args.seed)
+        start = time.perf_counter()
+        indexed_hits = sum(len(index.match(*dep)) for dep in dependencies)
+        match_time = time.perf_counter() - start
+        per_lookup = match_time / len(dependencies)
+        print(f"  indexed     {match_time:8.3f}s  {len(dependencies)} lookups, "
+              f"{per_lookup * 1e6:8.1f} us/lookup, {indexed_hits} matches")
+
+        # 線性掃描基線：展開為 (生態系統, 包名, 區間, 公告) 列表
+        records = []
+        for (ecosystem, name), (_, intervals, _) in index._index.items():
+            for interval in intervals:
+                records.append((ecosystem, name, interval, interval.advisory))
+        sample = dependencies[:args.linear_sample]
+        start = time.perf_counter()
+        expected = [linear_match(records, ecosystem, normalize_name(ecosystem, name), version)
+                    for ecosystem, name, version in sample]
+        linear_per_lookup = (time.perf_counter() - start) / len(sample)
+
+        for dep, advisories in zip(sample, expected):
+            actual = sorted(a['id'] for a in index.match(*dep))
+            if actual != sorted(index.advisories[i]['id'] for i in advisories):
+                raise RuntimeError(f'Mismatch for {dep}')
+        print(f"  linear      {linear_per_lookup * 1e6:8.1f} us/lookup ({len(sample)} sampled lookups)")
+        print(f"  speedup     {linear_per_lookup / per_lookup:.0f}x per lookup")
+
+
+if __name__ == "__main__":
+    main()
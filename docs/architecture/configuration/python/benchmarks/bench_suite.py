@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# bench_suite.py - Time ConfigValidator/SecurityScanner phases on a synthetic tree and compare with a baseline
+
+import argparse
+import contextlib
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config_validator import SECRET_SCAN_PATTERNS, ConfigValidator, select_yaml_loader  # noqa: E402
+from file_inventory import FileInventory  # noqa: E402
+from security_scanner import SecurityScanner  # noqa: E402
+from synthetic_tree import PRESETS, generate_tree  # noqa: E402
+
+
+VALIDATOR_CASES = [
+    'find_files',
+    'validate_yaml_files',
+    'validate_json_files',
+    'validate_docker_compose',
+    'validate_kubernetes_manifests',
+    'validate_env_files',
+    'validate_secrets',
+    'run_all_validations',
+]
+SCANNER_CASES = ['bandit_targets']
+OPTIONAL_CASES = ['run_bandit_scan']
+
+COMPOSE_FILES = ['docker-compose.yml', 'docker-compose.yaml', 'docker-compose.override.yml']
+
+
+def _case_files(validator: ConfigValidator, case: str) -> Optional[List[str]]:
+    """各測試項實際讀取的文件，用於計算吞吐量"""
+    if case == 'validate_yaml_files':
+        return validator._find_files(['*.yml', '*.yaml'])
+    if case == 'validate_json_files':
+        return validator._find_files(['*.json'])
+    if case == 'validate_docker_compose':
+        inventory = validator.get_inventory()
+        return [p for p in (os.path.join(validator.project_path, f) for f in COMPOSE_FILES)
+                if inventory.get(p) is not None]
+    if case == 'validate_kubernetes_manifests':
+        return validator._find_files(['*.yaml', '*.yml'], directories=['k8s', 'kubernetes', '.kube'])
+    if case == 'validate_env_files':
+        return validator._find_files(['.env*'])
+    if case == 'validate_secrets':
+        reports_root = os.path.join(validator.project_path, 'reports') + os.sep
+        return [f for f in dict.fromkeys(validator._find_files(SECRET_SCAN_PATTERNS))
+                if not f.startswith(reports_root)]
+    if case == 'run_all_validations':
+        files = set()
+        for name in VALIDATOR_CASES[1:-1]:
+            files.update(_case_files(validator, name))
+        return sorted(files)
+    return None
+
+
+def _cpu_time() -> float:
+    """本進程及已結束子進程（工作進程、Bandit）的CPU時間之和"""
+    total = 0.0
+    for who in (resource.RUSAGE_SELF, resource.RUSAGE_CHILDREN):
+        usage = resource.getrusage(who)
+        total += usage.ru_utime + usage.ru_stime
+    return total
+
+
+def run_case(case: str, root: str, jobs: int, yaml_backend: str) -> Dict:
+    """在當前進程中執行單個測試項（由子進程調用，保證峰值RSS和緩存互不影響）"""
+    files = None
+    total_bytes = None
+    inventory = None
+
+    if case in VALIDATOR_CASES:
+        # 除了 find_files 和 run_all_validations，其餘測試項不計入目錄遍歷時間
+        if case not in ('find_files', 'run_all_validations'):
+            inventory = FileInventory(root).scan()
+        validator = ConfigValidator(root, inventory=inventory, jobs=jobs, use_cache=False,
+                                    yaml_backend=yaml_backend)
+        if inventory is not None:
+            files = _case_files(validator, case)
+            total_bytes = sum(inventory.get(f).size for f in files)
+        if case == 'find_files':
+            target = lambda: [validator._find_files(p) for p in
+                              (['*.yml', '*.yaml'], ['*.json'], ['.env*'])]
+        else:
+            target = getattr(validator, case)
+    else:
+        scanner = SecurityScanner(root)
+        if case == 'bandit_targets':
+            target = scanner._bandit_targets
+        else:
+            target = scanner.run_bandit_scan
+            targets = scanner._bandit_targets()
+            files = [path for path, _ in targets]
+            total_bytes = sum(size for _, size in targets)
+
+    start = time.perf_counter()
+    cpu_start = _cpu_time()
+    with contextlib.redirect_stdout(sys.stderr):
+        result = target()
+    wall_time = time.perf_counter() - start
+    cpu_time = _cpu_time() - cpu_start
+
+    if case == 'find_files':
+        files = sorted(set(f for found in result for f in found))
+    elif case == 'bandit_targets':
+        files = [path for path, _ in result]
+    elif case == 'run_all_validations':
+        inventory = validator.get_inventory()
+        files = _case_files(validator, case)
+        total_bytes = sum(inventory.get(f).size for f in files)
+    if case in VALIDATOR_CASES:
+        validator.close()
+
+    usage_self = resource.getrusage(resource.RUSAGE_SELF)
+    usage_children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    # Linux上ru_maxrss以KB為單位；並行模式下工作進程的峰值也計入
+    peak_rss_kb = max(usage_self.ru_maxrss, usage_children.ru_maxrss)
+    if sys.platform == 'darwin':
+        peak_rss_kb /= 1024
+
+    return {
+        'wall_time': wall_time,
+        'cpu_time': cpu_time,
+        'files': len(files) if files is not None else None,
+        'bytes': total_bytes,
+        'files_per_s': len(files) / wall_time if files is not None and wall_time > 0 else None,
+        'mb_per_s': (total_bytes / (1024 * 1024) / wall_time
+                     if total_bytes is not None and wall_time > 0 else None),
+        'peak_rss_mb': peak_rss_kb / 1024
+    }
+
+
+def measure(case: str, root: str, jobs: int, yaml_backend: str, repeat: int,
+            cleanup_reports: bool) -> Dict:
+    """在獨立子進程中重複執行測試項，取最短耗時和最小峰值RSS"""
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--run-case', case, '--tree', root,
+             '--jobs', str(jobs), '--yaml-backend', yaml_backend],
+            check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout
+        runs.append(json.loads(output))
+        # 驗證器會在樹中寫入報告，清理後保證每次運行看到的文件相同
+        if cleanup_reports:
+            shutil.rmtree(os.path.join(root, 'reports'), ignore_errors=True)
+
+    best = min(runs, key=lambda r: r['wall_time'])
+    best['peak_rss_mb'] = min(r['peak_rss_mb'] for r in runs)
+    best['runs'] = len(runs)
+    return best
+
+
+def compare(results: Dict, baseline: Dict, time_tolerance: float, rss_tolerance: float,
+            min_time_delta: float) -> List[str]:
+    """與基線比較，返回超出容差的回歸項；絕對差值小於min_time_delta的耗時變化視為噪聲"""
+    regressions = []
+    for case, current in results['cases'].items():
+        previous = baseline.get('cases', {}).get(case)
+        if previous is None:
+            continue
+        if (current['wall_time'] > previous['wall_time'] * (1 + time_tolerance)
+                and current['wall_time'] - previous['wall_time'] >= min_time_delta):
+            regressions.append(f"{case}: wall time {previous['wall_time']:.3f}s -> {current['wall_time']:.3f}s")
+        if current['peak_rss_mb'] > previous['peak_rss_mb'] * (1 + rss_tolerance):
+            regressions.append(f"{case}: peak RSS {previous['peak_rss_mb']:.1f}MB -> {current['peak_rss_mb']:.1f}MB")
+    return regressions
+
+
+def _format_rate(value: Optional[float], unit: str) -> str:
+    return f'{value:10.1f} {unit}' if value is not None else f"{'-':>10s} {unit}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ConfigValidator/SecurityScanner benchmark suite')
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='medium',
+                        help='Synthetic tree size')
+    parser.add_argument('--tree', help='Benchmark an existing tree instead of generating one')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--jobs', '-j', type=int, default=1)
+    parser.add_argument('--yaml-backend', default='auto')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--cases', help='Comma-separated subset of cases to run')
+    parser.add_argument('--with-bandit', action='store_true',
+                        help='Also time a full Bandit run (requires bandit on PATH)')
+    parser.add_argument('--output', help='Write the results JSON to this file')
+    parser.add_argument('--baseline', help='Compare against this baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Write the results to --baseline instead of comparing')
+    parser.add_argument('--time-tolerance', type=float, default=0.2,
+                        help='Allowed relative wall-time increase before reporting a regression')
+    parser.add_argument('--rss-tolerance', type=float, default=0.2,
+                        help='Allowed relative peak-RSS increase before reporting a regression')
+    parser.add_argument('--min-time-delta', type=float, default=0.01,
+                        help='Ignore wall-time increases smaller than this many seconds')
+    parser.add_argument('--run-case', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_case:
+        print(json.dumps(run_case(args.run_case, args.tree, args.jobs, args.yaml_backend)))
+        return 0
+
+    cases = VALIDATOR_CASES + SCANNER_CASES
+    if args.with_bandit:
+        cases += OPTIONAL_CASES
+    if args.cases:
+        cases = [c for c in args.cases.split(',') if c]
+        unknown = set(cases) - set(VALIDATOR_CASES + SCANNER_CASES + OPTIONAL_CASES)
+        if unknown:
+            parser.error(f"unknown cases: {', '.join(sorted(unknown))}")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        root = args.tree
+        shape = None
+        if root is None:
+            root = os.path.join(tmp_dir, 'tree')
+            shape = PRESETS[args.preset]
+            start = time.perf_counter()
+            stats = generate_tree(root, shape, args.seed)
+            print(f"Generated {args.preset} tree: {stats['files']} files, "
+                  f"{stats['bytes'] / (1024 * 1024):.1f} MB, {stats['directories']} directories "
+                  f"({time.perf_counter() - start:.1f}s)")
+
+        results = {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'environment': {
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'yaml_backend': select_yaml_loader(args.yaml_backend)[1],
+                'jobs': args.jobs
+            },
+            'tree': {'preset': None if args.tree else args.preset,
+                     'shape': shape._asdict() if shape else None, 'seed': args.seed},
+            'cases': {}
+        }
+
+        # 只清理由本次測試創建的reports目錄
+        cleanup_reports = not os.path.exists(os.path.join(root, 'reports'))
+        print(f"{'case':32s} {'wall':>9s} {'cpu':>9s} {'files':>8s} {'files/s':>16s} {'MB/s':>15s} {'peak RSS':>10s}")
+        for case in cases:
+            result = measure(case, root, args.jobs, args.yaml_backend, args.repeat, cleanup_reports)
+            results['cases'][case] = result
+            files = str(result['files']) if result['files'] is not None else '-'
+            print(f"{case:32s} {result['wall_time']:8.3f}s {result['cpu_time']:8.3f}s {files:>8s} "
+                  f"{_format_rate(result['files_per_s'], 'f/s')} {_format_rate(result['mb_per_s'], 'MB/s')} "
+                  f"{result['peak_rss_mb']:8.1f}MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline and args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+    elif args.baseline:
+        with open(args.baseline, 'r') as f:
+            baseline = json.load(f)
+        if baseline.get('tree') != results['tree'] or baseline.get('environment') != results['environment']:
+            print("\n⚠️ Baseline was recorded with a different tree or environment; comparison may be misleading")
+        regressions = compare(results, baseline, args.time_tolerance, args.rss_tolerance,
+                              args.min_time_delta)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s) against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\n✅ No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# bench_yaml_loader.py - Compare libyaml and pure-Python YAML loaders on Helm-style manifests
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config_validator import _parse_yaml_file, select_yaml_loader  # noqa: E402
+
+
+MANIFEST_TEMPLATE = """---
+# Source: app/templates/deployment.yaml
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: service-{i}
+  namespace: apps
+  labels:
+    app.kubernetes.io/name: service-{i}
+    app.kubernetes.io/instance: release-{i}
+    helm.sh/chart: app-1.{i}.0
+spec:
+  replicas: 3
+  selector:
+    matchLabels:
+      app.kubernetes.io/name: service-{i}
+  template:
+    metadata:
+      labels:
+        app.kubernetes.io/name: service-{i}
+      annotations:
+        checksum/config: "{i:064x}"
+    spec:
+      containers:
+        - name: app
+          image: "registry.example.com/service-{i}:1.0.{i}"
+          ports:
+            - containerPort: 8080
+              protocol: TCP
+          env:
+            - name: LOG_LEVEL
+              value: info
+            - name: SERVICE_INDEX
+              value: "{i}"
+          resources:
+            limits: {{cpu: 500m, memory: 512Mi}}
+            requests: {{cpu: 100m, memory: 128Mi}}
+---
+# Source: app/templates/service.yaml
+apiVersion: v1
+kind: Service
+metadata:
+  name: service-{i}
+  namespace: apps
+spec:
+  type: ClusterIP
+  ports:
+    - port: 80
+      targetPort: 8080
+  selector:
+    app.kubernetes.io/name: service-{i}
+"""
+
+
+def generate_manifest(path: str, releases: int):
+    """生成Helm渲染風格的多文檔清單"""
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(releases):
+            f.write(MANIFEST_TEMPLATE.format(i=i))
+
+
+def time_backend(path: str, backend: str, repeat: int) -> float:
+    """返回多次解析中的最短耗時"""
+    loader, _ = select_yaml_loader(backend)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parsed = _parse_yaml_file(path, loader)
+        best = min(best, time.perf_counter() - start)
+        if parsed.error is not None:
+            raise RuntimeError(parsed.error)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='YAML loader backend benchmark')
+    parser.add_argument('--releases', type=int, default=2000,
+                        help='Number of Deployment+Service pairs in the generated manifest')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--manifest', help='Benchmark an existing manifest instead of a generated one')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = args.manifest
+        if path is None:
+            path = os.path.join(tmp_dir, 'rendered.yaml')
+            generate_manifest(path, args.releases)
+
+        size_mb = os.path.getsize(path) / (1024 * 1024)
+        print(f"Manifest: {path} ({size_mb:.1f} MB)")
+
+        timings = {'python': time_backend(path, 'python', args.repeat)}
+        _, auto_backend = select_yaml_loader('auto')
+        if auto_backend == 'libyaml':
+            timings['libyaml'] = time_backend(path, 'libyaml', args.repeat)
+
+        for backend, seconds in timings.items():
+            print(f"  {backend:8s} {seconds:8.3f}s  {size_mb / seconds:8.2f} MB/s")
+
+        if 'libyaml' in timings:
+            print(f"  speedup  {timings['python'] / timings['libyaml']:.1f}x")
+        else:
+            print("  libyaml not available, only the pure-Python loader was measured")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# synthetic_tree.py - Generate synthetic project trees for benchmarking the validators and scanners
+
+import argparse
+import json
+import os
+import random
+from typing import Dict, NamedTuple
+
+
+class TreeShape(NamedTuple):
+    """合成目錄樹的規模和形狀"""
+    yaml_files: int = 2000
+    json_files: int = 2000
+    # 每個目錄最多容納的配置文件數，以及配置目錄的嵌套深度
+    files_per_dir: int = 50
+    dir_depth: int = 3
+    # 需要被剪枝的 node_modules 樹：每層包數 × 嵌套層數
+    node_modules_breadth: int = 8
+    node_modules_depth: int = 4
+    k8s_manifests: int = 4
+    k8s_documents_per_manifest: int = 2000
+    env_files: int = 200
+    python_files: int = 500
+    # 故意生成的語法錯誤文件比例
+    invalid_ratio: float = 0.01
+
+
+PRESETS: Dict[str, TreeShape] = {
+    'small': TreeShape(yaml_files=300, json_files=300, node_modules_breadth=4, node_modules_depth=3,
+                       k8s_manifests=2, k8s_documents_per_manifest=200, env_files=20, python_files=50),
+    'medium': TreeShape(),
+    'large': TreeShape(yaml_files=20000, json_files=20000, node_modules_breadth=10, node_modules_depth=5,
+                       k8s_manifests=8, k8s_documents_per_manifest=10000, env_files=1000,
+                       python_files=3000),
+}
+
+YAML_TEMPLATE = """# service {i}
+name: service-{i}
+replicas: {replicas}
+image: registry.example.com/service-{i}:{version}
+env:
+  LOG_LEVEL: info
+  FEATURE_FLAGS: [alpha, beta, gamma]
+resources:
+  limits: {{cpu: 500m, memory: 512Mi}}
+  requests: {{cpu: 100m, memory: 128Mi}}
+"""
+
+K8S_TEMPLATE = """---
+apiVersion: apps/v1
+kind: Deployment
+metadata:
+  name: app-{i}
+  labels: {{app: app-{i}}}
+spec:
+  replicas: 2
+  selector:
+    matchLabels: {{app: app-{i}}}
+  template:
+    metadata:
+      labels: {{app: app-{i}}}
+    spec:
+      containers:
+        - name: app
+          image: registry.example.com/app-{i}:1.0.{i}
+          ports: [{{containerPort: 8080}}]
+"""
+
+PYTHON_TEMPLATE = '''"""Module {i}."""
+import subprocess
+
+
+def handler_{i}(value):
+    total = 0
+    for item in range(value):
+        total += item * {i}
+    return total
+
+
+def run_{i}(command):
+    return subprocess.call(command, shell={shell})
+'''
+
+COMPOSE_FILE = """version: '3.8'
+services:
+  web:
+    image: nginx:1.25
+    ports: ["80:80"]
+  worker:
+    build: .
+"""
+
+
+def generate_tree(root: str, shape: TreeShape, seed: int = 0) -> Dict:
+    """在root下生成合成項目，返回各類文件的數量和總字節數"""
+    rng = random.Random(seed)
+    stats = {'files': 0, 'bytes': 0, 'directories': 0}
+
+    def write(path: str, content: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        stats['files'] += 1
+        stats['bytes'] += len(content.encode('utf-8'))
+
+    def config_dir(kind: str, i: int) -> str:
+        # 按文件編號生成固定深度的嵌套目錄，例如 config/yaml/d3/d1/g12
+        group = i // shape.files_per_dir
+        parts = [f'd{(group >> (2 * level)) & 3}' for level in range(shape.dir_depth - 1)]
+        return os.path.join(root, 'config', kind, *parts, f'g{group}')
+
+    for i in range(shape.yaml_files):
+        content = YAML_TEMPLATE.format(i=i, replicas=rng.randrange(1, 10), version=f'1.{i % 50}.0')
+        if rng.random() < shape.invalid_ratio:
+            content += 'broken: [unclosed\n'
+        write(os.path.join(config_dir('yaml', i), f'service-{i}.yaml'), content)
+
+    for i in range(shape.json_files):
+        document = {'name': f'service-{i}', 'port': 8000 + i % 1000,
+                    'tags': [f'tag-{j}' for j in range(rng.randrange(1, 8))],
+                    'limits': {'cpu': '500m', 'memory': '512Mi'}}
+        content = json.dumps(document, indent=2)
+        if rng.random() < shape.invalid_ratio:
+            content = content[:-2]
+        write(os.path.join(config_dir('json', i), f'settings-{i}.json'), content)
+
+    # 深層 node_modules：驗證器應整體剪枝，不進入遍歷
+    def node_modules(base: str, depth: int):
+        if depth == 0:
+            return
+        for j in range(shape.node_modules_breadth):
+            package = os.path.join(base, 'node_modules', f'pkg-{depth}-{j}')
+            write(os.path.join(package, 'package.json'),
+                  json.dumps({'name': f'pkg-{depth}-{j}', 'version': '1.0.0'}))
+            write(os.path.join(package, 'index.js'), f'module.exports = {j};\n')
+            if j == 0:
+                node_modules(package, depth - 1)
+
+    node_modules(root, shape.node_modules_depth)
+
+    for m in range(shape.k8s_manifests):
+        content = ''.join(K8S_TEMPLATE.format(i=m * shape.k8s_documents_per_manifest + d)
+                          for d in range(shape.k8s_documents_per_manifest))
+        write(os.path.join(root, 'k8s', f'rendered-{m}.yaml'), content)
+
+    for i in range(shape.env_files):
+        lines = [f'SERVICE_NAME=service-{i}', f'PORT={8000 + i}', 'LOG_LEVEL=info']
+        if i % 5 == 0:
+            lines.append(f'API_KEY=key-{rng.getrandbits(64):016x}')
+        if rng.random() < shape.invalid_ratio:
+            lines.append('MALFORMED LINE')
+        write(os.path.join(root, 'services', f'svc-{i // 20}', f'.env.{i % 20}'), '\n'.join(lines) + '\n')
+
+    for i in range(shape.python_files):
+        content = PYTHON_TEMPLATE.format(i=i, shell='True' if i % 10 == 0 else 'False')
+        write(os.path.join(root, 'src', f'pkg{i // 100}', f'module_{i}.py'), content)
+
+    write(os.path.join(root, 'docker-compose.yml'), COMPOSE_FILE)
+    write(os.path.join(root, 'package.json'), json.dumps({'name': 'synthetic', 'version': '1.0.0'}))
+
+    for _, dirs, _ in os.walk(root):
+        stats['directories'] += len(dirs)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic project tree')
+    parser.add_argument('root')
+    parser.add_argument('--preset', choices=sorted(PRESETS), default='medium')
+    parser.add_argument('--seed', type=int, default=0)
+    for field, default in TreeShape._field_defaults.items():
+        parser.add_argument(f"--{field.replace('_', '-')}", type=type(default),
+                            help=f'Override the preset value (medium: {default})')
+    args = parser.parse_args()
+
+    shape = PRESETS[args.preset]._replace(**{field: getattr(args, field) for field in TreeShape._fields
+                                            if getattr(args, field) is not None})
+    stats = generate_tree(args.root, shape, args.seed)
+    print(f"Generated {stats['files']} files ({stats['bytes'] / (1024 * 1024):.1f} MB) "
+          f"in {stats['directories']} directories under {args.root}")
+
+
+if __name__ == "__main__":
+    main()
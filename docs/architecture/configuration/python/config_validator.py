@@ -4,197 +4,470 @@
 import yaml
 import json
 import os
-from typing import Dict, List, Tuple, Optional
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, Iterator, List, NamedTuple, Tuple, Optional
 from datetime import datetime
-import fnmatch
+
+from archive_validation import (ARCHIVE_PATTERNS, ARCHIVE_SEPARATOR, MEMBER_PATTERNS, check_members, member_kind,
+                                member_results, validate_archive)
+from content_dedup import ContentDeduplicator
+from file_inventory import DEFAULT_PATTERNS, FileInventory
+from findings_store import FindingsStore, apply_baseline, default_db_path
+from git_revision import GitError, GitRevision
+from ignore_rules import PROJECT_IGNORE_FILE, IgnoreRules
+from instrumentation import Instrumentation
+from report_sink import ReportSink
+from scan_budget import FilePriority, RunBudget
+from schema_validation import (COMPOSE_SCHEMA_FILE, KUBERNETES_SCHEMA_FILE, SchemaRegistry,
+                               kubernetes_schema_key, load_registry)
+from secret_detection import DEFAULT_ENTROPY_THRESHOLD, scan_file_secrets
+from streaming_syntax import check_json_syntax, check_yaml_syntax
+from validation_cache import ValidationCache
+
+
+# 檢查邏輯變化時遞增，使持久緩存中的舊結果失效
+VALIDATOR_VERSION = '1.4.1'
+
+YAML_BACKENDS = ['auto', 'libyaml', 'python']
+
+# 超過此大小的文件自動改用流式語法檢查
+DEFAULT_STREAM_THRESHOLD = 64 * 1024 * 1024
+
+# 密鑰掃描覆蓋的配置文件模式
+SECRET_SCAN_PATTERNS = ['*.yml', '*.yaml', '*.json', '.env*']
+
+# Kubernetes清單的必需字段及類型
+KUBERNETES_REQUIRED_FIELDS = {
+    'apiVersion': str,
+    'kind': str,
+    'metadata': dict
+}
+
+# 項目根目錄下按Kubernetes清單檢查的目錄
+KUBERNETES_DIRECTORIES = ['k8s', 'kubernetes', '.kube']
+
+# Docker Compose文件名：docker-compose.yml、compose.yaml、docker-compose.override.yml、compose.prod.yaml等
+COMPOSE_FILE_PATTERN = re.compile(r'^(docker-)?compose([.-][\w.-]+)?\.ya?ml$')
+
+# 預算模式下每個工作進程每批檢查的文件數
+BUDGET_FILES_PER_JOB = 4
+
+
+class ParsedDocument(NamedTuple):
+    """單個YAML文件的解析結果"""
+    documents: Optional[List[Any]]
+    error: Optional[str]
+
+
+def select_yaml_loader(backend: str = 'auto') -> Tuple[type, str]:
+    """選擇YAML加載器，優先使用libyaml的CSafeLoader，不可用時回退到純Python實現"""
+    if backend not in YAML_BACKENDS:
+        raise ValueError(f'Unknown YAML backend: {backend}')
+    
+    if backend in ('auto', 'libyaml'):
+        c_loader = getattr(yaml, 'CSafeLoader', None)
+        if c_loader is not None:
+            return c_loader, 'libyaml'
+        if backend == 'libyaml':
+            raise ValueError('libyaml backend requested but PyYAML was built without libyaml')
+    
+    return yaml.SafeLoader, 'python'
+
+
+def format_yaml_error(e: Exception) -> str:
+    """統一YAML錯誤信息格式
+    
+    libyaml與純Python解析器對同一錯誤給出的異常類型和出錯位置一致，
+    但描述文字和上下文位置不同，因此只保留類型、位置和問題描述。
+    """
+    mark = getattr(e, 'problem_mark', None)
+    if isinstance(e, yaml.MarkedYAMLError) and mark is not None:
+        return f'{type(e).__name__} at line {mark.line + 1}, column {mark.column + 1}: {e.problem}'
+    return str(e)
+
+
+def _parse_yaml_file(path: str, loader: type = yaml.SafeLoader) -> ParsedDocument:
+    """解析YAML文件的所有文檔（可在工作進程中執行）"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return ParsedDocument(list(yaml.load_all(f, Loader=loader)), None)
+    except yaml.YAMLError as e:
+        return ParsedDocument(None, format_yaml_error(e))
+    except (OSError, UnicodeDecodeError) as e:
+        return ParsedDocument(None, str(e))
+
+
+def _check_json_file(path: str) -> Optional[str]:
+    """檢查JSON文件語法，返回錯誤信息（可在工作進程中執行）"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            json.load(f)
+        return None
+    except (json.JSONDecodeError, OSError, UnicodeDecodeError) as e:
+        return str(e)
+
+
+def check_kubernetes_manifest(manifest: Any) -> Optional[str]:
+    """檢查單個Kubernetes清單的必需字段，返回第一個錯誤"""
+    for field, field_type in KUBERNETES_REQUIRED_FIELDS.items():
+        if field not in manifest:
+            return f'Missing required field: {field}'
+        
+        if not isinstance(manifest[field], field_type):
+            return f'Field {field} must be of type {field_type.__name__}'
+    return None
+
+
+def kubernetes_manifest_errors(manifest: Any, schemas: SchemaRegistry,
+                               unknown_kinds: Optional[Dict[str, int]] = None) -> List[str]:
+    """檢查單個Kubernetes清單的必需字段和結構，返回所有錯誤（沒有模式的kind只檢查必需字段，
+    給出unknown_kinds時按apiVersion/kind計數）"""
+    error = check_kubernetes_manifest(manifest)
+    if error is not None:
+        return [error]
+    key = kubernetes_schema_key(manifest)
+    errors = schemas.validate(key, manifest)
+    if errors is None and unknown_kinds is not None:
+        unknown_kinds[key] = unknown_kinds.get(key, 0) + 1
+    return format_schema_errors(manifest, errors)
+
+
+def format_schema_errors(manifest: Dict, errors: Optional[List[Tuple[str, str]]]) -> List[str]:
+    """結構錯誤前加上清單的kind和名稱，便於在多文檔文件中定位"""
+    if not errors:
+        return []
+    metadata = manifest['metadata']
+    label = f"{manifest['kind']} {metadata.get('name') or metadata.get('generateName') or '<unnamed>'}"
+    return [f'{label}: {path}: {message}' if path else f'{label}: {message}' for path, message in errors]
+
+
+def in_kubernetes_directory(path: str) -> bool:
+    """相對於項目根目錄的路徑是否位於Kubernetes目錄中（與目錄模式的查找範圍一致）"""
+    return '/' in path and path.split('/', 1)[0] in KUBERNETES_DIRECTORIES
+
+
+def check_env_lines(lines: List[str]) -> Dict:
+    """檢查環境變量文件每行的KEY=VALUE格式"""
+    checked = {'issues': []}
+    
+    for line_num, line in enumerate(lines, 1):
+        line = line.strip()
+        
+        # 跳過註釋和空行
+        if not line or line.startswith('#'):
+            continue
+        
+        # 檢查格式
+        if '=' not in line:
+            checked['issues'].append({
+                'line': line_num,
+                'type': 'format_error',
+                'message': 'Invalid format, expected KEY=VALUE'
+            })
+    
+    return checked
+
+
+def check_compose_documents(documents: List[Any]) -> Dict:
+    """按Compose規範檢查已解析的Compose文件（應只有一個文檔）"""
+    checked = {'valid': True, 'errors': [], 'warnings': []}
+    
+    try:
+        if len(documents) > 1:
+            raise ValueError('expected a single document in the stream')
+        config = documents[0] if documents else None
+        
+        # 按Compose規範檢查結構
+        for path, message in load_registry(COMPOSE_SCHEMA_FILE).validate('compose', config):
+            error = {'rule': 'schema', 'path': path, 'message': message}
+            if not path:
+                del error['path']
+            checked['errors'].append(error)
+            checked['valid'] = False
+        
+        # 檢查版本
+        if 'version' not in config:
+            checked['warnings'].append({
+                'message': 'Missing version field'
+            })
+        
+        # 檢查services
+        if 'services' not in config:
+            checked['errors'].append({
+                'message': 'Missing services section'
+            })
+            checked['valid'] = False
+        else:
+            # 檢查每個服務
+            for service_name, service_config in config['services'].items():
+                if not isinstance(service_config, dict):
+                    checked['errors'].append({
+                        'service': service_name,
+                        'message': 'Service configuration must be a dictionary'
+                    })
+                    checked['valid'] = False
+                
+                # 檢查必需字段
+                if 'image' not in service_config and 'build' not in service_config:
+                    checked['warnings'].append({
+                        'service': service_name,
+                        'message': 'Service should have either image or build field'
+                    })
+        
+    except Exception as e:
+        checked['errors'].append({
+            'error': str(e)
+        })
+        checked['valid'] = False
+    
+    return checked
+
+
+class DocumentCache:
+    """YAML解析緩存 - 以路徑、mtime和大小為鍵，每次運行每個文件只解析一次"""
+    
+    def __init__(self, loader: type = yaml.SafeLoader):
+        self.loader = loader
+        self._entries: Dict[str, Tuple[int, int, ParsedDocument]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+    
+    def load(self, path: str, inventory: Optional[FileInventory] = None) -> ParsedDocument:
+        """返回文件的多文檔解析結果，必要時才解析"""
+        key = self._stat_key(path, inventory)
+        if key is None:
+            return ParsedDocument(None, f'No such file: {path}')
+        
+        cached = self._entries.get(path)
+        if cached is not None and cached[:2] == key:
+            self.hits += 1
+            return cached[2]
+        
+        self.misses += 1
+        parsed = _parse_yaml_file(path, self.loader)
+        self._entries[path] = (key[0], key[1], parsed)
+        return parsed
+    
+    def prefetch(self, paths: List[str], inventory: Optional[FileInventory],
+                 mapper: Callable[[Callable, List[str]], List]) -> List[str]:
+        """批量解析尚未緩存的文件，mapper決定串行或並行執行；返回實際解析的文件"""
+        pending = []
+        for path in paths:
+            key = self._stat_key(path, inventory)
+            cached = self._entries.get(path)
+            if key is None or (cached is not None and cached[:2] == key):
+                continue
+            pending.append((path, key))
+        
+        if not pending:
+            return []
+        
+        parse = partial(_parse_yaml_file, loader=self.loader)
+        parsed_docs = mapper(parse, [path for path, _ in pending])
+        for (path, key), parsed in zip(pending, parsed_docs):
+            self.misses += 1
+            self._entries[path] = (key[0], key[1], parsed)
+        return [path for path, _ in pending]
+    
+    def share(self, source: str, path: str, inventory: Optional[FileInventory] = None):
+        """內容與source相同的文件直接共用其解析結果（source尚未解析時不做處理）"""
+        cached = self._entries.get(source)
+        key = self._stat_key(path, inventory)
+        if cached is None or key is None or path in self._entries:
+            return
+        self.shared += 1
+        self._entries[path] = (key[0], key[1], cached[2])
+    
+    @staticmethod
+    def _stat_key(path: str, inventory: Optional[FileInventory]) -> Optional[Tuple[int, int]]:
+        entry = inventory.get(path) if inventory is not None else None
+        if entry is not None:
+            return entry.mtime_ns, entry.size
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+    
+    def stats(self) -> Dict:
+        """緩存命中統計"""
+        return {
+            'cached_files': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'shared': self.shared
+        }
 
 
 class ConfigValidator:
     """配置文件驗證器"""
     
-    def __init__(self, project_path: str):
+    def __init__(self, project_path: str, inventory: Optional[FileInventory] = None,
+                 jobs: int = 1, use_cache: bool = True, cache_max_entries: int = 100000,
+                 yaml_backend: str = 'auto', syntax_only: bool = False,
+                 stream_threshold: int = DEFAULT_STREAM_THRESHOLD,
+                 instrument: bool = True, metrics_file: Optional[str] = None,
+                 secret_scan: bool = True, entropy_threshold: float = DEFAULT_ENTROPY_THRESHOLD,
+                 ignore: Optional[IgnoreRules] = None, archives: bool = False,
+                 stream_report: bool = False, sarif: bool = False, compress_report: bool = False,
+                 dedup: bool = True, executor=None, findings_db: Optional[str] = None,
+                 run_label: Optional[str] = None, baseline: Optional[str] = None,
+                 revision: Optional[str] = None, diff_base: Optional[str] = None,
+                 max_errors: Optional[int] = None, time_budget: Optional[float] = None):
         self.project_path = project_path
         self.reports_dir = os.path.join(project_path, 'reports', 'config')
         os.makedirs(self.reports_dir, exist_ok=True)
         self.errors = []
         self.warnings = []
+        self.inventory = inventory
+        # 項目忽略規則（.gitignore、項目忽略文件、命令行模式），遍歷時剪枝
+        self.ignore = ignore if ignore is not None else IgnoreRules.for_project(project_path)
+        self.yaml_loader, self.yaml_backend = select_yaml_loader(yaml_backend)
+        self.document_cache = DocumentCache(self.yaml_loader)
+        self.syntax_only = syntax_only
+        self.stream_threshold = stream_threshold
+        self.secret_scan = secret_scan
+        self.entropy_threshold = entropy_threshold
+        # 歸檔模式：同時流式驗證項目中zip/tar壓縮包內的配置文件
+        self.archives = archives
+        # jobs <= 0 表示使用全部CPU核心
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        self._executor = None
+        # 批量模式下多個項目共用的進程池（提供Executor.map接口），由調用方負責關閉
+        self._shared_executor = executor
+        # 各階段的耗時和資源用量；關閉時phase()返回空上下文
+        self.metrics = Instrumentation(instrument)
+        self.metrics_file = metrics_file
+        # 流式報告：錯誤和發現產生時即寫出，validation-report.json只保留計數
+        self.report_sink = None
+        if stream_report or sarif:
+            self.report_sink = ReportSink(
+                'config_validator', VALIDATOR_VERSION, project_path,
+                ndjson_path=os.path.join(self.reports_dir, 'validation-findings.ndjson') if stream_report else None,
+                sarif_path=os.path.join(self.reports_dir, 'validation-report.sarif') if sarif else None,
+                compress=compress_report)
+        # 內容去重：字節相同的文件只解析一次，結果共享給所有路徑
+        self.dedup = ContentDeduplicator() if dedup else None
+        # 發現記錄庫：每次運行的全部發現寫入SQLite，可與基線運行比較
+        self.findings_db = findings_db
+        self.run_label = run_label
+        self.baseline = baseline
+        self.findings_run = None
+        # git修訂模式：從對象庫讀取修訂中（或相對合併基點改動）的文件，不遍歷工作樹
+        self.revision = None
+        if revision is not None or diff_base is not None:
+            self.revision = GitRevision(project_path, revision or 'HEAD', diff_base)
+        # 預算模式：錯誤數達到上限或時間用完時停止檢查，按優先級順序檢查文件，報告標記為截斷
+        self.budget = None
+        if max_errors is not None or time_budget is not None:
+            self.budget = RunBudget(max_errors, time_budget)
+        self.priority: Optional[FilePriority] = None
+        self.validation_cache = None
+        if use_cache and self.revision is None:
+            self.validation_cache = ValidationCache(
+                os.path.join(self.reports_dir, 'validation-cache.json'),
+                f'{VALIDATOR_VERSION}+{self.yaml_backend}', max_entries=cache_max_entries
+            ).load()
     
     def validate_yaml_files(self) -> Dict:
         """驗證所有YAML文件"""
-        yaml_files = self._find_files(['*.yml', '*.yaml'])
+        yaml_files = self._find_config_files(['*.yml', '*.yaml'])
         
         results = {
             'total_files': len(yaml_files),
             'valid_files': 0,
             'invalid_files': 0,
-            'errors': []
+            'errors': self._new_items()
         }
         
-        for yaml_file in yaml_files:
-            try:
-                with open(yaml_file, 'r', encoding='utf-8') as f:
-                    yaml.safe_load(f)
+        for yaml_file, checked in zip(yaml_files, self._checked(self._syntax_check_name('yaml'), yaml_files,
+                                                                self._check_yaml_files)):
+            if checked['error'] is None:
                 results['valid_files'] += 1
-            except yaml.YAMLError as e:
+            else:
                 results['invalid_files'] += 1
-                results['errors'].append({
+                self._report(results, 'yaml', 'errors', {
                     'file': yaml_file,
-                    'error': str(e)
+                    'error': checked['error']
                 })
         
         return results
     
     def validate_json_files(self) -> Dict:
         """驗證所有JSON文件"""
-        json_files = self._find_files(['*.json'])
+        json_files = self._find_config_files(['*.json'])
         
         results = {
             'total_files': len(json_files),
             'valid_files': 0,
             'invalid_files': 0,
-            'errors': []
+            'errors': self._new_items()
         }
         
-        for json_file in json_files:
-            # 跳過node_modules和其他依賴目錄
-            if 'node_modules' in json_file or '.venv' in json_file:
-                continue
-            
-            try:
-                with open(json_file, 'r', encoding='utf-8') as f:
-                    json.load(f)
+        for json_file, checked in zip(json_files, self._checked(self._syntax_check_name('json'), json_files,
+                                                                self._check_json_files)):
+            if checked['error'] is None:
                 results['valid_files'] += 1
-            except json.JSONDecodeError as e:
+            else:
                 results['invalid_files'] += 1
-                results['errors'].append({
+                self._report(results, 'json', 'errors', {
                     'file': json_file,
-                    'error': str(e)
+                    'error': checked['error']
                 })
         
         return results
     
     def validate_docker_compose(self) -> Dict:
-        """驗證Docker Compose配置"""
-        compose_files = [
-            'docker-compose.yml',
-            'docker-compose.yaml',
-            'docker-compose.override.yml'
-        ]
+        """驗證項目中所有Docker Compose文件"""
+        filepaths = [p for p in self._find_files(['*.yml', '*.yaml'])
+                     if COMPOSE_FILE_PATTERN.match(os.path.basename(p))]
+        filenames = [os.path.relpath(p, self.project_path) for p in filepaths]
         
         results = {
             'files_checked': [],
             'valid': True,
-            'errors': [],
-            'warnings': []
+            'errors': self._new_items(),
+            'warnings': self._new_items()
         }
         
-        for filename in compose_files:
-            filepath = os.path.join(self.project_path, filename)
-            if not os.path.exists(filepath):
-                continue
-            
+        checked_files = self._checked('docker_compose', filepaths,
+                                      lambda paths: [self._check_compose_file(p) for p in paths])
+        for filename, checked in zip(filenames, checked_files):
             results['files_checked'].append(filename)
-            
-            try:
-                with open(filepath, 'r') as f:
-                    config = yaml.safe_load(f)
-                
-                # 檢查版本
-                if 'version' not in config:
-                    results['warnings'].append({
-                        'file': filename,
-                        'message': 'Missing version field'
-                    })
-                
-                # 檢查services
-                if 'services' not in config:
-                    results['errors'].append({
-                        'file': filename,
-                        'message': 'Missing services section'
-                    })
-                    results['valid'] = False
-                else:
-                    # 檢查每個服務
-                    for service_name, service_config in config['services'].items():
-                        if not isinstance(service_config, dict):
-                            results['errors'].append({
-                                'file': filename,
-                                'service': service_name,
-                                'message': 'Service configuration must be a dictionary'
-                            })
-                            results['valid'] = False
-                        
-                        # 檢查必需字段
-                        if 'image' not in service_config and 'build' not in service_config:
-                            results['warnings'].append({
-                                'file': filename,
-                                'service': service_name,
-                                'message': 'Service should have either image or build field'
-                            })
-            
-            except Exception as e:
-                results['errors'].append({
-                    'file': filename,
-                    'error': str(e)
-                })
+            for e in checked['errors']:
+                self._report(results, 'docker_compose', 'errors', {'file': filename, **e})
+            for w in checked['warnings']:
+                self._report(results, 'docker_compose', 'warnings', {'file': filename, **w})
+            if not checked['valid']:
                 results['valid'] = False
         
         return results
     
     def validate_kubernetes_manifests(self) -> Dict:
         """驗證Kubernetes配置"""
-        k8s_files = self._find_files(['*.yaml', '*.yml'], 
-                                     directories=['k8s', 'kubernetes', '.kube'])
+        k8s_files = self._find_files(['*.yaml', '*.yml'], directories=KUBERNETES_DIRECTORIES)
         
         results = {
             'total_files': len(k8s_files),
             'valid_files': 0,
             'invalid_files': 0,
-            'errors': [],
-            'warnings': []
+            'errors': self._new_items(),
+            'warnings': self._new_items()
         }
         
-        required_fields = {
-            'apiVersion': str,
-            'kind': str,
-            'metadata': dict
-        }
-        
-        for k8s_file in k8s_files:
-            try:
-                with open(k8s_file, 'r') as f:
-                    manifests = list(yaml.safe_load_all(f))
-                
-                for manifest in manifests:
-                    if not manifest:
-                        continue
-                    
-                    # 檢查必需字段
-                    for field, field_type in required_fields.items():
-                        if field not in manifest:
-                            results['errors'].append({
-                                'file': k8s_file,
-                                'error': f'Missing required field: {field}'
-                            })
-                            results['invalid_files'] += 1
-                            break
-                        
-                        if not isinstance(manifest[field], field_type):
-                            results['errors'].append({
-                                'file': k8s_file,
-                                'error': f'Field {field} must be of type {field_type.__name__}'
-                            })
-                            results['invalid_files'] += 1
-                            break
-                    else:
-                        results['valid_files'] += 1
-            
-            except Exception as e:
-                results['errors'].append({
-                    'file': k8s_file,
-                    'error': str(e)
-                })
-                results['invalid_files'] += 1
+        # 沒有內置模式的apiVersion/kind（如CRD）只檢查必需字段
+        unknown_kinds = {}
+        for k8s_file, checked in zip(k8s_files, self._checked('kubernetes', k8s_files, self._check_kubernetes_files)):
+            results['valid_files'] += checked['valid']
+            results['invalid_files'] += checked['invalid']
+            for e in checked['errors']:
+                self._report(results, 'kubernetes', 'errors', {'file': k8s_file, 'error': e})
+            for key in checked['unknown_kinds']:
+                unknown_kinds[key] = unknown_kinds.get(key, 0) + 1
+        results['unknown_kinds'] = dict(sorted(unknown_kinds.items()))
         
         return results
     
@@ -204,120 +477,654 @@ class ConfigValidator:
         
         results = {
             'total_files': len(env_files),
-            'issues': []
+            'issues': self._new_items()
         }
         
-        # 敏感信息關鍵字
-        sensitive_keywords = [
-            'password', 'secret', 'key', 'token', 'credential',
-            'api_key', 'private_key', 'access_key'
-        ]
+        checked_files = self._checked('env', env_files,
+                                      lambda paths: [self._check_env_file(p) for p in paths])
+        for env_file, checked in zip(env_files, checked_files):
+            for issue in checked['issues']:
+                self._report(results, 'env_files', 'issues', {'file': env_file, **issue})
+        
+        return results
+    
+    def validate_secrets(self) -> Dict:
+        """掃描清單中所有配置文件的密鑰"""
+        # 同一文件可能匹配多個模式
+        secret_files = list(dict.fromkeys(self._find_config_files(SECRET_SCAN_PATTERNS)))
+        
+        results = {
+            'total_files': len(secret_files),
+            'findings': self._new_items(),
+            'by_severity': {'critical': 0, 'high': 0, 'medium': 0, 'low': 0},
+            'errors': self._new_items()
+        }
+        
+        # 熵閾值影響結果，作為緩存檢查名的一部分
+        check_name = f'secrets@{self.entropy_threshold}'
+        for path, checked in zip(secret_files, self._checked(check_name, secret_files, self._check_secret_files)):
+            for finding in checked['findings']:
+                self._report(results, 'secrets', 'findings', {'file': path, **finding})
+                results['by_severity'][finding['severity']] += 1
+            if 'error' in checked:
+                self._report(results, 'secrets', 'errors', {'file': path, 'error': checked['error']})
+        
+        return results
+    
+    def validate_archives(self) -> Dict:
+        """不解壓地驗證壓縮包中的配置文件，成員路徑報告為 archive.zip!/path/inside"""
+        inventory = self.get_inventory()
+        # 外部傳入的清單可能沒有登記壓縮包模式
+        archive_files = self._prioritized(inventory.files([p for p in ARCHIVE_PATTERNS if p in inventory.buckets]))
+        
+        results = {
+            'total_archives': len(archive_files),
+            'members_checked': {kind: 0 for kind in MEMBER_PATTERNS},
+            'kubernetes': {'valid': 0, 'invalid': 0},
+            'errors': self._new_items(),
+            'issues': self._new_items(),
+            'findings': self._new_items(),
+            'by_severity': {'critical': 0, 'high': 0, 'medium': 0, 'low': 0}
+        }
+        
+        # 影響結果的選項作為緩存檢查名的一部分
+        check_name = f'archive@{self.entropy_threshold if self.secret_scan else "nosecrets"}'
+        if self.syntax_only:
+            check_name += '+syntax'
+        for path, checked in zip(archive_files, self._checked(check_name, archive_files, self._check_archives)):
+            for kind, count in checked['members_checked'].items():
+                results['members_checked'][kind] += count
+            for key in ('valid', 'invalid'):
+                results['kubernetes'][key] += checked['kubernetes'][key]
+            for key in ('errors', 'issues', 'findings'):
+                for item in checked[key]:
+                    # 複製後再改寫，緩存中的結果保持不變
+                    item = dict(item)
+                    member = item.pop('member')
+                    file = path if member is None else f'{path}{ARCHIVE_SEPARATOR}{member}'
+                    self._report(results, 'archives', key, {'file': file, **item})
+            for finding in checked['findings']:
+                results['by_severity'][finding['severity']] += 1
+        
+        return results
+    
+    def validate_revision(self) -> Dict:
+        """驗證git修訂中的配置文件，返回與目錄模式結構相同的各項結果
+        
+        文件內容經同一個 git cat-file --batch 進程依次流式讀取，直接交給解析器和密鑰檢測，
+        不需要檢出，工作量只與修訂中（diff模式下為改動的）文件的大小成正比。
+        """
+        files = [f for f in self.revision.files()
+                 if member_kind(f.path) is not None and not self.ignore.is_ignored(f.path)]
+        kinds = [member_kind(f.path) for f in files]
+        yaml_paths = [f.path for f, kind in zip(files, kinds) if kind == 'yaml']
+        compose_paths = [p for p in yaml_paths if COMPOSE_FILE_PATTERN.match(p.rsplit('/', 1)[-1])]
+        
+        checked = member_results()
+        contents = self.revision.iter_contents(files)
+        if self.budget is not None:
+            contents = self._revision_within_budget(contents, [f.path for f in files], checked)
+        with self.metrics.phase('parse') as phase:
+            check_members(contents, checked, loader=self.yaml_loader,
+                          syntax_only=self.syntax_only, stream_threshold=self.stream_threshold,
+                          secret_scan=self.secret_scan, entropy_threshold=self.entropy_threshold,
+                          is_kubernetes=in_kubernetes_directory, compose=True)
+            phase.count(len(files), checked['bytes'])
+        
+        errors: Dict[str, List[Dict]] = {}
+        for item in checked['errors']:
+            errors.setdefault(item['check'], []).append(item)
+        invalid = {check: len({item['member'] for item in items}) for check, items in errors.items()}
+        # 預算耗盡時只有前面的文件被檢查，有效文件數只計已檢查的文件
+        checked_kinds = kinds[:len(files) - (self.budget.skipped.get('revision', 0) if self.budget else 0)]
+        
+        validations = {
+            'yaml': {
+                'total_files': len(yaml_paths),
+                'valid_files': checked_kinds.count('yaml') - invalid.get('yaml', 0),
+                'invalid_files': invalid.get('yaml', 0),
+                'errors': self._new_items()
+            },
+            'json': {
+                'total_files': kinds.count('json'),
+                'valid_files': checked_kinds.count('json') - invalid.get('json', 0),
+                'invalid_files': invalid.get('json', 0),
+                'errors': self._new_items()
+            },
+            'docker_compose': {
+                'files_checked': compose_paths,
+                'valid': 'docker_compose' not in errors,
+                'errors': self._new_items(),
+                'warnings': self._new_items()
+            },
+            'kubernetes': {
+                'total_files': sum(1 for p in yaml_paths if in_kubernetes_directory(p)),
+                'valid_files': checked['kubernetes']['valid'],
+                'invalid_files': checked['kubernetes']['invalid'],
+                'errors': self._new_items(),
+                'warnings': self._new_items(),
+                'unknown_kinds': dict(sorted(checked['kubernetes']['unknown_kinds'].items()))
+            },
+            'env_files': {
+                'total_files': kinds.count('env'),
+                'issues': self._new_items()
+            }
+        }
+        
+        # 與目錄模式相同：路徑報告為項目路徑下的文件，Compose使用相對路徑
+        for check in ('yaml', 'json', 'kubernetes'):
+            for item in errors.get(check, []):
+                self._report(validations[check], check, 'errors',
+                             {'file': os.path.join(self.project_path, item['member']), 'error': item['error']})
+        for key, items in (('errors', errors.get('docker_compose', [])), ('warnings', checked['warnings'])):
+            for item in items:
+                fields = {k: v for k, v in item.items() if k not in ('member', 'check')}
+                self._report(validations['docker_compose'], 'docker_compose', key,
+                             {'file': item['member'], **fields})
+        for item in checked['issues']:
+            self._report(validations['env_files'], 'env_files', 'issues',
+                         {'file': os.path.join(self.project_path, item['member']),
+                          **{k: v for k, v in item.items() if k != 'member'}})
+        
+        if self.secret_scan:
+            validations['secrets'] = {
+                'total_files': len(files),
+                'findings': self._new_items(),
+                'by_severity': {'critical': 0, 'high': 0, 'medium': 0, 'low': 0},
+                'errors': self._new_items()
+            }
+            for item in checked['findings']:
+                finding = {k: v for k, v in item.items() if k != 'member'}
+                self._report(validations['secrets'], 'secrets', 'findings',
+                             {'file': os.path.join(self.project_path, item['member']), **finding})
+                validations['secrets']['by_severity'][finding['severity']] += 1
         
-        for env_file in env_files:
+        return validations
+    
+    def _revision_within_budget(self, contents, paths: List[str], checked: Dict):
+        """預算耗盡時停止讀取修訂中的文件；已檢查但尚未報告的錯誤計入預算"""
+        consumed = 0
+        try:
+            for item in contents:
+                pending = len(checked['errors']) + sum(1 for issue in checked['issues']
+                                                       if issue.get('type') != 'security_warning')
+                if self.budget.exhausted(pending):
+                    break
+                consumed += 1
+                yield item
+        finally:
+            # 提前停止時結束cat-file進程
+            contents.close()
+            self.budget.skip('revision', paths=paths[consumed:])
+    
+    def _check_archives(self, paths: List[str]) -> List[Dict]:
+        """每個壓縮包一個任務，jobs > 1時在工作進程中並行；大壓縮包優先提交以均衡負載"""
+        inventory = self.get_inventory()
+        order = sorted(range(len(paths)), key=lambda i: -inventory.get(paths[i]).size)
+        check = partial(validate_archive, loader=self.yaml_loader, syntax_only=self.syntax_only,
+                        stream_threshold=self.stream_threshold, secret_scan=self.secret_scan,
+                        entropy_threshold=self.entropy_threshold)
+        with self.metrics.phase('parse') as phase:
+            checked = self._map(check, [paths[i] for i in order])
+            phase.count(len(paths), sum(c['bytes'] for c in checked))
+        results = [None] * len(paths)
+        for i, result in zip(order, checked):
+            results[i] = result
+        return results
+    
+    def _check_yaml_files(self, paths: List[str]) -> List[Dict]:
+        """檢查YAML語法；大文件只遍歷解析事件，不構建對象圖"""
+        streaming = [self._use_streaming(p) for p in paths]
+        with self.metrics.phase('parse') as phase:
+            parsed = self.document_cache.prefetch([p for p, s in zip(paths, streaming) if not s],
+                                                  self.get_inventory(), self._map)
+            to_stream = [p for p, s in zip(paths, streaming) if s]
+            streamed = iter(self._map(partial(check_yaml_syntax, loader=self.yaml_loader), to_stream))
+            self._count(phase, parsed + to_stream)
+        return [{'error': next(streamed) if s else self._load_yaml(p).error}
+                for p, s in zip(paths, streaming)]
+    
+    def _check_json_files(self, paths: List[str]) -> List[Dict]:
+        """檢查JSON語法；大文件使用增量詞法分析"""
+        streaming = [self._use_streaming(p) for p in paths]
+        with self.metrics.phase('parse') as phase:
+            streamed = iter(self._map(check_json_syntax, [p for p, s in zip(paths, streaming) if s]))
+            loaded = iter(self._map(_check_json_file, [p for p, s in zip(paths, streaming) if not s]))
+            self._count(phase, paths)
+        return [{'error': next(streamed) if s else next(loaded)} for s in streaming]
+    
+    def _check_compose_file(self, filepath: str) -> Dict:
+        """檢查單個Docker Compose文件"""
+        parsed = self._load_yaml(filepath)
+        if parsed.error is not None:
+            return {'valid': False, 'errors': [{'error': parsed.error}], 'warnings': []}
+        return check_compose_documents(parsed.documents)
+    
+    def _check_kubernetes_files(self, paths: List[str]) -> List[Dict]:
+        """檢查Kubernetes清單的必需字段和結構；所有文件的清單按apiVersion/kind分組，每組共用一個已編譯的驗證函數"""
+        with self.metrics.phase('parse') as phase:
+            parsed = self.document_cache.prefetch([p for p in paths if not self._is_large(p)],
+                                                  self.get_inventory(), self._map)
+            self._count(phase, parsed)
+        
+        schemas = load_registry(KUBERNETES_SCHEMA_FILE)
+        checked_files = [{'valid': 0, 'invalid': 0, 'errors': [], 'unknown_kinds': []} for _ in paths]
+        # (文件下標, 通過必需字段檢查的清單)
+        manifests = []
+        for i, k8s_file in enumerate(paths):
+            checked = checked_files[i]
             try:
-                with open(env_file, 'r') as f:
-                    lines = f.readlines()
+                if self._is_large(k8s_file):
+                    # 大文件逐個文檔加載並立即驗證，不保留清單
+                    for manifest in self._iter_yaml_documents(k8s_file):
+                        if self._check_required_fields(checked, manifest):
+                            key = kubernetes_schema_key(manifest)
+                            self._record_manifest(checked, manifest, key, schemas.validate(key, manifest))
+                    continue
+                
+                parsed = self._load_yaml(k8s_file)
+                if parsed.error is not None:
+                    raise ValueError(parsed.error)
+                for manifest in parsed.documents:
+                    if self._check_required_fields(checked, manifest):
+                        manifests.append((i, manifest))
                 
-                for line_num, line in enumerate(lines, 1):
-                    line = line.strip()
-                    
-                    # 跳過註釋和空行
-                    if not line or line.startswith('#'):
-                        continue
-                    
-                    # 檢查格式
-                    if '=' not in line:
-                        results['issues'].append({
-                            'file': env_file,
-                            'line': line_num,
-                            'type': 'format_error',
-                            'message': 'Invalid format, expected KEY=VALUE'
-                        })
-                        continue
-                    
-                    key, value = line.split('=', 1)
-                    key = key.strip()
-                    value = value.strip()
-                    
-                    # 檢查敏感信息
-                    if any(keyword in key.lower() for keyword in sensitive_keywords):
-                        if value and value not in ['', 'your_value_here', 'changeme']:
-                            results['issues'].append({
-                                'file': env_file,
-                                'line': line_num,
-                                'type': 'security_warning',
-                                'message': f'Sensitive value found for {key}'
-                            })
-            
             except Exception as e:
-                results['issues'].append({
-                    'file': env_file,
-                    'error': str(e)
-                })
+                checked['errors'].append(format_yaml_error(e))
+                checked['invalid'] += 1
+        
+        with self.metrics.phase('schema') as phase:
+            keys = [kubernetes_schema_key(manifest) for _, manifest in manifests]
+            outcomes = schemas.validate_many(list(zip(keys, (manifest for _, manifest in manifests))))
+            phase.count(len(manifests), 0)
+        for (i, manifest), key, errors in zip(manifests, keys, outcomes):
+            self._record_manifest(checked_files[i], manifest, key, errors)
+        
+        return checked_files
+    
+    @staticmethod
+    def _check_required_fields(checked: Dict, manifest: Any) -> bool:
+        """檢查必需字段，返回清單是否需要做結構驗證（空文檔跳過）"""
+        if not manifest:
+            return False
+        error = check_kubernetes_manifest(manifest)
+        if error is not None:
+            checked['errors'].append(error)
+            checked['invalid'] += 1
+            return False
+        return True
+    
+    @staticmethod
+    def _record_manifest(checked: Dict, manifest: Dict, key: str, errors: Optional[List[Tuple[str, str]]]):
+        """記錄單個清單的結構驗證結果；errors為None表示沒有該apiVersion/kind的模式"""
+        if errors is None:
+            checked['unknown_kinds'].append(key)
+        if errors:
+            checked['errors'].extend(format_schema_errors(manifest, errors))
+            checked['invalid'] += 1
+        else:
+            checked['valid'] += 1
+    
+    def _check_secret_files(self, paths: List[str]) -> List[Dict]:
+        """逐文件檢測密鑰，jobs > 1時在工作進程中執行"""
+        return self._map(partial(scan_file_secrets, entropy_threshold=self.entropy_threshold), paths)
+    
+    def _check_env_file(self, env_file: str) -> Dict:
+        """檢查單個環境變量文件的格式（敏感值由validate_secrets檢測）"""
+        try:
+            with open(env_file, 'r') as f:
+                lines = f.readlines()
+            return check_env_lines(lines)
+        except Exception as e:
+            return {'issues': [{'error': str(e)}]}
+    
+    def _checked(self, check_name: str, paths: List[str],
+                 compute: Callable[[List[str]], List[Dict]]) -> Iterable[Dict]:
+        """對paths執行檢查；持久緩存命中的文件不再打開解析，內容相同的文件只檢查一次
+        
+        預算模式下分批檢查並逐個產出結果，調用方報告完一批後才檢查下一批；預算耗盡時不再產出，
+        結果可能少於paths。
+        """
+        if self.budget is None:
+            return self._checked_batch(check_name, paths, compute)
+        return self._checked_within_budget(check_name, paths, compute)
+    
+    def _checked_within_budget(self, check_name: str, paths: List[str],
+                               compute: Callable[[List[str]], List[Dict]]) -> Iterator[Dict]:
+        # 每個結果報告後都檢查一次：錯誤數恰好達到上限時停止，本批中未報告的結果計為未檢查
+        batch = max(1, self.jobs) * BUDGET_FILES_PER_JOB
+        reported = 0
+        for start in range(0, len(paths), batch):
+            if self.budget.exhausted():
+                break
+            for result in self._checked_batch(check_name, paths[start:start + batch], compute):
+                if self.budget.exhausted():
+                    break
+                yield result
+                reported += 1
+        self.budget.skip(check_name.split('@')[0], paths=paths[reported:])
+    
+    def _checked_batch(self, check_name: str, paths: List[str],
+                       compute: Callable[[List[str]], List[Dict]]) -> List[Dict]:
+        self._count(self.metrics, paths)
+        keys = None
+        results = [None] * len(paths)
+        if self.validation_cache is not None:
+            inventory = self.get_inventory()
+            keys = [self.validation_cache.content_key(p, inventory.get(p)) for p in paths]
+            results = [self.validation_cache.get(k, check_name) if k is not None else None
+                       for k in keys]
+        
+        missing = [i for i, r in enumerate(results) if r is None]
+        computed = self._compute_unique(check_name.split('@')[0], [paths[i] for i in missing],
+                                        None if keys is None else [keys[i] for i in missing], compute)
+        for i, result in zip(missing, computed):
+            results[i] = result
+            if keys is not None and keys[i] is not None:
+                self.validation_cache.put(keys[i], check_name, result)
         
         return results
     
+    def _compute_unique(self, check: str, paths: List[str], keys: Optional[List[Optional[str]]],
+                        compute: Callable[[List[str]], List[Dict]]) -> List[Dict]:
+        """只對每組內容相同的文件中的第一個執行compute，結果共享給組內其他路徑
+        
+        檢查結果不包含路徑（與持久緩存按內容共享的前提相同），共享的結果不可修改。
+        """
+        if self.dedup is None or not paths:
+            return compute(paths)
+        
+        inventory = self.get_inventory()
+        with self.metrics.phase('dedup'):
+            entries = [inventory.get(p) for p in paths]
+            owners = self.dedup.group(check, paths, [e.size if e is not None else None for e in entries], keys)
+        unique = [i for i, owner in enumerate(owners) if owner == i]
+        computed = dict(zip(unique, compute([paths[i] for i in unique])))
+        for i, owner in enumerate(owners):
+            if owner != i:
+                self.document_cache.share(paths[owner], paths[i], inventory)
+        return [computed[owner] for owner in owners]
+    
+    def _new_items(self):
+        """結果中錯誤/警告等條目的初始值：流式報告時只計數"""
+        return [] if self.report_sink is None else 0
+    
+    def _report(self, results: Dict, check: str, key: str, item: Dict):
+        """記錄一條錯誤、警告、問題或發現；流式報告時立即寫出，結果中只累加計數"""
+        level = 'warning' if key in ('warnings', 'findings') or item.get('type') == 'security_warning' else 'error'
+        if self.budget is not None and level == 'error':
+            self.budget.add_error()
+        if self.report_sink is None and self.findings_run is None:
+            results[key].append(item)
+            return
+        
+        detail = item.get('rule') or item.get('check') or item.get('type')
+        rule_id = f'{check}/{detail}' if detail else check
+        message = item.get('message') or item.get('error') or ''
+        if self.findings_run is not None:
+            self.findings_run.add(rule_id, level, message, item.get('file'), item.get('line'), item.get('severity'))
+        
+        if self.report_sink is None:
+            results[key].append(item)
+            return
+        results[key] += 1
+        self.report_sink.emit({'validation': check, 'category': key, **item}, rule_id, level, message)
+    
     def _find_files(self, patterns: List[str], directories: Optional[List[str]] = None) -> List[str]:
         """查找匹配的文件"""
-        matched_files = []
-        search_dirs = directories or [self.project_path]
-        
-        for search_dir in search_dirs:
-            # Always resolve search_dir to an absolute path
-            full_search_dir = search_dir if os.path.isabs(search_dir) else os.path.join(self.project_path, search_dir)
-            
-            if not os.path.exists(full_search_dir):
-                continue
-            
-            for root, dirs, files in os.walk(full_search_dir):
-                # 排除常見的依賴目錄
-                dirs[:] = [d for d in dirs if d not in [
-                    'node_modules', '.git', '__pycache__', 
-                    '.venv', 'venv', 'dist', 'build'
-                ]]
-                
-                for pattern in patterns:
-                    for filename in fnmatch.filter(files, pattern):
-                        matched_files.append(os.path.join(root, filename))
+        return self._prioritized(self.get_inventory().files(patterns, directories))
+    
+    def _find_config_files(self, patterns: List[str]) -> List[str]:
+        """查找項目配置文件，跳過工具自己生成的報告和緩存（reports/）"""
+        reports_root = os.path.join(self.project_path, 'reports') + os.sep
+        return [f for f in self._find_files(patterns) if not f.startswith(reports_root)]
+    
+    def _prioritized(self, paths: List[str]) -> List[str]:
+        """預算模式下按優先級排序（最近修改、上次有問題、其餘按大小升序），否則保持清單順序"""
+        if self.priority is None:
+            return paths
+        inventory = self.get_inventory()
+        
+        def stat(path):
+            entry = inventory.get(path)
+            return (entry.mtime_ns / 1e9, entry.size) if entry is not None else None
+        return self.priority.order(paths, stat)
+    
+    def _count(self, target, paths: List[str]):
+        """把paths的文件數和字節數計入階段（target為階段上下文，或Instrumentation表示當前階段）"""
+        if not self.metrics.enabled:
+            return
+        inventory = self.get_inventory()
+        entries = [inventory.get(p) for p in paths]
+        target.count(len(paths), sum(entry.size for entry in entries if entry is not None))
+    
+    def _is_large(self, path: str) -> bool:
+        """文件是否超過流式處理閾值"""
+        entry = self.get_inventory().get(path)
+        return entry is not None and entry.size >= self.stream_threshold
+    
+    def _syntax_check_name(self, check: str) -> str:
+        """只做語法檢查時不運行YAML構造器，結果與完整加載不同，緩存時不能共用檢查名"""
+        return f'{check}@syntax' if self.syntax_only else check
+    
+    def _use_streaming(self, path: str) -> bool:
+        """語法檢查是否使用流式模式"""
+        return self.syntax_only or self._is_large(path)
+    
+    def _iter_yaml_documents(self, path: str):
+        """逐個產出YAML文檔，內存只保留當前文檔"""
+        with open(path, 'r', encoding='utf-8') as f:
+            yield from yaml.load_all(f, Loader=self.yaml_loader)
+    
+    def _load_yaml(self, path: str) -> ParsedDocument:
+        """通過共享緩存讀取YAML解析結果"""
+        return self.document_cache.load(path, self.get_inventory())
+    
+    def _map(self, func: Callable, items: List) -> List:
+        """按順序對items執行func；jobs > 1時分塊提交到進程池"""
+        if self.jobs <= 1 or len(items) < 2:
+            return [func(item) for item in items]
         
-        return matched_files
+        executor = self._shared_executor
+        if executor is None:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.jobs)
+            executor = self._executor
+        # 每個工作進程約分到4個批次，兼顧負載均衡和IPC開銷
+        chunksize = max(1, len(items) // (self.jobs * 4))
+        return list(executor.map(func, items, chunksize=chunksize))
+    
+    def close(self):
+        """關閉進程池和git cat-file進程"""
+        if self.revision is not None:
+            self.revision.close()
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+    
+    def get_inventory(self) -> FileInventory:
+        """獲取共享文件清單，首次使用時遍歷一次目錄樹"""
+        if self.inventory is None:
+            with self.metrics.phase('walk') as phase:
+                patterns = DEFAULT_PATTERNS + ARCHIVE_PATTERNS if self.archives else None
+                self.inventory = FileInventory(self.project_path, patterns=patterns,
+                                               ignore=self.ignore).scan()
+                phase.count(len(self.inventory.entries),
+                            sum(entry.size for entry in self.inventory.entries.values())
+                            if self.metrics.enabled else 0)
+        return self.inventory
     
     def run_all_validations(self) -> Dict:
         """執行所有配置驗證"""
+        print("⚙️ Starting configuration validations...")
+        try:
+            results = self.collect_results()
+        finally:
+            self.close()
+        
+        report_file = self.write_report(results)
+        print(f"\n✅ Configuration validation completed. Report saved to {report_file}")
+        
+        return results
+    
+    def write_report(self, results: Dict) -> str:
+        """保存報告（及Prometheus指標文件），返回報告路徑"""
+        report_file = os.path.join(self.reports_dir, 'validation-report.json')
+        with self.metrics.phase('report_write') as phase:
+            with open(report_file, 'w') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+                phase.count(1, f.tell())
+        
+        if self.metrics_file:
+            self.metrics.write_prometheus(self.metrics_file, 'config_validator',
+                                          {'project': os.path.abspath(self.project_path)})
+        return report_file
+    
+    def collect_results(self, verbose: bool = True, save_cache: bool = True) -> Dict:
+        """執行所有驗證並匯總結果，不寫報告文件；watch模式每輪調用，進程池保持開啟"""
+        log = print if verbose else (lambda *args: None)
+        results = self.begin_results(log)
+        try:
+            if self.revision is not None:
+                changed = f' changed since {self.revision.diff_base}' if self.revision.diff_base else ''
+                log(f"  🌿 Validating {results['revision']['files']} files of git revision {self.revision.rev}{changed}...")
+                with self.metrics.phase('validate.revision'):
+                    results['validations'] = self.validate_revision()
+                results['revision'] = self.revision.describe()
+            else:
+                for key, message, validate in self.validation_steps():
+                    log(message)
+                    self.run_validation(results, key, validate)
+        finally:
+            # 中途出錯時也結束輸出文件，已寫出的記錄保持可讀
+            if self.report_sink is not None:
+                self.report_sink.close()
+        
+        return self.finish_results(results, log, save_cache)
+    
+    def begin_results(self, log: Callable = print) -> Dict:
+        """開始一次運行：記錄庫、預算和文件清單（或git修訂），返回待填入各項驗證的結果"""
         results = {
             'timestamp': datetime.now().isoformat(),
+            'yaml_backend': self.yaml_backend,
             'validations': {}
         }
         
-        print("⚙️ Starting configuration validations...")
-        
-        print("  📄 Validating YAML files...")
-        results['validations']['yaml'] = self.validate_yaml_files()
+        if self.findings_db is not None:
+            self.findings_run = FindingsStore(self.findings_db).begin_run(
+                'config_validator', self.project_path, self.run_label)
         
-        print("  📋 Validating JSON files...")
-        results['validations']['json'] = self.validate_json_files()
+        if self.budget is not None:
+            self.budget.start()
+            # 上次報告在本次寫報告前讀取：其寫入時間之後修改的文件和其中有問題的文件優先檢查
+            if self.revision is None:
+                self.priority = FilePriority.from_reports(
+                    self.project_path, os.path.join(self.reports_dir, 'validation-report.json'),
+                    [os.path.join(self.reports_dir, name) for name in
+                     ('validation-report.json', 'validation-findings.ndjson', 'validation-findings.ndjson.gz')],
+                    separator=ARCHIVE_SEPARATOR)
         
-        print("  🐳 Validating Docker Compose...")
-        results['validations']['docker_compose'] = self.validate_docker_compose()
+        if self.revision is not None:
+            log("  🌿 Listing files of the git revision...")
+            with self.metrics.phase('walk'):
+                results['revision'] = self.revision.describe()
+        else:
+            log("  🗂️ Building file inventory...")
+            inventory = self.get_inventory()
+            results['inventory'] = {
+                'files': len(inventory.entries),
+                'directories_scanned': inventory.directories_scanned,
+                'directories_pruned': inventory.directories_pruned,
+                'ignore_sources': self.ignore.sources
+            }
+        return results
+    
+    def validation_steps(self) -> List[Tuple[str, str, Callable[[], Dict]]]:
+        """目錄模式下依次執行的驗證：(結果鍵, 提示, 驗證函數)；各項共用解析緩存，必須按順序執行"""
+        validations = [
+            ('yaml', "  📄 Validating YAML files...", self.validate_yaml_files),
+            ('json', "  📋 Validating JSON files...", self.validate_json_files),
+            ('docker_compose', "  🐳 Validating Docker Compose...", self.validate_docker_compose),
+            ('kubernetes', "  ☸️ Validating Kubernetes manifests...", self.validate_kubernetes_manifests),
+            ('env_files', "  🔐 Validating environment files...", self.validate_env_files)
+        ]
+        if self.secret_scan:
+            validations.append(('secrets', "  🔑 Scanning configuration files for secrets...",
+                                self.validate_secrets))
+        if self.archives:
+            validations.append(('archives', "  📦 Validating configuration files inside archives...",
+                                self.validate_archives))
+        return validations
+    
+    def run_validation(self, results: Dict, key: str, validate: Callable[[], Dict]):
+        with self.metrics.phase(f'validate.{key}'):
+            results['validations'][key] = validate()
+    
+    def finish_results(self, results: Dict, log: Callable = print, save_cache: bool = True) -> Dict:
+        """結束一次運行：寫入緩存和記錄庫，生成摘要"""
+        if self.report_sink is not None:
+            self.report_sink.close()
         
-        print("  ☸️ Validating Kubernetes manifests...")
-        results['validations']['kubernetes'] = self.validate_kubernetes_manifests()
+        results['parse_cache'] = self.document_cache.stats()
+        # 本進程中已編譯的結構驗證函數（按apiVersion/kind緩存）
+        results['schema_validators'] = {name: load_registry(path).stats() for name, path in
+                                        (('kubernetes', KUBERNETES_SCHEMA_FILE), ('compose', COMPOSE_SCHEMA_FILE))}
+        if self.dedup is not None and self.revision is None:
+            results['deduplication'] = self.dedup.stats()
+            dedup = results['deduplication']
+            log(f"  ♻️ {dedup['files']} files, {dedup['unique']} distinct contents checked, "
+                f"{dedup['parses_saved']} parses saved")
+        if self.validation_cache is not None:
+            if save_cache:
+                self.validation_cache.save()
+            results['validation_cache'] = self.validation_cache.stats()
         
-        print("  🔐 Validating environment files...")
-        results['validations']['env_files'] = self.validate_env_files()
+        # 生成總體摘要；流式報告時直接使用寫出時累計的計數
+        if self.report_sink is not None:
+            results['report_stream'] = self.report_sink.stats()
+            by_level = self.report_sink.by_level
+            results['summary'] = {
+                'total_errors': by_level['error'],
+                'total_warnings': by_level['warning'] + by_level['note'],
+                'passed': by_level['error'] == 0
+            }
+        else:
+            results['summary'] = self._generate_validation_summary(results['validations'])
         
-        # 生成總體摘要
-        results['summary'] = self._generate_validation_summary(results['validations'])
+        # 有基線時只有新增的錯誤導致失敗
+        if self.findings_run is not None:
+            results['findings_store'] = self.findings_run.complete('config_validator', self.baseline)
+            self.findings_run = None
+            apply_baseline(results['summary'], results['findings_store'], log)
         
-        # 保存報告
-        report_file = os.path.join(self.reports_dir, 'validation-report.json')
-        with open(report_file, 'w') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+        # 截斷的部分報告不能判定為通過
+        if self.budget is not None:
+            results['budget'] = self.budget.stats()
+            if self.budget.truncated:
+                results['summary']['truncated'] = True
+                results['summary']['passed'] = False
+                limit = (f"{self.budget.max_errors} errors" if self.budget.reason == 'max_errors'
+                         else f"{self.budget.time_budget}s")
+                log(f"  ⏱️ Budget of {limit} exhausted after {results['budget']['elapsed']}s, "
+                    f"{sum(self.budget.skipped.values())} file checks not run on "
+                    f"{results['budget']['skipped_files']} files")
         
-        print(f"\n✅ Configuration validation completed. Report saved to {report_file}")
+        # 寫報告本身的耗時只能計入Prometheus指標文件
+        if self.metrics.enabled:
+            results['metrics'] = self.metrics.to_dict()
         
         return results
     
+    def reset_run_state(self):
+        """watch模式開始新一輪驗證前調用：清空本輪的解析緩存、去重表和階段計時，
+        文件清單、進程池和持久緩存保留"""
+        self.document_cache = DocumentCache(self.yaml_loader)
+        if self.dedup is not None:
+            self.dedup = ContentDeduplicator()
+        self.metrics = Instrumentation(self.metrics.enabled)
+        if self.validation_cache is not None:
+            self.validation_cache.new_run()
+    
     def _generate_validation_summary(self, validations: Dict) -> Dict:
         """生成驗證摘要"""
         total_errors = 0
@@ -328,6 +1135,8 @@ class ConfigValidator:
                 total_errors += len(validation_result['errors'])
             if 'warnings' in validation_result:
                 total_warnings += len(validation_result['warnings'])
+            if 'findings' in validation_result:
+                total_warnings += len(validation_result['findings'])
             if 'issues' in validation_result:
                 for issue in validation_result['issues']:
                     if issue.get('type') == 'security_warning':
@@ -344,16 +1153,137 @@ class ConfigValidator:
 
 if __name__ == "__main__":
     import sys
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Configuration file validation tool')
+    parser.add_argument('project_path', nargs='?', default='.')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='Parse files in N worker processes (0 = all CPU cores)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Revalidate every file instead of reusing reports/config/validation-cache.json')
+    parser.add_argument('--yaml-backend', choices=YAML_BACKENDS, default='auto',
+                        help='YAML parser backend (auto prefers libyaml when available)')
+    parser.add_argument('--syntax-only', action='store_true',
+                        help='Check YAML/JSON syntax with streaming parsers instead of loading documents')
+    parser.add_argument('--stream-threshold-mb', type=float,
+                        default=DEFAULT_STREAM_THRESHOLD / (1024 * 1024),
+                        help='Files at least this large are always syntax-checked in streaming mode')
+    parser.add_argument('--metrics-file',
+                        help='Also write per-phase metrics to this Prometheus textfile-collector file')
+    parser.add_argument('--no-instrumentation', action='store_true',
+                        help='Do not record per-phase timing and resource metrics')
+    parser.add_argument('--no-secret-scan', action='store_true',
+                        help='Skip secret detection in YAML/JSON/.env files')
+    parser.add_argument('--entropy-threshold', type=float, default=DEFAULT_ENTROPY_THRESHOLD,
+                        help='Bits per character above which a sensitive value is reported as high-entropy')
+    parser.add_argument('--ignore', action='append', default=[], metavar='PATTERN',
+                        help='Extra .gitignore-style pattern to skip (repeatable; highest precedence)')
+    parser.add_argument('--ignore-file',
+                        help=f'Read ignore patterns from this file instead of <project>/{PROJECT_IGNORE_FILE}')
+    parser.add_argument('--no-gitignore', action='store_true',
+                        help='Do not apply .gitignore files found during the walk '
+                             '(.env* files are never excluded by .gitignore)')
+    parser.add_argument('--archives', action='store_true',
+                        help='Also validate YAML/JSON/.env files inside zip and tar archives without extracting them')
+    parser.add_argument('--stream-report', action='store_true',
+                        help='Append findings to reports/config/validation-findings.ndjson as they are produced '
+                             'and keep only counts in validation-report.json')
+    parser.add_argument('--gzip-report', action='store_true',
+                        help='Gzip-compress the --stream-report NDJSON file')
+    parser.add_argument('--sarif', action='store_true',
+                        help='Stream findings to reports/config/validation-report.sarif (SARIF 2.1.0)')
+    parser.add_argument('--no-dedup', action='store_true',
+                        help='Check every file separately instead of once per distinct file content')
+    parser.add_argument('--findings-db', action='store_true',
+                        help='Record every finding of this run in reports/findings.db (query it with findings_store.py)')
+    parser.add_argument('--run-label',
+                        help='Label this run in the findings database (e.g. the branch name) so it can be used as a baseline')
+    parser.add_argument('--baseline', metavar='RUN',
+                        help='Fail only on error findings that are new since this run (id, label, latest or latest~N); '
+                             'implies --findings-db')
+    parser.add_argument('--rev', metavar='REV',
+                        help='Validate the files of this git revision read from the object database '
+                             'instead of the working tree (default with --diff-base: HEAD)')
+    parser.add_argument('--diff-base', metavar='REV',
+                        help='Only validate files added or modified since the merge base of REV and --rev')
+    parser.add_argument('--max-errors', type=int, metavar='N',
+                        help='Stop as soon as N errors have been found and write a partial report marked as truncated')
+    parser.add_argument('--time-budget', type=float, metavar='SECONDS',
+                        help='Stop checking files once this many seconds have passed and write a partial report '
+                             'marked as truncated')
+    parser.add_argument('--watch', action='store_true',
+                        help='Keep running: revalidate changed files and serve the report over a Unix socket '
+                             '(query it with watch_daemon.py)')
+    parser.add_argument('--socket',
+                        help='Unix socket path for --watch (default: <project>/reports/config/watch.sock)')
+    parser.add_argument('--debounce', type=float, default=0.2,
+                        help='Seconds without file events before --watch revalidates')
+    parser.add_argument('--poll', action='store_true',
+                        help='Detect changes by periodic stat polling instead of inotify')
+    parser.add_argument('--poll-interval', type=float, default=2.0,
+                        help='Seconds between polls when inotify is not used')
+    args = parser.parse_args()
+    if args.metrics_file and args.no_instrumentation:
+        parser.error('--metrics-file requires instrumentation')
+    if args.gzip_report and not args.stream_report:
+        parser.error('--gzip-report requires --stream-report')
+    if args.watch and (args.stream_report or args.sarif):
+        parser.error('--watch serves the report over its socket and cannot be combined with --stream-report/--sarif')
+    if args.watch and (args.findings_db or args.run_label or args.baseline):
+        parser.error('--watch does not record runs in the findings database')
+    if args.run_label and not (args.findings_db or args.baseline):
+        parser.error('--run-label requires --findings-db')
+    if (args.rev or args.diff_base) and (args.watch or args.archives):
+        parser.error('--rev/--diff-base cannot be combined with --watch or --archives')
+    if args.max_errors is not None and args.max_errors < 1:
+        parser.error('--max-errors must be at least 1')
+    if args.time_budget is not None and args.time_budget <= 0:
+        parser.error('--time-budget must be positive')
+    if (args.max_errors is not None or args.time_budget is not None) and (args.watch or args.baseline):
+        parser.error('--max-errors/--time-budget cannot be combined with --watch or --baseline')
+    
+    make_ignore = partial(IgnoreRules.for_project, args.project_path, patterns=args.ignore,
+                          ignore_file=args.ignore_file, use_gitignore=not args.no_gitignore)
+    ignore = make_ignore()
+    validator = ConfigValidator(args.project_path, jobs=args.jobs, use_cache=not args.no_cache,
+                                yaml_backend=args.yaml_backend, syntax_only=args.syntax_only,
+                                stream_threshold=int(args.stream_threshold_mb * 1024 * 1024),
+                                instrument=not args.no_instrumentation,
+                                metrics_file=args.metrics_file,
+                                secret_scan=not args.no_secret_scan,
+                                entropy_threshold=args.entropy_threshold,
+                                ignore=ignore, archives=args.archives,
+                                stream_report=args.stream_report, sarif=args.sarif,
+                                compress_report=args.gzip_report, dedup=not args.no_dedup,
+                                findings_db=default_db_path(args.project_path)
+                                if args.findings_db or args.baseline else None,
+                                run_label=args.run_label, baseline=args.baseline,
+                                revision=args.rev, diff_base=args.diff_base,
+                                max_errors=args.max_errors, time_budget=args.time_budget)
+    if args.watch:
+        from watch_daemon import WatchDaemon
+        daemon = WatchDaemon(validator, socket_path=args.socket, ignore_factory=make_ignore,
+                             debounce=args.debounce, poll_interval=args.poll_interval,
+                             force_poll=args.poll)
+        sys.exit(daemon.serve_forever())
     
-    project_path = sys.argv[1] if len(sys.argv) > 1 else '.'
-    validator = ConfigValidator(project_path)
-    results = validator.run_all_validations()
+    try:
+        results = validator.run_all_validations()
+    except GitError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(2)
     
     print("\n" + "="*60)
     print("Configuration Validation Summary")
     print("="*60)
     print(f"Total Errors: {results['summary']['total_errors']}")
     print(f"Total Warnings: {results['summary']['total_warnings']}")
+    if 'new_errors' in results['summary']:
+        print(f"New Errors: {results['summary']['new_errors']}")
+    if results['summary'].get('truncated'):
+        budget = results['budget']
+        print(f"Truncated: {budget['reason']} ({sum(budget['skipped'].values())} file checks not run "
+              f"on {budget['skipped_files']} files)")
     print(f"Status: {'✅ PASSED' if results['summary']['passed'] else '❌ FAILED'}")
     
     sys.exit(0 if results['summary']['passed'] else 1)
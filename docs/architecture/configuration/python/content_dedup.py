@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# content_dedup.py - Content-addressed grouping of byte-identical files
+
+import hashlib
+from typing import Dict, List, Optional, Sequence
+
+
+_READ_SIZE = 1 << 20
+
+
+def hash_file(path: str) -> str:
+    """文件內容的BLAKE2b摘要（160位）"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_READ_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ContentDeduplicator:
+    """內容去重 - 字節相同的文件歸為一組，每組只檢查第一個文件
+
+    先按大小分桶：大小唯一的文件不可能與其他文件相同，不需要讀取；
+    只有大小相同的文件才計算哈希，空文件直接歸為一組。
+    已知內容鍵時（持久緩存已計算）直接按鍵分組，不再讀取文件。
+    """
+
+    def __init__(self):
+        # 檢查名 -> {files, unique, parses_saved, hashed_files}
+        self.checks: Dict[str, Dict] = {}
+        # 同一文件在多項檢查中出現時（如YAML語法和密鑰檢測）只計算一次哈希
+        self._digests: Dict[str, str] = {}
+
+    def group(self, check: str, paths: List[str], sizes: Sequence[Optional[int]],
+              keys: Optional[Sequence[Optional[str]]] = None) -> List[int]:
+        """返回每個文件所在組的代表文件下標；代表文件的值等於自身下標
+
+        無法確定內容的文件（大小未知、讀取失敗或沒有內容鍵）自成一組。
+        """
+        owners = list(range(len(paths)))
+        hashed = 0
+
+        if keys is not None:
+            by_key: Dict[str, int] = {}
+            for i, key in enumerate(keys):
+                if key is not None:
+                    owners[i] = by_key.setdefault(key, i)
+        else:
+            by_size: Dict[int, List[int]] = {}
+            for i, size in enumerate(sizes):
+                if size is not None:
+                    by_size.setdefault(size, []).append(i)
+            for size, bucket in by_size.items():
+                if len(bucket) < 2:
+                    continue
+                if size == 0:
+                    for i in bucket:
+                        owners[i] = bucket[0]
+                    continue
+                by_digest: Dict[str, int] = {}
+                for i in bucket:
+                    digest = self._digests.get(paths[i])
+                    if digest is None:
+                        try:
+                            digest = self._digests[paths[i]] = hash_file(paths[i])
+                        except OSError:
+                            continue
+                        hashed += 1
+                    owners[i] = by_digest.setdefault(digest, i)
+
+        unique = sum(1 for i, owner in enumerate(owners) if owner == i)
+        stats = self.checks.setdefault(check, {'files': 0, 'unique': 0, 'parses_saved': 0,
+                                               'hashed_files': 0})
+        stats['files'] += len(paths)
+        stats['unique'] += unique
+        stats['parses_saved'] += len(paths) - unique
+        stats['hashed_files'] += hashed
+        return owners
+
+    def stats(self) -> Dict:
+        """去重統計：各項檢查的文件數、唯一內容數和節省的解析次數"""
+        return {
+            'files': sum(s['files'] for s in self.checks.values()),
+            'unique': sum(s['unique'] for s in self.checks.values()),
+            'parses_saved': sum(s['parses_saved'] for s in self.checks.values()),
+            'hashed_files': sum(s['hashed_files'] for s in self.checks.values()),
+            'by_check': {check: dict(s) for check, s in self.checks.items()}
+        }
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# dependency_cache.py - Result cache for dependency scanners keyed by manifest and lockfile contents
+
+import fnmatch
+import hashlib
+import json
+import os
+import time
+from typing import Dict, Iterable, List, Optional
+
+
+# 緩存文件格式變化時遞增
+CACHE_FORMAT_VERSION = 1
+
+# 未指定漏洞庫時間戳時，緩存結果的默認有效期（秒）
+DEFAULT_ADVISORY_TTL = 24 * 3600
+
+
+class DependencyScanCache:
+    """依賴掃描結果緩存 - 以依賴清單/鎖文件內容、工具版本和漏洞庫時間戳為鍵"""
+
+    def __init__(self, cache_file: str, advisory_ttl: float = DEFAULT_ADVISORY_TTL,
+                 advisory_stamp: Optional[str] = None):
+        self.cache_file = cache_file
+        self.advisory_ttl = advisory_ttl
+        self.explicit_stamp = advisory_stamp
+        # 工具名 -> {key, stdout, stored_at}
+        self.entries: Dict[str, Dict] = {}
+        # 工具名 -> 'hit' | 'miss'
+        self.outcomes: Dict[str, str] = {}
+
+    def load(self) -> 'DependencyScanCache':
+        """讀取緩存文件，格式不符或損壞時從空緩存開始"""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+
+        if isinstance(data, dict) and data.get('format') == CACHE_FORMAT_VERSION:
+            self.entries = data.get('entries', {})
+        return self
+
+    def advisory_stamp(self) -> str:
+        """漏洞庫新鮮度標記：顯式指定的時間戳，或按有效期劃分的時間窗口"""
+        if self.explicit_stamp:
+            return self.explicit_stamp
+        return f'ttl{int(self.advisory_ttl)}:{int(time.time() // self.advisory_ttl)}'
+
+    def make_key(self, tool: str, tool_version: str, files: Iterable[str],
+                 extra: Iterable[str] = ()) -> str:
+        """由工具、版本、漏洞庫時間戳和依賴文件內容計算緩存鍵"""
+        digest = hashlib.blake2b(digest_size=20)
+        for part in (tool, tool_version, self.advisory_stamp()):
+            digest.update(part.encode('utf-8') + b'\0')
+        for path in sorted(files):
+            digest.update(os.path.basename(path).encode('utf-8') + b'\0')
+            with open(path, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(chunk)
+            digest.update(b'\0')
+        for item in extra:
+            digest.update(item.encode('utf-8') + b'\0')
+        return digest.hexdigest()
+
+    def get(self, tool: str, key: str) -> Optional[str]:
+        """返回緩存的工具輸出，未命中時返回None"""
+        entry = self.entries.get(tool)
+        if entry is None or entry.get('key') != key:
+            self.outcomes[tool] = 'miss'
+            return None
+        self.outcomes[tool] = 'hit'
+        return entry['stdout']
+
+    def put(self, tool: str, key: str, stdout: str):
+        """記錄工具輸出並立即寫回磁盤"""
+        self.entries[tool] = {'key': key, 'stdout': stdout, 'stored_at': time.time()}
+        self.save()
+
+    def save(self):
+        data = {'format': CACHE_FORMAT_VERSION, 'entries': self.entries}
+        tmp_file = self.cache_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_file, self.cache_file)
+
+    def stats(self) -> Dict:
+        """緩存命中統計"""
+        hits = sorted(tool for tool, outcome in self.outcomes.items() if outcome == 'hit')
+        misses = sorted(tool for tool, outcome in self.outcomes.items() if outcome == 'miss')
+        return {
+            'hits': len(hits),
+            'misses': len(misses),
+            'advisory_stamp': self.advisory_stamp(),
+            'tools': dict(sorted(self.outcomes.items()))
+        }
+
+
+def find_dependency_files(project_path: str, patterns: List[str]) -> List[str]:
+    """列出項目根目錄下匹配的依賴清單和鎖文件"""
+    try:
+        names = os.listdir(project_path)
+    except OSError:
+        return []
+    return sorted(os.path.join(project_path, name) for name in names
+                  if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)
+                  and os.path.isfile(os.path.join(project_path, name)))
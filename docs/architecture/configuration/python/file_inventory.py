@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# file_inventory.py - Single-pass file inventory shared by the validation tools
+
+import os
+import re
+import fnmatch
+from typing import Dict, List, NamedTuple, Optional
+
+from ignore_rules import DEFAULT_IGNORE_PATTERNS, IgnoreRules
+
+
+# 預設登記的文件模式
+DEFAULT_PATTERNS = ['*.yml', '*.yaml', '*.json', '.env*', '*.py']
+
+# 排除常見的依賴目錄
+DEFAULT_EXCLUDED_DIRS = [pattern.rstrip('/') for pattern in DEFAULT_IGNORE_PATTERNS]
+
+
+class FileEntry(NamedTuple):
+    """清單中的單個文件及其stat數據"""
+    path: str
+    size: int
+    mtime_ns: int
+    dir_seq: int
+
+
+class FileInventory:
+    """文件清單 - 一次目錄遍歷，按模式分桶"""
+
+    def __init__(self, root: str, patterns: Optional[List[str]] = None,
+                 excluded_dirs: Optional[List[str]] = None, ignore: Optional[IgnoreRules] = None):
+        self.root = root
+        self.patterns = list(patterns or DEFAULT_PATTERNS)
+        self.excluded_dirs = set(DEFAULT_EXCLUDED_DIRS if excluded_dirs is None else excluded_dirs)
+        # 忽略規則在遍歷時判斷，被忽略的目錄整體剪枝；未指定時只排除excluded_dirs
+        self.ignore = ignore if ignore is not None else IgnoreRules(
+            defaults=[f'{d}/' for d in sorted(self.excluded_dirs)])
+        self.buckets: Dict[str, List[FileEntry]] = {p: [] for p in self.patterns}
+        self.entries: Dict[str, FileEntry] = {}
+        # 遍歷到的目錄（不含剪枝的目錄），watch模式據此設置監視
+        self.directories: List[str] = []
+        self.directories_scanned = 0
+        self.directories_pruned = 0
+        self._matchers = [(p, re.compile(fnmatch.translate(p)).match) for p in self.patterns]
+        self._scanned = False
+
+    def scan(self) -> 'FileInventory':
+        """遍歷目錄樹一次，將匹配的文件放入各模式的桶中"""
+        self.buckets = {p: [] for p in self.patterns}
+        self.entries = {}
+        self.directories = []
+        dir_seq = 0
+        pruned = 0
+        ignored = self.ignore.match
+        # (目錄路徑, 相對於根目錄、以/結尾的路徑)
+        stack = [(self.root, '')]
+
+        while stack:
+            current, rel_dir = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    children = list(it)
+            except OSError:
+                continue
+            self.directories.append(current)
+
+            # 先讀取本目錄的.gitignore，其規則作用於本目錄的所有條目
+            if self.ignore.use_gitignore:
+                for child in children:
+                    if child.name == '.gitignore':
+                        self.ignore.load_gitignore(child.path, rel_dir)
+                        break
+
+            subdirs = []
+            for child in children:
+                try:
+                    is_dir = child.is_dir()
+                except OSError:
+                    is_dir = False
+
+                if is_dir:
+                    # 與os.walk一致：不進入符號鏈接目錄
+                    if child.is_symlink():
+                        continue
+                    if ignored(rel_dir, child.name, True):
+                        pruned += 1
+                        continue
+                    subdirs.append((child.path, f'{rel_dir}{child.name}/'))
+                    continue
+
+                entry = None
+                for pattern, match in self._matchers:
+                    if match(child.name) is None:
+                        continue
+                    if entry is None:
+                        # 只對匹配模式的文件判斷忽略規則
+                        if ignored(rel_dir, child.name, False):
+                            break
+                        try:
+                            st = child.stat()
+                        except OSError:
+                            break
+                        entry = FileEntry(child.path, st.st_size, st.st_mtime_ns, dir_seq)
+                        self.entries[child.path] = entry
+                    self.buckets[pattern].append(entry)
+
+            dir_seq += 1
+            # 反向入棧以保持os.walk的自上而下順序
+            stack.extend(reversed(subdirs))
+
+        self.directories_scanned = dir_seq
+        self.directories_pruned = pruned
+        self._scanned = True
+        return self
+
+    def get(self, path: str) -> Optional[FileEntry]:
+        """按路徑查找清單中的文件"""
+        self._ensure_scanned()
+        return self.entries.get(path)
+
+    def find(self, patterns: List[str], directories: Optional[List[str]] = None) -> List[FileEntry]:
+        """按模式和目錄查詢清單，順序與os.walk遍歷一致"""
+        self._ensure_scanned()
+        missing = [p for p in patterns if p not in self.buckets]
+        if missing:
+            raise ValueError(f'Patterns not registered in inventory: {missing}')
+
+        if directories is None:
+            prefixes = None
+        else:
+            prefixes = []
+            for directory in directories:
+                full_dir = directory if os.path.isabs(directory) else os.path.join(self.root, directory)
+                prefixes.append(full_dir.rstrip(os.sep) + os.sep)
+
+        matched = []
+        for prefix in prefixes or [None]:
+            selected = []
+            for pattern in patterns:
+                for entry in self.buckets[pattern]:
+                    if prefix is None or entry.path.startswith(prefix):
+                        selected.append(entry)
+            # 穩定排序：同一目錄內保持模式順序
+            selected.sort(key=lambda e: e.dir_seq)
+            matched.extend(selected)
+        return matched
+
+    def matches(self, name: str) -> bool:
+        """文件名是否匹配任一登記的模式"""
+        return any(match(name) is not None for _, match in self._matchers)
+
+    def refresh(self, path: str) -> bool:
+        """重新讀取已登記文件的stat數據，文件已刪除時從清單移除
+
+        不在清單中的文件返回False：新文件需要判斷忽略規則和遍歷順序，由調用方重新遍歷。
+        """
+        self._ensure_scanned()
+        old = self.entries.get(path)
+        if old is None:
+            return False
+        try:
+            st = os.stat(path)
+            new = old._replace(size=st.st_size, mtime_ns=st.st_mtime_ns)
+        except OSError:
+            new = None
+
+        name = os.path.basename(path)
+        for pattern, match in self._matchers:
+            if match(name) is None:
+                continue
+            bucket = self.buckets[pattern]
+            i = bucket.index(old)
+            if new is None:
+                del bucket[i]
+            else:
+                bucket[i] = new
+        if new is None:
+            del self.entries[path]
+        else:
+            self.entries[path] = new
+        return True
+
+    def files(self, patterns: List[str], directories: Optional[List[str]] = None) -> List[str]:
+        """按模式和目錄查詢文件路徑"""
+        return [entry.path for entry in self.find(patterns, directories)]
+
+    def has_files(self, pattern: str) -> bool:
+        """檢查某模式的桶是否非空"""
+        self._ensure_scanned()
+        return bool(self.buckets.get(pattern))
+
+    def _ensure_scanned(self):
+        if not self._scanned:
+            self.scan()
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+# findings_store.py - SQLite history of findings with run-to-run diffs and baselines
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from report_sink import message_position
+
+
+STORE_VERSION = 1
+
+# 兩個工具共用 <project>/reports/findings.db，按工具區分運行
+DEFAULT_DB_NAME = 'findings.db'
+
+# 每個事務插入的記錄數
+INSERT_BATCH = 5000
+
+# SQLite頁緩存大小（KiB）
+CACHE_KIB = 65536
+
+DIFF_KINDS = ('new', 'fixed', 'unchanged')
+
+# 指紋忽略錯誤信息中的行列號，文件中插入或刪除行後同一問題仍能對應
+_POSITIONS = re.compile(r'line \d+(,? column \d+)?( \(char \d+\))?')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    tool TEXT NOT NULL,
+    project TEXT NOT NULL,
+    label TEXT,
+    started_at TEXT NOT NULL,
+    finished_at TEXT,
+    findings INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS runs_tool_label ON runs(tool, label, id);
+CREATE TABLE IF NOT EXISTS findings (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    fingerprint INTEGER NOT NULL,
+    rule TEXT NOT NULL,
+    level TEXT NOT NULL,
+    severity TEXT,
+    file TEXT,
+    line INTEGER,
+    message TEXT
+);
+CREATE INDEX IF NOT EXISTS findings_run_fingerprint ON findings(run_id, fingerprint);
+CREATE INDEX IF NOT EXISTS findings_file ON findings(file, run_id);
+CREATE INDEX IF NOT EXISTS findings_rule ON findings(rule, run_id);
+CREATE INDEX IF NOT EXISTS findings_severity ON findings(level, severity, run_id);
+"""
+
+_COLUMNS = 'rule, level, severity, file, line, message'
+
+# 比較兩次運行：new為head中有、base中沒有的指紋，fixed相反，unchanged為兩者都有
+_DIFF_QUERIES = {
+    'new': (f'SELECT {_COLUMNS} FROM findings h WHERE h.run_id = :head AND NOT EXISTS '
+            f'(SELECT 1 FROM findings b WHERE b.run_id = :base AND b.fingerprint = h.fingerprint)'),
+    'fixed': (f'SELECT {_COLUMNS} FROM findings b WHERE b.run_id = :base AND NOT EXISTS '
+              f'(SELECT 1 FROM findings h WHERE h.run_id = :head AND h.fingerprint = b.fingerprint)'),
+    'unchanged': (f'SELECT {_COLUMNS} FROM findings h WHERE h.run_id = :head AND EXISTS '
+                  f'(SELECT 1 FROM findings b WHERE b.run_id = :base AND b.fingerprint = h.fingerprint)')
+}
+
+
+def default_db_path(project_path: str) -> str:
+    return os.path.join(project_path, 'reports', DEFAULT_DB_NAME)
+
+
+class FindingsStore:
+    """發現記錄庫 - 每次運行的全部發現按指紋保存，可比較任意兩次運行
+
+    指紋由工具、規則、相對路徑和去掉行列號的信息計算，同一文件中相同的發現按出現順序編號；
+    查詢只依賴 (run_id, fingerprint) 索引，與歷史記錄總量無關。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # 安全掃描的並發模式可能在其他線程中寫入，寫入由FindingsRun加鎖
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('PRAGMA foreign_keys=ON')
+        # 按文件、規則索引的插入位置分散在整棵索引樹中，較大的頁緩存避免歷史變長後插入變慢
+        self._conn.execute(f'PRAGMA cache_size=-{CACHE_KIB}')
+        version = self._conn.execute('PRAGMA user_version').fetchone()[0]
+        if version not in (0, STORE_VERSION):
+            raise ValueError(f'Unsupported findings store version {version}: {path}')
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute(f'PRAGMA user_version={STORE_VERSION}')
+
+    def begin_run(self, tool: str, project: str, label: Optional[str] = None) -> 'FindingsRun':
+        """開始記錄一次運行；finish()之前該運行不會被當作基線"""
+        with self._conn:
+            cursor = self._conn.execute(
+                'INSERT INTO runs (tool, project, label, started_at) VALUES (?, ?, ?, ?)',
+                (tool, os.path.abspath(project), label, datetime.now().isoformat()))
+        return FindingsRun(self, cursor.lastrowid, project)
+
+    def resolve_run(self, tool: str, ref: str, before: Optional[int] = None) -> Optional[int]:
+        """把運行引用解析為運行ID
+
+        引用可以是數字ID、latest（最近一次完成的運行）、latest~N（之前第N次），
+        或標籤（該標籤最近一次完成的運行）；給出before時只考慮更早的運行。找不到時返回None。
+        """
+        limit = before if before is not None else -1
+        if ref.isdigit():
+            row = self._conn.execute(
+                'SELECT id FROM runs WHERE id = ? AND tool = ? AND finished_at IS NOT NULL AND (? < 0 OR id < ?)',
+                (int(ref), tool, limit, limit)).fetchone()
+            return row[0] if row else None
+
+        match = re.fullmatch(r'latest(?:~(\d+))?', ref)
+        if match:
+            row = self._conn.execute(
+                'SELECT id FROM runs WHERE tool = ? AND finished_at IS NOT NULL AND (? < 0 OR id < ?) '
+                'ORDER BY id DESC LIMIT 1 OFFSET ?',
+                (tool, limit, limit, int(match.group(1) or 0))).fetchone()
+        else:
+            row = self._conn.execute(
+                'SELECT id FROM runs WHERE tool = ? AND label = ? AND finished_at IS NOT NULL AND (? < 0 OR id < ?) '
+                'ORDER BY id DESC LIMIT 1', (tool, ref, limit, limit)).fetchone()
+        return row[0] if row else None
+
+    def runs(self, tool: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """最近的運行，新的在前"""
+        query = 'SELECT id, tool, project, label, started_at, finished_at, findings FROM runs'
+        params: Tuple = ()
+        if tool is not None:
+            query += ' WHERE tool = ?'
+            params = (tool,)
+        rows = self._conn.execute(query + ' ORDER BY id DESC LIMIT ?', params + (limit,)).fetchall()
+        keys = ('id', 'tool', 'project', 'label', 'started_at', 'finished_at', 'findings')
+        return [dict(zip(keys, row)) for row in rows]
+
+    def diff(self, base: int, head: int, kind: str, limit: Optional[int] = None) -> List[Dict]:
+        """列出兩次運行之間新增（new）、已修復（fixed）或未變化（unchanged）的發現"""
+        query = _DIFF_QUERIES[kind] + ' ORDER BY file, line, rule'
+        if limit is not None:
+            query += f' LIMIT {int(limit)}'
+        keys = ('rule', 'level', 'severity', 'file', 'line', 'message')
+        return [dict(zip(keys, row)) for row in self._conn.execute(query, {'base': base, 'head': head})]
+
+    def diff_counts(self, base: int, head: int) -> Dict:
+        """兩次運行之間各類發現的數量；new另按級別計數"""
+        counts = {}
+        for kind in DIFF_KINDS:
+            counts[kind] = self._conn.execute(
+                f'SELECT COUNT(*) FROM ({_DIFF_QUERIES[kind]})', {'base': base, 'head': head}).fetchone()[0]
+        counts['new_by_level'] = dict(self._conn.execute(
+            f'SELECT level, COUNT(*) FROM ({_DIFF_QUERIES["new"]}) GROUP BY level',
+            {'base': base, 'head': head}).fetchall())
+        return counts
+
+    def compare_with_baseline(self, tool: str, run_id: int, baseline: str) -> Dict:
+        """把本次運行與之前的基線運行比較（latest即上一次運行）；找不到基線時所有發現都算新增"""
+        base = self.resolve_run(tool, baseline, before=run_id)
+        if base is not None:
+            counts = self.diff_counts(base, run_id)
+        else:
+            by_level = dict(self._conn.execute(
+                'SELECT level, COUNT(*) FROM findings WHERE run_id = ? GROUP BY level', (run_id,)).fetchall())
+            counts = {'new': sum(by_level.values()), 'fixed': 0, 'unchanged': 0, 'new_by_level': by_level}
+        return {'baseline': baseline, 'baseline_run': base, 'run': run_id, **counts}
+
+    def prune(self, tool: str, keep: int) -> int:
+        """每個工具只保留最近keep次運行（基線標籤的最新運行總是保留），返回刪除的運行數"""
+        with self._conn:
+            cursor = self._conn.execute(
+                'DELETE FROM runs WHERE tool = :tool AND id NOT IN '
+                '(SELECT id FROM runs WHERE tool = :tool ORDER BY id DESC LIMIT :keep) '
+                'AND id NOT IN (SELECT MAX(id) FROM runs WHERE tool = :tool AND label IS NOT NULL '
+                'AND finished_at IS NOT NULL GROUP BY label)',
+                {'tool': tool, 'keep': keep})
+        return cursor.rowcount
+
+    def close(self):
+        self._conn.close()
+
+
+class FindingsRun:
+    """一次運行的寫入器：記錄先緩衝，每INSERT_BATCH條在一個事務中批量插入"""
+
+    def __init__(self, store: FindingsStore, run_id: int, project: str):
+        self.store = store
+        self.run_id = run_id
+        self.root = os.path.abspath(project)
+        self.count = 0
+        self._pending: List[Tuple] = []
+        # 指紋基礎鍵 -> 已出現次數
+        self._occurrences: Dict[bytes, int] = {}
+        self._paths: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def add(self, rule: str, level: str, message: str, file: Optional[str] = None,
+            line: Optional[int] = None, severity: Optional[str] = None):
+        """記錄一條發現；未給出行號時從信息中提取"""
+        file = self._relative(file) if isinstance(file, str) else None
+        if not isinstance(line, int):
+            line = message_position(message)[0] if message else None
+        base = '\0'.join((rule, file or '', _POSITIONS.sub('line', message or ''))).encode('utf-8')
+
+        with self._lock:
+            occurrence = self._occurrences.get(base, 0)
+            self._occurrences[base] = occurrence + 1
+            digest = hashlib.blake2b(base + b'\0%d' % occurrence, digest_size=8).digest()
+            self._pending.append((self.run_id, int.from_bytes(digest, 'big', signed=True), rule, level,
+                                  None if severity is None else str(severity).lower(), file, line, message))
+            self.count += 1
+            if len(self._pending) >= INSERT_BATCH:
+                self._flush()
+
+    def finish(self) -> int:
+        """寫入剩餘記錄並把運行標記為完成，返回運行ID"""
+        with self._lock:
+            self._flush()
+            with self.store._conn:
+                self.store._conn.execute('UPDATE runs SET finished_at = ?, findings = ? WHERE id = ?',
+                                         (datetime.now().isoformat(), self.count, self.run_id))
+        return self.run_id
+
+    def complete(self, tool: str, baseline: Optional[str] = None) -> Dict:
+        """結束本次運行並關閉記錄庫；指定基線時一併比較，結果寫入報告"""
+        try:
+            record = {'path': self.store.path, 'run': self.finish(), 'findings': self.count}
+            if baseline is not None:
+                record['baseline'] = self.store.compare_with_baseline(tool, self.run_id, baseline)
+        finally:
+            self.store.close()
+        return record
+
+    def _flush(self):
+        if not self._pending:
+            return
+        with self.store._conn:
+            self.store._conn.executemany('INSERT INTO findings VALUES (?, ?, ?, ?, ?, ?, ?, ?)', self._pending)
+        self._pending = []
+
+    def _relative(self, file: str) -> str:
+        """項目內的文件記錄為相對路徑，不同檢出目錄的運行可以比較"""
+        relative = self._paths.get(file)
+        if relative is None:
+            # 報告中的路徑通常帶項目路徑前綴（相對當前目錄），部分工具給出相對項目根的路徑
+            prefix = self.root + os.sep
+            path = os.path.abspath(file)
+            if not path.startswith(prefix):
+                path = os.path.abspath(os.path.join(self.root, file))
+            relative = path[len(prefix):] if path.startswith(prefix) else file
+            self._paths[file] = relative
+        return relative
+
+
+def apply_baseline(summary: Dict, record: Dict, log: Callable = print):
+    """按基線比較結果改寫摘要：passed只取決於新增的錯誤級發現"""
+    baseline = record.get('baseline')
+    if baseline is None:
+        return
+    summary['new_findings'] = baseline['new']
+    summary['new_errors'] = baseline['new_by_level'].get('error', 0)
+    summary['passed'] = summary['new_errors'] == 0
+    if baseline['baseline_run'] is None:
+        log(f"  ⚠️ Baseline {baseline['baseline']} not found in {record['path']}: every finding counts as new")
+    else:
+        log(f"  🆕 {baseline['new']} new findings ({summary['new_errors']} errors), "
+            f"{baseline['fixed']} fixed since baseline {baseline['baseline']} (run {baseline['baseline_run']})")
+
+
+if __name__ == "__main__":
+    import sys
+    import argparse
+    import json
+
+    # 公共選項放在各子命令上：可選的項目路徑位置參數不能排在子命令之前
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--project', dest='project_path', default='.', help='Project directory (default: .)')
+    common.add_argument('--db', help='Findings database (default: <project>/reports/findings.db)')
+    common.add_argument('--tool', default='config_validator', choices=['config_validator', 'security_scanner'])
+
+    parser = argparse.ArgumentParser(description='Query the findings history recorded with --findings-db')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    runs_parser = commands.add_parser('runs', parents=[common], help='List recorded runs')
+    runs_parser.add_argument('--limit', type=int, default=20)
+
+    diff_parser = commands.add_parser('diff', parents=[common], help='Compare two runs')
+    diff_parser.add_argument('base', help='Run id, label, latest or latest~N')
+    diff_parser.add_argument('head', nargs='?', default='latest', help='Run id, label, latest or latest~N')
+    diff_parser.add_argument('--kind', choices=DIFF_KINDS + ('counts',), default='new')
+    diff_parser.add_argument('--limit', type=int)
+    diff_parser.add_argument('--json', action='store_true', help='Print JSON instead of one line per finding')
+
+    prune_parser = commands.add_parser('prune', parents=[common], help='Delete old runs of --tool')
+    prune_parser.add_argument('--keep', type=int, default=50, help='Number of most recent runs to keep')
+    args = parser.parse_args()
+
+    db_path = args.db or default_db_path(args.project_path)
+    if not os.path.exists(db_path):
+        print(f"No findings database at {db_path} (run the tools with --findings-db)", file=sys.stderr)
+        sys.exit(2)
+    store = FindingsStore(db_path)
+
+    if args.command == 'runs':
+        for run in store.runs(args.tool, args.limit):
+            status = run['finished_at'] or 'unfinished'
+            print(f"{run['id']:>6}  {run['started_at']}  {run['label'] or '-':<20} {run['findings']:>8} findings  {status}")
+        sys.exit(0)
+
+    if args.command == 'prune':
+        print(f"🗑️ Deleted {store.prune(args.tool, args.keep)} runs")
+        sys.exit(0)
+
+    base, head = store.resolve_run(args.tool, args.base), store.resolve_run(args.tool, args.head)
+    for ref, run_id in ((args.base, base), (args.head, head)):
+        if run_id is None:
+            print(f"Unknown {args.tool} run: {ref}", file=sys.stderr)
+            sys.exit(2)
+
+    if args.kind == 'counts':
+        print(json.dumps(store.diff_counts(base, head), indent=2))
+        sys.exit(0)
+
+    findings = store.diff(base, head, args.kind, args.limit)
+    if args.json:
+        print(json.dumps(findings, indent=2, ensure_ascii=False))
+    else:
+        for f in findings:
+            location = f"{f['file']}:{f['line']}" if f['line'] else (f['file'] or '-')
+            print(f"{f['level']:<8} {f['rule']:<32} {location}  {f['message']}")
+    # new時有新增發現則退出碼為1，可直接用於CI
+    sys.exit(1 if args.kind == 'new' and findings else 0)
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# git_revision.py - Read the files of a git revision (or its changes) through one batched cat-file process
+
+import subprocess
+import threading
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+
+# 只讀取普通文件（不含符號鏈接和子模塊）
+BLOB_MODES = {'100644', '100755'}
+
+# diff模式下讀取的改動類型：新增、修改、類型變化（刪除的文件沒有內容可檢查）
+DIFF_FILTER = 'AMT'
+
+_READ_SIZE = 1 << 20
+
+
+class GitError(Exception):
+    """git命令失敗、修訂不存在或對象無法讀取"""
+
+
+class RevisionFile(NamedTuple):
+    """修訂中的單個文件"""
+    # 相對於項目目錄、以/分隔的路徑
+    path: str
+    blob: str
+
+
+def run_git(cwd: str, *args: str) -> bytes:
+    """執行git命令並返回標準輸出，失敗時拋出GitError"""
+    try:
+        result = subprocess.run(['git', *args], cwd=cwd, capture_output=True)
+    except OSError as e:
+        raise GitError(f'Cannot run git: {e}')
+    if result.returncode != 0:
+        message = result.stderr.decode('utf-8', errors='replace').strip()
+        raise GitError(message or f'git {args[0]} exited with {result.returncode}')
+    return result.stdout
+
+
+class BlobStream:
+    """cat-file輸出中單個對象的內容，讀取不會越過對象末尾"""
+
+    def __init__(self, pipe, size: int):
+        self.pipe = pipe
+        self.remaining = size
+
+    def read(self, size: int = -1) -> bytes:
+        if self.remaining <= 0:
+            return b''
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.pipe.read(size)
+        if len(data) < size:
+            raise GitError('git cat-file output ended inside an object')
+        self.remaining -= size
+        return data
+
+    def drain(self):
+        """跳過未讀取的內容和對象後的換行符，管道停在下一個對象的頭部"""
+        while self.read(_READ_SIZE):
+            pass
+        if self.pipe.read(1) != b'\n':
+            raise GitError('Malformed git cat-file output')
+
+
+class BlobReader:
+    """一個長期運行的 git cat-file --batch 進程
+
+    請求的對象名由寫線程一次性寫入，主線程按同樣順序讀取輸出，
+    不必為每個文件啟動一個子進程，也不會因管道寫滿而互相等待。
+    """
+
+    def __init__(self, repo: str):
+        self.repo = repo
+        self.objects = 0
+        self.bytes = 0
+        self._process: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> 'BlobReader':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def iter_blobs(self, objects: List[str]) -> Iterator[Tuple[str, int, BlobStream]]:
+        """依次產出(對象名, 大小, 內容流)；內容流只在下一個對象之前有效"""
+        if not objects:
+            return
+        process = self._start()
+        writer = threading.Thread(target=self._write_requests, args=(process, objects), daemon=True)
+        writer.start()
+        completed = False
+        try:
+            for name in objects:
+                header = process.stdout.readline()
+                if not header:
+                    raise GitError('git cat-file exited unexpectedly')
+                fields = header.split()
+                if len(fields) != 3 or fields[1] != b'blob':
+                    raise GitError(f"Cannot read {name}: {header.decode('utf-8', errors='replace').strip()}")
+                size = int(fields[2])
+                stream = BlobStream(process.stdout, size)
+                yield name, size, stream
+                stream.drain()
+                self.objects += 1
+                self.bytes += size
+            completed = True
+        finally:
+            if not completed:
+                # 提前結束時管道中還有未讀取的對象：結束進程，寫線程不會阻塞
+                self._process.kill()
+                self.close()
+            writer.join()
+
+    def close(self):
+        if self._process is None:
+            return
+        try:
+            self._process.stdin.close()
+        except OSError:
+            pass
+        self._process.stdout.close()
+        self._process.wait()
+        self._process = None
+
+    def _start(self) -> subprocess.Popen:
+        if self._process is None:
+            try:
+                self._process = subprocess.Popen(['git', 'cat-file', '--batch'], cwd=self.repo,
+                                                 stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                                 stderr=subprocess.DEVNULL)
+            except OSError as e:
+                raise GitError(f'Cannot run git: {e}')
+        return self._process
+
+    @staticmethod
+    def _write_requests(process: subprocess.Popen, objects: List[str]):
+        try:
+            for name in objects:
+                process.stdin.write(name.encode('utf-8') + b'\n')
+            process.stdin.flush()
+        except (OSError, ValueError):
+            # 讀取端出錯後關閉了管道，錯誤由讀取端報告
+            pass
+
+
+class GitRevision:
+    """項目目錄在某個git修訂中的文件
+
+    未指定diff_base時為該修訂中項目目錄下的全部文件；指定時只包括diff_base與修訂的
+    合併基點之後新增或修改的文件。路徑和內容都直接從對象庫讀取，不需要檢出。
+    """
+
+    def __init__(self, project_path: str, rev: str = 'HEAD', diff_base: Optional[str] = None):
+        self.project_path = project_path
+        self.rev = rev
+        self.diff_base = diff_base
+        self.commit: Optional[str] = None
+        self.merge_base: Optional[str] = None
+        self._files: Optional[List[RevisionFile]] = None
+        self._reader: Optional[BlobReader] = None
+
+    def files(self) -> List[RevisionFile]:
+        """列出修訂中（或改動的）普通文件，首次調用時執行git命令"""
+        if self._files is None:
+            # 不在倉庫中時給出git自身的錯誤信息
+            run_git(self.project_path, 'rev-parse', '--git-dir')
+            self.commit = self._resolve(self.rev)
+            if self.diff_base is None:
+                self._files = self._tree_files()
+            else:
+                base = self._resolve(self.diff_base)
+                self.merge_base = run_git(self.project_path, 'merge-base', base,
+                                          self.commit).decode('ascii').strip()
+                self._files = self._changed_files()
+        return self._files
+
+    def iter_contents(self, files: List[RevisionFile]) -> Iterator[Tuple[str, int, BlobStream]]:
+        """經同一個cat-file進程依次產出(路徑, 大小, 內容流)"""
+        if self._reader is None:
+            self._reader = BlobReader(self.project_path)
+        # 由對象流驅動循環：最後一個對象產出後生成器還要繼續執行，讀完其內容
+        for i, (_, size, stream) in enumerate(self._reader.iter_blobs([f.blob for f in files])):
+            yield files[i].path, size, stream
+
+    def close(self):
+        if self._reader is not None:
+            self._reader.close()
+
+    def describe(self) -> Dict:
+        """寫入報告的修訂信息"""
+        described = {
+            'rev': self.rev,
+            'commit': self.commit,
+            'files': len(self.files())
+        }
+        if self.diff_base is not None:
+            described['diff_base'] = self.diff_base
+            described['merge_base'] = self.merge_base
+        if self._reader is not None:
+            described['blobs_read'] = self._reader.objects
+            described['bytes_read'] = self._reader.bytes
+        return described
+
+    def _resolve(self, rev: str) -> str:
+        try:
+            return run_git(self.project_path, 'rev-parse', '--verify', '--quiet', '--end-of-options',
+                           f'{rev}^{{commit}}').decode('ascii').strip()
+        except GitError:
+            raise GitError(f'Unknown git revision: {rev}')
+
+    def _tree_files(self) -> List[RevisionFile]:
+        # 在項目目錄中執行時ls-tree只列出該目錄下的文件，路徑相對於項目目錄
+        output = run_git(self.project_path, 'ls-tree', '-r', '-z', self.commit)
+        files = []
+        for record in output.split(b'\0'):
+            if not record:
+                continue
+            meta, path = record.split(b'\t', 1)
+            mode, kind, blob = meta.decode('ascii').split()
+            if kind == 'blob' and mode in BLOB_MODES:
+                files.append(RevisionFile(path.decode('utf-8', errors='surrogateescape'), blob))
+        return files
+
+    def _changed_files(self) -> List[RevisionFile]:
+        # --relative：只列出項目目錄下的改動，路徑相對於項目目錄；重命名按刪除加新增處理
+        output = run_git(self.project_path, 'diff', '--raw', '-z', '--no-abbrev', '--no-renames',
+                         '--relative', f'--diff-filter={DIFF_FILTER}', self.merge_base, self.commit)
+        fields = output.split(b'\0')
+        files = []
+        # 每條記錄為 ":舊模式 新模式 舊對象 新對象 狀態" 後跟路徑
+        for meta, path in zip(fields[0::2], fields[1::2]):
+            _, mode, _, blob, _ = meta.decode('ascii').lstrip(':').split()
+            if mode in BLOB_MODES:
+                files.append(RevisionFile(path.decode('utf-8', errors='surrogateescape'), blob))
+        return files
@@ -0,0 +1,266 @@
+#!/usr/bin/env python3
+# ignore_rules.py - Compiled .gitignore-style ignore rules shared by the validation tools
+
+import fnmatch
+import os
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+
+# 項目級忽略文件（.gitignore語法），位於項目根目錄
+PROJECT_IGNORE_FILE = '.codequalityignore'
+
+# 內置默認規則：常見的依賴和構建目錄，優先級最低，可被.gitignore或命令行的!模式重新包含
+DEFAULT_IGNORE_PATTERNS = [
+    'node_modules/', '.git/', '__pycache__/',
+    '.venv/', 'venv/', 'dist/', 'build/'
+]
+
+# .gitignore規則不排除的文件：本地.env文件幾乎總在.gitignore中，而這正是環境變量和密鑰檢查的對象；
+# 內置默認值、項目忽略文件和命令行模式仍然適用
+GITIGNORE_EXEMPT_PATTERNS = ['.env*']
+
+_GLOB_CHARS = re.compile(r'[*?\[\\]')
+
+
+class IgnoreRule(NamedTuple):
+    """單條忽略規則"""
+    pattern: str
+    negate: bool
+    dir_only: bool
+    # True時匹配相對路徑，否則只匹配文件名
+    on_path: bool
+    regex: str
+    match: Callable[[str], Optional[re.Match]]
+
+
+def translate_glob(pattern: str) -> str:
+    """把gitignore通配模式轉換為正則表達式（*和?不跨越/，**匹配任意層目錄）"""
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern.startswith('**', i) and (i == 0 or pattern[i - 1] == '/'):
+                if i + 2 == n:
+                    out.append('.*')
+                    i += 2
+                    continue
+                if pattern[i + 2] == '/':
+                    out.append('(?:.*/)?')
+                    i += 3
+                    continue
+            while i < n and pattern[i] == '*':
+                i += 1
+            out.append('[^/]*')
+            continue
+        if c == '?':
+            out.append('[^/]')
+        elif c == '[':
+            # 緊跟在[或[!之後的]是字面字符
+            j = i + 1
+            if j < n and pattern[j] == '!':
+                j += 1
+            if j < n and pattern[j] == ']':
+                j += 1
+            end = pattern.find(']', j)
+            if end == -1:
+                out.append(re.escape(c))
+            else:
+                inner = pattern[i + 1:end]
+                if inner.startswith('!'):
+                    inner = '^' + inner[1:]
+                out.append('[' + inner.replace('\\', '\\\\') + ']')
+                i = end + 1
+                continue
+        elif c == '\\' and i + 1 < n:
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+            continue
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return ''.join(out)
+
+
+def parse_rule(line: str) -> Optional[IgnoreRule]:
+    """解析一行gitignore語法，空行和註釋返回None"""
+    line = line.rstrip('\r\n')
+    if not line or line.startswith('#'):
+        return None
+    # 行尾空格除非以反斜杠轉義，否則忽略
+    stripped = line.rstrip(' ')
+    if stripped.endswith('\\') and len(stripped) < len(line):
+        stripped += ' '
+    pattern = stripped
+    negate = pattern.startswith('!')
+    if negate:
+        pattern = pattern[1:]
+    dir_only = pattern.endswith('/')
+    pattern = pattern.rstrip('/')
+    if not pattern:
+        return None
+    # 含有/（行尾除外）的模式相對於規則所在目錄錨定
+    on_path = '/' in pattern
+    regex = translate_glob(pattern.lstrip('/')) + r'\Z'
+    return IgnoreRule(pattern, negate, dir_only, on_path, regex, re.compile(regex).match)
+
+
+class _RuleGroup:
+    """同一來源（同一目錄的.gitignore、項目規則或內置默認值）的規則，按順序後者優先
+
+    沒有否定規則時只需判斷是否有任一規則匹配：純文件名規則查集合，
+    其餘規則合併為一個正則；有否定規則時按gitignore語義逆序逐條判斷。
+    """
+
+    def __init__(self):
+        self.rules: List[IgnoreRule] = []
+        self._compiled = False
+
+    def add(self, rule: IgnoreRule):
+        self.rules.append(rule)
+        self._compiled = False
+
+    def _compile(self):
+        self.negated = any(rule.negate for rule in self.rules)
+        self.names, self.dir_names = set(), set()
+        globs: Dict[Tuple[bool, bool], List[str]] = {}
+        for rule in self.rules:
+            if not rule.on_path and not _GLOB_CHARS.search(rule.pattern):
+                (self.dir_names if rule.dir_only else self.names).add(rule.pattern)
+            else:
+                globs.setdefault((rule.on_path, rule.dir_only), []).append(rule.regex)
+        self.unions = {key: re.compile('|'.join(f'(?:{p})' for p in patterns)).match
+                       for key, patterns in globs.items()}
+        self._compiled = True
+
+    def decide(self, rel_path: str, name: str, is_dir: bool) -> Optional[bool]:
+        """True/False表示本組規則判定忽略/不忽略，None表示沒有規則匹配"""
+        if not self._compiled:
+            self._compile()
+        if self.negated:
+            for rule in reversed(self.rules):
+                if rule.dir_only and not is_dir:
+                    continue
+                if rule.match(rel_path if rule.on_path else name) is not None:
+                    return not rule.negate
+            return None
+
+        if name in self.names or (is_dir and name in self.dir_names):
+            return True
+        for (on_path, dir_only), match in self.unions.items():
+            if dir_only and not is_dir:
+                continue
+            if match(rel_path if on_path else name) is not None:
+                return True
+        return None
+
+
+class IgnoreRules:
+    """編譯後的忽略規則
+
+    優先級從高到低：項目忽略文件和命令行模式、各目錄的.gitignore（深層優先）、內置默認值。
+    .gitignore規則不作用於gitignore_exempt匹配的文件（默認為.env*）。
+    路徑均為相對於項目根目錄、以/分隔的路徑；目錄遍歷時按目錄判斷，被忽略的子樹整體剪枝。
+    """
+
+    def __init__(self, patterns: Optional[List[str]] = None, defaults: Optional[List[str]] = None,
+                 use_gitignore: bool = False, gitignore_exempt: Optional[List[str]] = None):
+        self.use_gitignore = use_gitignore
+        exempt = GITIGNORE_EXEMPT_PATTERNS if gitignore_exempt is None else gitignore_exempt
+        self._exempt = (re.compile('|'.join(fnmatch.translate(p) for p in exempt)).match
+                        if exempt else None)
+        self._override = _RuleGroup()
+        self._defaults = _RuleGroup()
+        # 目錄相對路徑（'' 或 'a/b/'） -> 該目錄.gitignore中的規則
+        self._gitignores: Dict[str, _RuleGroup] = {}
+        self._chains: Dict[str, List[Tuple[int, _RuleGroup]]] = {}
+        self.sources: List[str] = []
+        self.add_patterns(patterns or [])
+        for line in defaults or []:
+            rule = parse_rule(line)
+            if rule is not None:
+                self._defaults.add(rule)
+
+    @classmethod
+    def for_project(cls, root: str, patterns: Optional[List[str]] = None,
+                    ignore_file: Optional[str] = None, use_gitignore: bool = True,
+                    defaults: Optional[List[str]] = None) -> 'IgnoreRules':
+        """項目規則：內置默認值、遍歷時讀取的.gitignore、項目忽略文件和命令行模式"""
+        rules = cls(defaults=DEFAULT_IGNORE_PATTERNS if defaults is None else defaults,
+                    use_gitignore=use_gitignore)
+        path = ignore_file or os.path.join(root, PROJECT_IGNORE_FILE)
+        if ignore_file is not None or os.path.isfile(path):
+            rules.load_file(path)
+        rules.add_patterns(patterns or [])
+        return rules
+
+    def add_patterns(self, patterns: List[str]):
+        """追加最高優先級的模式（後加入的優先）"""
+        for line in patterns:
+            rule = parse_rule(line)
+            if rule is not None:
+                self._override.add(rule)
+
+    def load_file(self, path: str):
+        """讀取忽略文件，規則作為最高優先級的模式"""
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            self.add_patterns(f.readlines())
+        self.sources.append(path)
+
+    def load_gitignore(self, path: str, rel_dir: str):
+        """讀取rel_dir目錄下的.gitignore，規則只作用於該目錄之下"""
+        group = _RuleGroup()
+        try:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                for line in f:
+                    rule = parse_rule(line)
+                    if rule is not None:
+                        group.add(rule)
+        except OSError:
+            return
+        if group.rules:
+            self._gitignores[rel_dir] = group
+            self._chains.clear()
+            self.sources.append(path)
+
+    def match(self, rel_dir: str, name: str, is_dir: bool) -> bool:
+        """rel_dir目錄（'' 或以/結尾）下的條目name是否被忽略"""
+        rel_path = rel_dir + name
+        decided = self._override.decide(rel_path, name, is_dir) if self._override.rules else None
+        if decided is not None:
+            return decided
+        if self._gitignores and (is_dir or self._exempt is None or self._exempt(name) is None):
+            for base_length, group in self._chain(rel_dir):
+                decided = group.decide(rel_path[base_length:], name, is_dir)
+                if decided is not None:
+                    return decided
+        if self._defaults.rules:
+            return bool(self._defaults.decide(rel_path, name, is_dir))
+        return False
+
+    def is_ignored(self, rel_path: str, is_dir: bool = False) -> bool:
+        """判斷任意相對路徑；任一上級目錄被忽略時路徑本身也被忽略"""
+        parts = rel_path.replace(os.sep, '/').strip('/').split('/')
+        rel_dir = ''
+        for part in parts[:-1]:
+            if self.match(rel_dir, part, True):
+                return True
+            rel_dir += part + '/'
+        return self.match(rel_dir, parts[-1], is_dir)
+
+    def _chain(self, rel_dir: str) -> List[Tuple[int, _RuleGroup]]:
+        """rel_dir及其上級目錄中的.gitignore規則組，深層在前"""
+        chain = self._chains.get(rel_dir)
+        if chain is None:
+            chain = []
+            base = rel_dir
+            while True:
+                group = self._gitignores.get(base)
+                if group is not None:
+                    chain.append((len(base), group))
+                if not base:
+                    break
+                base = base[:base.rstrip('/').rfind('/') + 1]
+            self._chains[rel_dir] = chain
+        return chain
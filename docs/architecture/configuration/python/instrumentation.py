@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# instrumentation.py - Per-phase wall/CPU/file/byte/peak-RSS metrics with Prometheus textfile export
+
+import os
+import resource
+import sys
+import time
+from typing import Dict, List, Optional
+
+
+class PhaseStats:
+    """單個階段的累計統計；同名階段多次進入時數值累加"""
+
+    __slots__ = ('name', 'wall_time', 'cpu_time', 'files', 'bytes', 'peak_rss_bytes', 'calls')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.wall_time = 0.0
+        self.cpu_time: Optional[float] = 0.0
+        self.files = 0
+        self.bytes = 0
+        self.peak_rss_bytes: Optional[int] = None
+        self.calls = 0
+
+    def to_dict(self) -> Dict:
+        return {
+            'wall_time': round(self.wall_time, 6),
+            'cpu_time': round(self.cpu_time, 6) if self.cpu_time is not None else None,
+            'files': self.files,
+            'bytes': self.bytes,
+            'peak_rss_mb': (round(self.peak_rss_bytes / (1024 * 1024), 1)
+                            if self.peak_rss_bytes is not None else None),
+            'calls': self.calls
+        }
+
+
+class _Phase:
+    """計時上下文，退出時把耗時和資源用量累加到PhaseStats"""
+
+    __slots__ = ('recorder', 'stats', 'start', 'cpu_start')
+
+    def __init__(self, recorder: 'Instrumentation', stats: PhaseStats):
+        self.recorder = recorder
+        self.stats = stats
+
+    def __enter__(self) -> '_Phase':
+        self.recorder._enter(self)
+        self.cpu_start = time.process_time()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stats.wall_time += time.perf_counter() - self.start
+        self.stats.cpu_time += time.process_time() - self.cpu_start
+        self.stats.calls += 1
+        self.recorder._exit(self)
+        return False
+
+    def count(self, files: int = 0, nbytes: int = 0):
+        self.stats.files += files
+        self.stats.bytes += nbytes
+
+
+class _NullPhase:
+    """關閉檢測時使用的空上下文，不做任何記錄"""
+
+    __slots__ = ()
+
+    def __enter__(self) -> '_NullPhase':
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def count(self, files: int = 0, nbytes: int = 0):
+        pass
+
+
+_NULL_PHASE = _NullPhase()
+
+
+class Instrumentation:
+    """按階段記錄牆鐘時間、CPU時間、文件數、字節數和峰值RSS
+
+    Linux上每個階段開始時通過 /proc/self/clear_refs 重置進程的RSS高水位，
+    階段結束時讀取VmHWM，得到該階段自身的峰值；嵌套階段的峰值同時計入外層階段。
+    其他平台使用 ru_maxrss（進程啟動以來的高水位）。
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.phases: Dict[str, PhaseStats] = {}
+        self._stack: List[_Phase] = []
+        self._hwm_resettable = enabled and _reset_peak_rss()
+
+    def phase(self, name: str):
+        """返回階段計時上下文；可在上下文內調用count()累加文件數和字節數"""
+        if not self.enabled:
+            return _NULL_PHASE
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = PhaseStats(name)
+        return _Phase(self, stats)
+
+    def count(self, files: int = 0, nbytes: int = 0):
+        """把文件數和字節數累加到當前最內層的階段"""
+        if self._stack:
+            self._stack[-1].count(files, nbytes)
+
+    def record(self, name: str, wall_time: float, cpu_time: Optional[float],
+               files: int = 0, nbytes: int = 0, peak_rss_bytes: Optional[int] = None):
+        """記錄在外部測得的階段（例如子進程工具）"""
+        if not self.enabled:
+            return
+        stats = self.phases.get(name)
+        if stats is None:
+            stats = self.phases[name] = PhaseStats(name)
+        stats.wall_time += wall_time
+        if cpu_time is None:
+            stats.cpu_time = None
+        elif stats.cpu_time is not None:
+            stats.cpu_time += cpu_time
+        stats.files += files
+        stats.bytes += nbytes
+        if peak_rss_bytes is not None:
+            stats.peak_rss_bytes = max(stats.peak_rss_bytes or 0, peak_rss_bytes)
+        stats.calls += 1
+
+    def to_dict(self) -> Dict:
+        return {name: stats.to_dict() for name, stats in self.phases.items()}
+
+    def write_prometheus(self, path: str, component: str, labels: Optional[Dict[str, str]] = None):
+        """寫出node_exporter textfile collector格式的指標文件（先寫臨時文件再原子替換）"""
+        base_labels = {'component': component, **(labels or {})}
+        metrics = [
+            ('code_quality_phase_wall_seconds', 'Wall-clock time spent in each phase',
+             lambda s: s.wall_time),
+            ('code_quality_phase_cpu_seconds', 'CPU time spent in each phase',
+             lambda s: s.cpu_time),
+            ('code_quality_phase_files', 'Files processed in each phase',
+             lambda s: s.files),
+            ('code_quality_phase_bytes', 'Bytes processed in each phase',
+             lambda s: s.bytes),
+            ('code_quality_phase_peak_rss_bytes', 'Peak resident set size during each phase',
+             lambda s: s.peak_rss_bytes),
+        ]
+
+        lines = []
+        for metric, help_text, value_of in metrics:
+            lines.append(f'# HELP {metric} {help_text}')
+            lines.append(f'# TYPE {metric} gauge')
+            for stats in self.phases.values():
+                value = value_of(stats)
+                if value is None:
+                    continue
+                lines.append(f"{metric}{_format_labels({**base_labels, 'phase': stats.name})} {value}")
+        lines.append('# HELP code_quality_last_run_timestamp_seconds Unix time of the last completed run')
+        lines.append('# TYPE code_quality_last_run_timestamp_seconds gauge')
+        lines.append(f'code_quality_last_run_timestamp_seconds{_format_labels(base_labels)} {time.time():.3f}')
+
+        tmp_file = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_file, path)
+
+    def _enter(self, phase: _Phase):
+        if self._hwm_resettable:
+            # 重置前把目前為止的高水位計入所有外層階段
+            peak = _current_peak_rss()
+            for outer in self._stack:
+                _raise_peak(outer.stats, peak)
+            _reset_peak_rss()
+        self._stack.append(phase)
+
+    def _exit(self, phase: _Phase):
+        self._stack.pop()
+        peak = _current_peak_rss() if self._hwm_resettable else _max_rss()
+        _raise_peak(phase.stats, peak)
+        for outer in self._stack:
+            _raise_peak(outer.stats, peak)
+
+
+def _raise_peak(stats: PhaseStats, peak: Optional[int]):
+    if peak is not None and (stats.peak_rss_bytes is None or peak > stats.peak_rss_bytes):
+        stats.peak_rss_bytes = peak
+
+
+def _reset_peak_rss() -> bool:
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _current_peak_rss() -> Optional[int]:
+    try:
+        with open('/proc/self/status', 'rb') as f:
+            for line in f:
+                if line.startswith(b'VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return _max_rss()
+
+
+def _max_rss() -> int:
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS以字節為單位，Linux以KB為單位
+    return maxrss if sys.platform == 'darwin' else maxrss * 1024
+
+
+def rusage_peak_rss(usage) -> int:
+    """把wait4返回的ru_maxrss換算為字節"""
+    return usage.ru_maxrss if sys.platform == 'darwin' else usage.ru_maxrss * 1024
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    escaped = (f'{key}="{_escape(str(value))}"' for key, value in labels.items())
+    return '{' + ','.join(escaped) + '}'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
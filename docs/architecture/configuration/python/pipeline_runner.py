@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# pipeline_runner.py - Run configuration validation and security scanning of one project as one overlapping task graph
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import datetime
+from functools import partial
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from archive_validation import ARCHIVE_PATTERNS
+from batch_runner import BATCH_PATTERNS
+from config_validator import ConfigValidator
+from file_inventory import FileInventory
+from ignore_rules import IgnoreRules
+from security_scanner import SecurityScanner
+
+
+# 同時執行的任務數上限（任務在線程中協調，重活在子進程和進程池中）
+MAX_RUNNING_TASKS = 16
+
+SUMMARY_FILE = os.path.join('reports', 'pipeline', 'pipeline-summary.json')
+
+
+class TaskGraph:
+    """依賴圖上的任務調度
+
+    依賴全部完成的任務立即在線程中啟動。任務執行中可以用add()登記新的任務（依賴必須是
+    已登記的任務，因此不會出現環）。任務失敗時依賴它的任務記為skipped，其餘任務照常執行。
+    起止時間相對於run()開始的時刻記錄，用於計算關鍵路徑。
+    """
+
+    def __init__(self, max_running: int = MAX_RUNNING_TASKS,
+                 on_finish: Optional[Callable[[str, Dict], None]] = None):
+        self.max_running = max_running
+        self.on_finish = on_finish
+        # 任務名 -> {func, deps, status, start, end, error}，按登記順序
+        self.tasks: Dict[str, Dict] = {}
+        self.results: Dict[str, Any] = {}
+        self.started: Optional[float] = None
+        self.wall_time = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, name: str, func: Callable[[], Any], deps: Iterable[str] = ()):
+        deps = list(deps)
+        with self._lock:
+            if name in self.tasks:
+                raise ValueError(f'Duplicate task: {name}')
+            missing = [d for d in deps if d not in self.tasks]
+            if missing:
+                raise ValueError(f"Unknown dependencies of {name}: {', '.join(missing)}")
+            self.tasks[name] = {'func': func, 'deps': deps, 'status': 'pending',
+                                'start': None, 'end': None, 'error': None}
+
+    def run(self) -> Dict[str, Any]:
+        """執行全部任務直到沒有可執行的任務，返回各任務的返回值"""
+        self.started = time.monotonic()
+        running: Dict[Future, str] = {}
+        with ThreadPoolExecutor(max_workers=self.max_running, thread_name_prefix='task') as threads:
+            while True:
+                for name in self._ready():
+                    running[threads.submit(self._call, name)] = name
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    task = self.tasks[name]
+                    try:
+                        self.results[name] = future.result()
+                        task['status'] = 'done'
+                    except Exception as e:
+                        task['status'] = 'failed'
+                        task['error'] = f'{type(e).__name__}: {e}'
+                    task['end'] = time.monotonic() - self.started
+                    if self.on_finish is not None:
+                        self.on_finish(name, task)
+        self.wall_time = time.monotonic() - self.started
+        return self.results
+
+    def _ready(self) -> List[str]:
+        """把依賴已完成的任務標記為運行中，依賴失敗或被跳過的任務標記為skipped"""
+        ready = []
+        with self._lock:
+            # 依賴總在任務之前登記，按登記順序一次遍歷即可傳遞skipped
+            for name, task in self.tasks.items():
+                if task['status'] != 'pending':
+                    continue
+                states = [self.tasks[d]['status'] for d in task['deps']]
+                if any(state in ('failed', 'skipped') for state in states):
+                    task['status'] = 'skipped'
+                elif all(state == 'done' for state in states):
+                    task['status'] = 'running'
+                    ready.append(name)
+        return ready
+
+    def _call(self, name: str) -> Any:
+        task = self.tasks[name]
+        # 以線程實際開始執行的時刻為起點
+        task['start'] = time.monotonic() - self.started
+        return task['func']()
+
+    def critical_path(self) -> List[str]:
+        """關鍵路徑：從最後結束的任務出發，每步回到最後完成的依賴"""
+        finished = {name: task for name, task in self.tasks.items() if task['end'] is not None}
+        if not finished:
+            return []
+        name = max(finished, key=lambda n: finished[n]['end'])
+        path = [name]
+        while True:
+            deps = [d for d in self.tasks[name]['deps'] if d in finished]
+            if not deps:
+                break
+            name = max(deps, key=lambda n: finished[n]['end'])
+            path.append(name)
+        return path[::-1]
+
+    def timeline(self) -> Dict[str, Dict]:
+        """各任務的依賴、狀態和起止時間（秒）"""
+        timeline = {}
+        for name, task in self.tasks.items():
+            entry = {'deps': task['deps'], 'status': task['status']}
+            if task['start'] is not None and task['end'] is not None:
+                entry.update(start=round(task['start'], 3), end=round(task['end'], 3),
+                             duration=round(task['end'] - task['start'], 3))
+            if task['error'] is not None:
+                entry['error'] = task['error']
+            timeline[name] = entry
+        return timeline
+
+    def breakdown(self) -> Dict:
+        """關鍵路徑的耗時分解：每個任務的耗時、佔總牆鐘時間的比例，以及等待依賴之後到開始執行的間隔"""
+        steps = []
+        previous_end = 0.0
+        for name in self.critical_path():
+            task = self.tasks[name]
+            duration = task['end'] - task['start']
+            steps.append({
+                'task': name,
+                'start': round(task['start'], 3),
+                'duration': round(duration, 3),
+                'share': round(duration / self.wall_time, 3) if self.wall_time else None,
+                'gap': round(max(0.0, task['start'] - previous_end), 3)
+            })
+            previous_end = task['end']
+        # 任務耗時之和與牆鐘時間之比：大於1的部分就是重疊節省的時間
+        task_time = sum(t['end'] - t['start'] for t in self.tasks.values() if t['end'] is not None)
+        return {
+            'wall_time': round(self.wall_time, 3),
+            'duration': round(sum(step['duration'] for step in steps), 3),
+            'task_time': round(task_time, 3),
+            'parallelism': round(task_time / self.wall_time, 2) if self.wall_time else None,
+            'tasks': steps
+        }
+
+
+class Pipeline:
+    """對單個項目同時執行配置驗證和安全掃描
+
+    目錄樹只遍歷一次，驗證器和掃描器共用這份清單。清單建好後每個外部掃描工具作為一個任務
+    以子進程運行；配置驗證的各項按順序作為任務鏈執行（共用解析緩存），解析任務交給佔用其餘
+    CPU核心的進程池（總核心數減去Bandit分片數）。兩份報告照常寫出，另外生成一份合併摘要，
+    記錄每個任務的時間線和關鍵路徑。
+    """
+
+    def __init__(self, project_path: str, jobs: int = 0, summary_file: Optional[str] = None,
+                 validator_options: Optional[Dict] = None, scanner_options: Optional[Dict] = None,
+                 verbose: bool = True):
+        self.project_path = project_path
+        # jobs <= 0 表示使用全部CPU核心
+        self.jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        self.summary_file = summary_file or os.path.join(project_path, SUMMARY_FILE)
+        self.validator_options = validator_options or {}
+        self.scanner_options = scanner_options or {}
+        self.log = print if verbose else (lambda *args: None)
+        self.ignore = IgnoreRules.for_project(project_path)
+        # 外部工具各自的計時（wait4）始終記錄；進程級的階段檢測在多個任務並行時沒有意義，關閉
+        self.scanner = SecurityScanner(project_path, ignore=self.ignore, instrument=False,
+                                       **self.scanner_options)
+        # Bandit分片佔用的核心留給外部工具，其餘核心用於解析
+        self.parse_workers = max(1, self.jobs - self.scanner.bandit_shards)
+        self.validator: Optional[ConfigValidator] = None
+        self.graph = TaskGraph(on_finish=self._print_task)
+        self._config_results: Optional[Dict] = None
+        self._scan_results: Optional[Dict] = None
+        self._scan_plan: List = []
+
+    def run(self) -> Dict:
+        """執行任務圖，寫出合併摘要並返回"""
+        self.log(f"🧭 Running configuration validation and security scans for {self.project_path} "
+                 f"({self.parse_workers} parse workers, {self.scanner.bandit_shards} Bandit shards)...")
+        executor = None
+        if self.parse_workers > 1:
+            executor = ProcessPoolExecutor(max_workers=self.parse_workers)
+            # fork方式的進程池在首次提交時創建全部工作進程：在啟動任務線程之前完成
+            executor.submit(os.getpid).result()
+        self.validator = ConfigValidator(self.project_path, jobs=self.parse_workers, ignore=self.ignore,
+                                         instrument=False, executor=executor, **self.validator_options)
+        try:
+            self._build_graph()
+            self.graph.run()
+        finally:
+            self.validator.close()
+            if executor is not None:
+                executor.shutdown()
+
+        summary = self._summarize()
+        os.makedirs(os.path.dirname(os.path.abspath(self.summary_file)), exist_ok=True)
+        with open(self.summary_file, 'w') as f:
+            json.dump(summary, f, indent=2, ensure_ascii=False)
+
+        path = summary['critical_path']
+        chain = ' → '.join(f"{step['task']} {step['duration']}s" for step in path['tasks'])
+        self.log(f"  ⛓️ Critical path {path['duration']}s of {path['wall_time']}s wall "
+                 f"({path['task_time']}s of task time, parallelism {path['parallelism']}): {chain}")
+        self.log(f"\n✅ Pipeline completed. Summary saved to {self.summary_file}")
+        return summary
+
+    def _build_graph(self):
+        graph = self.graph
+        graph.add('inventory', self._build_inventory)
+        # 掃描計劃依賴清單（是否有Python文件等）；各工具任務在計劃任務中登記
+        graph.add('security.plan', self._plan_scans, deps=['inventory'])
+
+        graph.add('config.begin', self._begin_config, deps=['inventory'])
+        previous = 'config.begin'
+        for key, _, validate in self.validator.validation_steps():
+            graph.add(f'config.{key}', partial(self._run_validation, key, validate), deps=[previous])
+            previous = f'config.{key}'
+        graph.add('config.report', self._finish_config, deps=[previous])
+
+    def _build_inventory(self):
+        patterns = BATCH_PATTERNS + ARCHIVE_PATTERNS if self.validator_options.get('archives') else BATCH_PATTERNS
+        inventory = FileInventory(self.project_path, patterns=patterns, ignore=self.ignore).scan()
+        self.validator.inventory = inventory
+        self.scanner.inventory = inventory
+        return len(inventory.entries)
+
+    def _plan_scans(self):
+        self._scan_results, self._scan_plan = self.scanner.begin_scans()
+        tools = []
+        for _, tool, _ in self._scan_plan:
+            self.graph.add(f'security.{tool}', partial(self.scanner.run_tool, tool), deps=['security.plan'])
+            tools.append(f'security.{tool}')
+        self.graph.add('security.report', self._finish_scans, deps=tools)
+        return [tool for _, tool, _ in self._scan_plan]
+
+    def _finish_scans(self) -> Dict:
+        for key, tool, _ in self._scan_plan:
+            self._scan_results['scans'][key] = self.graph.results[f'security.{tool}']
+        return self.scanner.finish_scans(self._scan_results, self._scan_plan, log=lambda *args: None)
+
+    def _begin_config(self):
+        self._config_results = self.validator.begin_results(log=lambda *args: None)
+
+    def _run_validation(self, key: str, validate: Callable[[], Dict]):
+        self.validator.run_validation(self._config_results, key, validate)
+
+    def _finish_config(self) -> Dict:
+        results = self.validator.finish_results(self._config_results, log=lambda *args: None)
+        results['report'] = self.validator.write_report(results)
+        return results
+
+    def _print_task(self, name: str, task: Dict):
+        status = {'done': '✔️', 'failed': '💥'}[task['status']]
+        line = f"  {status} {name} ({task['end'] - task['start']:.3f}s)"
+        if task['error'] is not None:
+            line += f": {task['error']}"
+        self.log(line)
+
+    def _summarize(self) -> Dict:
+        """合併兩份報告的摘要、任務時間線和關鍵路徑"""
+        config = self.graph.results.get('config.report')
+        scan = self.graph.results.get('security.report')
+        timeline = self.graph.timeline()
+        incomplete = [name for name, task in timeline.items() if task['status'] != 'done']
+
+        summary = {
+            'total_errors': config['summary']['total_errors'] if config else None,
+            'total_warnings': config['summary']['total_warnings'] if config else None,
+            'security_issues': scan['summary']['total_issues'] if scan else None,
+            'critical': scan['summary']['critical'] if scan else None,
+            'high': scan['summary']['high'] if scan else None,
+            'incomplete_tasks': incomplete,
+            'passed': (not incomplete and config['summary']['passed'] and scan['summary']['passed'])
+        }
+        return {
+            'timestamp': datetime.now().isoformat(),
+            'project': os.path.abspath(self.project_path),
+            'workers': {
+                'jobs': self.jobs,
+                'parse_workers': self.parse_workers,
+                'bandit_shards': self.scanner.bandit_shards
+            },
+            'summary': summary,
+            'config': {'summary': config['summary'], 'report': config['report']} if config else None,
+            'security': {'summary': scan['summary'],
+                         'report': os.path.join(self.scanner.reports_dir, 'security-summary.json'),
+                         'timings': scan['timings']} if scan else None,
+            'tasks': timeline,
+            'critical_path': self.graph.breakdown()
+        }
+
+
+if __name__ == "__main__":
+    import sys
+    import argparse
+
+    from config_validator import YAML_BACKENDS
+    from security_scanner import DEFAULT_TOOL_TIMEOUT
+
+    parser = argparse.ArgumentParser(description='Validate configuration files and run security scans of one '
+                                                 'project concurrently, with one combined summary')
+    parser.add_argument('project_path', nargs='?', default='.')
+    parser.add_argument('--jobs', '-j', type=int, default=0,
+                        help='CPU cores to use (0 = all); cores not used by Bandit shards parse configuration files')
+    parser.add_argument('--bandit-shards', type=int, default=1,
+                        help='Split Bandit into N parallel processes balanced by file size (0 = all CPU cores)')
+    parser.add_argument('--bandit-incremental', action='store_true',
+                        help='Only rescan Python files changed since the last run')
+    parser.add_argument('--advisory-db',
+                        help='Offline advisory dump for the security scan (see security_scanner.py --advisory-db)')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TOOL_TIMEOUT,
+                        help='Per-tool timeout in seconds for the security scan (0 = no timeout)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Revalidate every file instead of reusing reports/config/validation-cache.json')
+    parser.add_argument('--yaml-backend', choices=YAML_BACKENDS, default='auto')
+    parser.add_argument('--syntax-only', action='store_true',
+                        help='Check YAML/JSON syntax with streaming parsers instead of loading documents')
+    parser.add_argument('--no-secret-scan', action='store_true',
+                        help='Skip secret detection in YAML/JSON/.env files')
+    parser.add_argument('--archives', action='store_true',
+                        help='Also validate configuration files inside zip and tar archives')
+    parser.add_argument('--summary',
+                        help=f'Combined summary path (default: <project>/{SUMMARY_FILE})')
+    args = parser.parse_args()
+
+    pipeline = Pipeline(args.project_path, jobs=args.jobs, summary_file=args.summary,
+                        validator_options={'use_cache': not args.no_cache,
+                                           'yaml_backend': args.yaml_backend,
+                                           'syntax_only': args.syntax_only,
+                                           'secret_scan': not args.no_secret_scan,
+                                           'archives': args.archives},
+                        scanner_options={'bandit_shards': args.bandit_shards,
+                                         'bandit_incremental': args.bandit_incremental,
+                                         'advisory_db': args.advisory_db,
+                                         'tool_timeout': args.timeout or None})
+    result = pipeline.run()
+
+    summary = result['summary']
+    print("\n" + "="*60)
+    print("Pipeline Summary")
+    print("="*60)
+    if summary['total_errors'] is not None:
+        print(f"Total Errors: {summary['total_errors']}")
+        print(f"Total Warnings: {summary['total_warnings']}")
+    if summary['security_issues'] is not None:
+        print(f"Security Issues: {summary['security_issues']} "
+              f"(critical {summary['critical']}, high {summary['high']})")
+    if summary['incomplete_tasks']:
+        print(f"Incomplete Tasks: {', '.join(summary['incomplete_tasks'])}")
+    print(f"Status: {'✅ PASSED' if summary['passed'] else '❌ FAILED'}")
+
+    sys.exit(0 if summary['passed'] else 1)
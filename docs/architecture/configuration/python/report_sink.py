@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# report_sink.py - Streaming NDJSON and SARIF report writers
+
+import gzip
+import json
+import os
+import re
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+
+SARIF_VERSION = '2.1.0'
+SARIF_SCHEMA = 'https://json.schemastore.org/sarif-2.1.0.json'
+
+# 緩衝數據最多積壓的秒數；進程中途退出時最多丟失這段時間內的記錄
+FLUSH_INTERVAL = 1.0
+
+SARIF_LEVELS = ('error', 'warning', 'note')
+
+# 各工具的嚴重程度到SARIF級別的映射
+SEVERITY_LEVELS = {
+    'critical': 'error',
+    'high': 'error',
+    'medium': 'warning',
+    'moderate': 'warning',
+    'low': 'note',
+    'info': 'note'
+}
+
+# 非默認參數的json.dumps每次調用都會新建編碼器，逐條寫出時複用同一個
+_encode = json.JSONEncoder(ensure_ascii=False, default=str).encode
+
+# 錯誤信息中的位置（YAML：line 3, column 5；JSON：line 3 column 5）
+_POSITION = re.compile(r'line (\d+),? column (\d+)')
+
+
+def message_position(message: str) -> Tuple[Optional[int], Optional[int]]:
+    """從錯誤信息中提取行號和列號"""
+    match = _POSITION.search(message)
+    if match is None:
+        return None, None
+    return int(match.group(1)), int(match.group(2))
+
+
+def severity_level(severity: Optional[str]) -> str:
+    """把嚴重程度映射為SARIF級別，未知的按warning處理"""
+    return SEVERITY_LEVELS.get(str(severity).lower(), 'warning')
+
+
+class SarifWriter:
+    """增量寫出SARIF 2.1.0日誌
+
+    結果逐條追加到results數組；規則元數據在運行中收集，關閉時寫在results之後的tool對象中
+    （JSON對象的鍵沒有順序要求），因此不需要預先知道全部規則。
+    """
+
+    def __init__(self, path: str, tool_name: str, tool_version: str, root: str):
+        self.path = path
+        self.root = os.path.abspath(root)
+        self.tool_name = tool_name
+        self.tool_version = tool_version
+        self.rules = set()
+        self.count = 0
+        self._uris: Dict[str, str] = {}
+        self._file = open(path, 'w', encoding='utf-8')
+        self._file.write(f'{{"version": "{SARIF_VERSION}", "$schema": "{SARIF_SCHEMA}", '
+                         f'"runs": [{{"results": [\n')
+
+    def add(self, rule_id: str, level: str, message: str, file: Optional[str] = None,
+            line: Optional[int] = None, column: Optional[int] = None):
+        """追加一條結果"""
+        result = {'ruleId': rule_id, 'level': level, 'message': {'text': message or rule_id}}
+        if file:
+            location = {'artifactLocation': {'uri': self._uri(file), 'uriBaseId': 'SRCROOT'}}
+            if line:
+                location['region'] = {'startLine': line}
+                if column:
+                    location['region']['startColumn'] = column
+            result['locations'] = [{'physicalLocation': location}]
+        if self.count:
+            self._file.write(',\n')
+        self._file.write(_encode(result))
+        self.count += 1
+        self.rules.add(rule_id)
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        """寫出規則和工具信息，結束文檔"""
+        if self._file.closed:
+            return
+        driver = {
+            'name': self.tool_name,
+            'version': self.tool_version,
+            'rules': [{'id': rule_id, 'shortDescription': {'text': rule_id}}
+                      for rule_id in sorted(self.rules)]
+        }
+        tail = {
+            'tool': {'driver': driver},
+            'originalUriBaseIds': {'SRCROOT': {'uri': f'file://{self.root}/'}},
+            'columnKind': 'unicodeCodePoints'
+        }
+        # 去掉外層花括號，接在results數組之後
+        self._file.write('\n], ' + json.dumps(tail, ensure_ascii=False)[1:-1] + '}]}\n')
+        self._file.close()
+
+    def _uri(self, file: str) -> str:
+        """項目內的文件使用相對於SRCROOT的URI；同一文件通常有多條結果，按路徑緩存"""
+        uri = self._uris.get(file)
+        if uri is None:
+            path = os.path.abspath(file)
+            if path.startswith(self.root + os.sep):
+                path = path[len(self.root) + 1:]
+            uri = self._uris[file] = path.replace(os.sep, '/')
+        return uri
+
+
+class ReportSink:
+    """流式報告輸出
+
+    每條記錄產生時立即追加為一行NDJSON（可gzip壓縮），可同時寫入SARIF；
+    計數在寫入時累計，摘要直接取計數，不再遍歷結果列表。可在多個線程中使用。
+    """
+
+    def __init__(self, tool_name: str, tool_version: str, root: str,
+                 ndjson_path: Optional[str] = None, sarif_path: Optional[str] = None,
+                 compress: bool = False):
+        if ndjson_path is not None and compress and not ndjson_path.endswith('.gz'):
+            ndjson_path += '.gz'
+        self.ndjson_path = ndjson_path
+        self.sarif_path = sarif_path
+        self.records = 0
+        self.by_level = {level: 0 for level in SARIF_LEVELS}
+        self.by_rule: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._ndjson = None
+        if ndjson_path is not None:
+            if compress:
+                # 默認的9級壓縮在大量記錄時明顯拖慢寫出，6級兼顧速度和壓縮率
+                self._ndjson = gzip.open(ndjson_path, 'wt', compresslevel=6, encoding='utf-8')
+            else:
+                self._ndjson = open(ndjson_path, 'w', encoding='utf-8')
+        self._sarif = SarifWriter(sarif_path, tool_name, tool_version, root) if sarif_path else None
+
+    def emit(self, record: Dict, rule_id: str, level: str, message: str,
+             file: Optional[str] = None, line: Optional[int] = None, column: Optional[int] = None):
+        """寫出一條記錄；未指定SARIF位置時取record中的file、line、column"""
+        if file is None:
+            file = record.get('file')
+        if line is None:
+            line, column = record.get('line'), record.get('column')
+        if not isinstance(line, int) and message:
+            position = message_position(message)
+            if position[0] is not None:
+                line, column = position
+
+        with self._lock:
+            self.records += 1
+            self.by_level[level] += 1
+            self.by_rule[rule_id] = self.by_rule.get(rule_id, 0) + 1
+            if self._ndjson is not None:
+                self._ndjson.write(_encode(record))
+                self._ndjson.write('\n')
+            if self._sarif is not None:
+                self._sarif.add(rule_id, level, message, file if isinstance(file, str) else None,
+                                line if isinstance(line, int) else None,
+                                column if isinstance(column, int) else None)
+            now = time.monotonic()
+            if now - self._last_flush >= FLUSH_INTERVAL:
+                self._flush()
+                self._last_flush = now
+
+    def _flush(self):
+        # gzip文本流的flush會同步刷新壓縮器（Z_SYNC_FLUSH），已寫出的部分可以被解壓
+        if self._ndjson is not None:
+            self._ndjson.flush()
+        if self._sarif is not None:
+            self._sarif.flush()
+
+    def close(self):
+        """結束所有輸出文件；出錯中止時也應調用，使SARIF保持有效"""
+        with self._lock:
+            if self._ndjson is not None:
+                self._ndjson.close()
+                self._ndjson = None
+            if self._sarif is not None:
+                self._sarif.close()
+
+    def stats(self) -> Dict:
+        """寫入統計，記錄在摘要報告中"""
+        return {
+            'records': self.records,
+            'by_level': dict(self.by_level),
+            'by_rule': dict(sorted(self.by_rule.items())),
+            'ndjson_file': self.ndjson_path,
+            'sarif_file': self.sarif_path
+        }
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# scan_budget.py - Fail-fast error limit, wall-clock budget and file priority for pre-merge gating runs
+
+import gzip
+import json
+import os
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+
+# 優先級層次：最近修改的文件、上次報告中有問題的文件、其餘文件
+RECENT, KNOWN_PROBLEM, OTHER = 0, 1, 2
+
+# 沒有上次報告時，這段時間（秒）內修改的文件算作最近修改
+DEFAULT_RECENT_WINDOW = 24 * 3600
+
+
+class RunBudget:
+    """錯誤數上限和時間預算；任一耗盡後不再開始新的檢查
+
+    錯誤由報告發現的地方逐條計入；尚未報告的錯誤（如一批檢查的結果）可作為pending傳給exhausted()。
+    耗盡的原因一經確定不再改變。可在多個線程中使用。
+    """
+
+    def __init__(self, max_errors: Optional[int] = None, time_budget: Optional[float] = None):
+        self.max_errors = max_errors
+        self.time_budget = time_budget
+        self.errors = 0
+        self.reason: Optional[str] = None
+        # 未檢查的工作量：檢查名 -> 文件數（整個工具未執行計為1）；同一文件可能計入多項檢查
+        self.skipped: Dict[str, int] = {}
+        # 至少有一項檢查未執行的文件（去重）
+        self.skipped_paths: Set[str] = set()
+        # 已開始但在時間預算耗盡時被終止的工具
+        self.interrupted: List[str] = []
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """開始計時（運行開始時調用）"""
+        self.started = time.monotonic()
+
+    def add_error(self):
+        with self._lock:
+            self.errors += 1
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> Optional[float]:
+        """剩餘時間（秒）；沒有時間預算時為None"""
+        if self.time_budget is None:
+            return None
+        return max(0.0, self.time_budget - self.elapsed())
+
+    def exhausted(self, pending: int = 0) -> bool:
+        with self._lock:
+            if self.reason is None:
+                if self.max_errors is not None and self.errors + pending >= self.max_errors:
+                    self.reason = 'max_errors'
+                elif self.time_budget is not None and self.elapsed() >= self.time_budget:
+                    self.reason = 'time_budget'
+            return self.reason is not None
+
+    def skip(self, name: str, count: int = 1, paths: Optional[List[str]] = None):
+        """記錄未執行的檢查；給出paths時count取其長度，路徑同時計入skipped_paths"""
+        if paths is not None:
+            count = len(paths)
+        if count > 0:
+            with self._lock:
+                self.skipped[name] = self.skipped.get(name, 0) + count
+                self.skipped_paths.update(paths or ())
+
+    def interrupt(self, name: str):
+        with self._lock:
+            if name not in self.interrupted:
+                self.interrupted.append(name)
+
+    @property
+    def truncated(self) -> bool:
+        """是否有檢查因預算耗盡而未完成"""
+        return bool(self.skipped or self.interrupted)
+
+    def stats(self) -> Dict:
+        return {
+            'max_errors': self.max_errors,
+            'time_budget': self.time_budget,
+            'errors': self.errors,
+            'elapsed': round(self.elapsed(), 3),
+            'truncated': self.truncated,
+            'reason': self.reason,
+            'skipped': dict(self.skipped),
+            'skipped_files': len(self.skipped_paths),
+            'interrupted': list(self.interrupted)
+        }
+
+
+def report_paths(path: str, keys: Iterable[str]) -> Set[str]:
+    """上次報告（JSON、NDJSON或.gz）中出現在keys字段裡的路徑；報告不存在或無法解析時為空"""
+    keys = tuple(keys)
+    opener = gzip.open if path.endswith('.gz') else open
+    try:
+        with opener(path, 'rt', encoding='utf-8') as f:
+            if '.ndjson' in os.path.basename(path):
+                nodes = [json.loads(line) for line in f if line.strip()]
+            else:
+                nodes = [json.load(f)]
+    except (OSError, ValueError, EOFError):
+        return set()
+
+    paths = set()
+    while nodes:
+        node = nodes.pop()
+        if isinstance(node, dict):
+            for key in keys:
+                value = node.get(key)
+                if isinstance(value, str):
+                    paths.add(value)
+            nodes.extend(v for v in node.values() if isinstance(v, (dict, list)))
+        elif isinstance(node, list):
+            nodes.extend(v for v in node if isinstance(v, (dict, list)))
+    return paths
+
+
+class FilePriority:
+    """預算模式下的文件檢查順序
+
+    先檢查上次運行後修改的文件（新的在前），再檢查上次報告中有問題的文件，其餘文件按大小升序；
+    失敗的改動通常在前幾批文件中就能發現，小文件優先使同樣時間內檢查的文件更多。
+    """
+
+    def __init__(self, since: Optional[float], known: Set[str]):
+        # 修改時間晚於since（秒）的文件為最近修改；None表示不區分
+        self.since = since
+        self.known = {os.path.normpath(p) for p in known}
+
+    @classmethod
+    def from_reports(cls, root: str, previous_report: str, problem_reports: List[str],
+                     keys: Iterable[str] = ('file',), separator: Optional[str] = None,
+                     recent_window: float = DEFAULT_RECENT_WINDOW) -> 'FilePriority':
+        """以上次報告的寫入時間為最近修改的界限，problem_reports中出現的路徑為已知問題文件
+
+        報告中的相對路徑同時按相對於root解釋；separator之後的部分（如壓縮包成員）忽略。
+        """
+        try:
+            since = os.path.getmtime(previous_report)
+        except OSError:
+            since = time.time() - recent_window
+        known = set()
+        for path in problem_reports:
+            for file in report_paths(path, keys):
+                if separator is not None:
+                    file = file.split(separator, 1)[0]
+                known.add(file)
+                if not os.path.isabs(file):
+                    known.add(os.path.join(root, file))
+        return cls(since, known)
+
+    def key(self, path: str, mtime: Optional[float], size: Optional[int]) -> Tuple:
+        if mtime is not None and self.since is not None and mtime > self.since:
+            return (RECENT, -mtime, path)
+        tier = KNOWN_PROBLEM if os.path.normpath(path) in self.known else OTHER
+        return (tier, size if size is not None else float('inf'), path)
+
+    def order(self, paths: List[str], stat: Callable[[str], Optional[Tuple[float, int]]]) -> List[str]:
+        """按優先級排序paths；stat返回(修改時間, 大小)，未知時返回None"""
+        def key(path):
+            st = stat(path)
+            return self.key(path, *st) if st is not None else self.key(path, None, None)
+        return sorted(paths, key=key)
+
@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+# schema_validation.py - Compiled JSON-schema validators for vendored Kubernetes and Compose schemas
+
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+SCHEMA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'schemas')
+KUBERNETES_SCHEMA_FILE = os.path.join(SCHEMA_DIR, 'kubernetes.json')
+COMPOSE_SCHEMA_FILE = os.path.join(SCHEMA_DIR, 'compose-spec.json')
+
+# 同時保留的已編譯驗證函數數量（按(apiVersion, kind)計）
+DEFAULT_MAX_VALIDATORS = 64
+
+# 每個文檔最多報告的結構錯誤數
+MAX_DOCUMENT_ERRORS = 20
+
+# JSON類型到Python類型；YAML會把未加引號的日期解析為date/datetime，按字符串處理
+_PYTHON_TYPES = {
+    'object': (dict,),
+    'array': (list,),
+    'string': (str, date, datetime),
+    'integer': (int,),
+    'number': (int, float),
+    'boolean': (bool,),
+    'null': (type(None),)
+}
+
+_JSON_TYPE_NAMES = {dict: 'object', list: 'array', str: 'string', int: 'integer', float: 'number',
+                    bool: 'boolean', type(None): 'null'}
+
+# 屬性表中表示「未聲明的屬性」
+_UNDECLARED = object()
+
+# 錯誤位置：(上級位置, 鍵或下標)組成的鏈，只在出錯時才格式化
+Path = Optional[Tuple[Any, Any]]
+Check = Callable[[Any, Path, List], None]
+
+
+def format_path(path: Path) -> str:
+    """把位置鏈格式化為 spec.containers[0].image 形式"""
+    parts = []
+    while path is not None:
+        path, key = path
+        parts.append(f'[{key}]' if type(key) is int else f'.{key}')
+    return ''.join(reversed(parts)).lstrip('.')
+
+
+def _json_type(value: Any) -> str:
+    return _JSON_TYPE_NAMES.get(type(value), type(value).__name__)
+
+
+class SchemaCompiler:
+    """把JSON Schema子集編譯為嵌套的閉包
+
+    支持 $ref（#/definitions/...）、type、properties、required、additionalProperties、
+    patternProperties、items、minItems、enum、pattern、minLength、minimum、maximum、anyOf/oneOf
+    （oneOf按anyOf處理）以及Kubernetes的 x-kubernetes-int-or-string 和
+    x-kubernetes-preserve-unknown-fields；其他關鍵字忽略。
+    同一次編譯中每個定義只編譯一次，沒有約束的子模式編譯為None，驗證時直接跳過。
+    """
+
+    def __init__(self, definitions: Dict[str, Dict]):
+        self.definitions = definitions
+        self._compiled: Dict[str, Optional[Check]] = {}
+
+    def compile(self, schema: Dict) -> Optional[Check]:
+        ref = schema.get('$ref')
+        if ref is not None:
+            return self._ref(ref)
+
+        types = schema.get('type')
+        if schema.get('x-kubernetes-int-or-string'):
+            types = ['integer', 'string']
+        if isinstance(types, str):
+            types = [types]
+
+        steps: List[Check] = []
+        if not schema.get('x-kubernetes-preserve-unknown-fields'):
+            self._object_step(schema, steps)
+            self._array_step(schema, steps)
+        self._scalar_steps(schema, steps)
+        self._any_of_step(schema, steps)
+
+        if types is None:
+            if not steps:
+                return None
+            if len(steps) == 1:
+                return steps[0]
+            return self._chain(steps)
+
+        # 按精確類型判斷：bool是int的子類，不能用isinstance
+        allowed = frozenset(t for name in types for t in _PYTHON_TYPES[name])
+        expected = ' or '.join(types)
+
+        if not steps:
+            def check_type(value, path, errors):
+                if type(value) not in allowed:
+                    errors.append((path, f'expected {expected}, got {_json_type(value)}'))
+            return check_type
+
+        def check(value, path, errors):
+            if type(value) not in allowed:
+                errors.append((path, f'expected {expected}, got {_json_type(value)}'))
+                return
+            for step in steps:
+                step(value, path, errors)
+        return check
+
+    def _ref(self, ref: str) -> Optional[Check]:
+        if not ref.startswith('#/definitions/'):
+            raise ValueError(f'Unsupported $ref: {ref}')
+        name = ref[len('#/definitions/'):]
+        if name in self._compiled:
+            return self._compiled[name]
+
+        # 遞歸引用時先放入轉發函數，定義編譯完成後再填入
+        cell: List[Optional[Check]] = [None]
+
+        def forward(value, path, errors):
+            if cell[0] is not None:
+                cell[0](value, path, errors)
+
+        self._compiled[name] = forward
+        compiled = self.compile(self.definitions[name])
+        cell[0] = compiled
+        self._compiled[name] = compiled
+        return compiled
+
+    @staticmethod
+    def _chain(steps: List[Check]) -> Check:
+        def check(value, path, errors):
+            for step in steps:
+                step(value, path, errors)
+        return check
+
+    def _object_step(self, schema: Dict, steps: List[Check]):
+        properties = schema.get('properties')
+        required = tuple(schema.get('required', ()))
+        additional = schema.get('additionalProperties', True)
+        patterns = schema.get('patternProperties')
+        if properties is None and not required and additional is True and patterns is None:
+            return
+
+        props = {name: self.compile(sub) for name, sub in (properties or {}).items()}
+        pattern_checks = [(re.compile(p).search, self.compile(sub)) for p, sub in (patterns or {}).items()]
+        closed = additional is False
+        additional_check = self.compile(additional) if isinstance(additional, dict) else None
+
+        def check_object(value, path, errors):
+            if type(value) is not dict:
+                return
+            for name in required:
+                if name not in value:
+                    errors.append((path, f"missing required field '{name}'"))
+            for key, item in value.items():
+                sub = props.get(key, _UNDECLARED)
+                if sub is _UNDECLARED:
+                    for search, pattern_check in pattern_checks:
+                        if isinstance(key, str) and search(key):
+                            sub = pattern_check
+                            break
+                    else:
+                        if closed:
+                            errors.append((path, f"unknown field '{key}'"))
+                            continue
+                        sub = additional_check
+                if sub is not None:
+                    sub(item, (path, key), errors)
+
+        steps.append(check_object)
+
+    def _array_step(self, schema: Dict, steps: List[Check]):
+        items = schema.get('items')
+        item_check = self.compile(items) if isinstance(items, dict) else None
+        min_items = schema.get('minItems')
+        if item_check is None and min_items is None:
+            return
+
+        def check_array(value, path, errors):
+            if type(value) is not list:
+                return
+            if min_items is not None and len(value) < min_items:
+                errors.append((path, f'expected at least {min_items} items, got {len(value)}'))
+            if item_check is not None:
+                for i, item in enumerate(value):
+                    item_check(item, (path, i), errors)
+
+        steps.append(check_array)
+
+    def _scalar_steps(self, schema: Dict, steps: List[Check]):
+        if 'enum' in schema:
+            allowed = schema['enum']
+            choices = frozenset(v for v in allowed if isinstance(v, (str, int, float, bool)))
+
+            def check_enum(value, path, errors):
+                if type(value) in (dict, list) or value not in choices:
+                    errors.append((path, f'{value!r} is not one of {allowed}'))
+
+            steps.append(check_enum)
+
+        if 'pattern' in schema:
+            pattern = schema['pattern']
+            search = re.compile(pattern).search
+
+            def check_pattern(value, path, errors):
+                if type(value) is str and search(value) is None:
+                    errors.append((path, f'{value!r} does not match {pattern}'))
+
+            steps.append(check_pattern)
+
+        if 'minLength' in schema:
+            min_length = schema['minLength']
+
+            def check_length(value, path, errors):
+                if type(value) is str and len(value) < min_length:
+                    errors.append((path, f'expected at least {min_length} characters'))
+
+            steps.append(check_length)
+
+        minimum, maximum = schema.get('minimum'), schema.get('maximum')
+        if minimum is not None or maximum is not None:
+            def check_range(value, path, errors):
+                if type(value) not in (int, float):
+                    return
+                if minimum is not None and value < minimum:
+                    errors.append((path, f'{value} is less than the minimum of {minimum}'))
+                elif maximum is not None and value > maximum:
+                    errors.append((path, f'{value} is greater than the maximum of {maximum}'))
+
+            steps.append(check_range)
+
+    def _any_of_step(self, schema: Dict, steps: List[Check]):
+        alternatives = schema.get('anyOf') or schema.get('oneOf')
+        if not alternatives:
+            return
+        checks = [self.compile(sub) for sub in alternatives]
+        if any(c is None for c in checks):
+            return
+
+        def check_any_of(value, path, errors):
+            for alternative in checks:
+                attempt = []
+                alternative(value, path, attempt)
+                if not attempt:
+                    return
+            errors.append((path, 'does not match any of the allowed schemas'))
+
+        steps.append(check_any_of)
+
+
+class SchemaRegistry:
+    """按鍵提供已編譯的驗證函數（Kubernetes為 apiVersion/kind，Compose為 compose）
+
+    模式文件的roots把鍵映射到模式，definitions為共享定義。驗證函數在首次使用時編譯，
+    保存在LRU中；可在多個線程中使用。
+    """
+
+    def __init__(self, document: Dict, max_validators: int = DEFAULT_MAX_VALIDATORS):
+        self.roots: Dict[str, Dict] = document['roots']
+        self.definitions: Dict[str, Dict] = document.get('definitions', {})
+        self.max_validators = max(1, max_validators)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._validators: 'OrderedDict[str, Optional[Check]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str, max_validators: int = DEFAULT_MAX_VALIDATORS) -> 'SchemaRegistry':
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(json.load(f), max_validators)
+
+    def knows(self, key: str) -> bool:
+        return key in self.roots
+
+    def validator(self, key: str) -> Optional[Check]:
+        """返回鍵對應的已編譯驗證函數；沒有約束時為None"""
+        with self._lock:
+            if key in self._validators:
+                self.hits += 1
+                self._validators.move_to_end(key)
+                return self._validators[key]
+            self.misses += 1
+
+        # 編譯在鎖外進行；並發編譯同一個鍵時結果相同，後寫入的覆蓋先寫入的
+        compiled = SchemaCompiler(self.definitions).compile(self.roots[key])
+        with self._lock:
+            self._validators[key] = compiled
+            self._validators.move_to_end(key)
+            while len(self._validators) > self.max_validators:
+                self._validators.popitem(last=False)
+                self.evictions += 1
+        return compiled
+
+    def validate(self, key: str, document: Any) -> Optional[List[Tuple[str, str]]]:
+        """驗證單個文檔，返回(位置, 錯誤)列表；沒有該鍵的模式時返回None"""
+        if key not in self.roots:
+            return None
+        return self._run(self.validator(key), document)
+
+    def validate_many(self, items: List[Tuple[str, Any]]) -> List[Optional[List[Tuple[str, str]]]]:
+        """按鍵分組驗證多個文檔：每組只查找一次驗證函數，結果按輸入順序返回"""
+        groups: Dict[str, List[int]] = {}
+        for i, (key, _) in enumerate(items):
+            groups.setdefault(key, []).append(i)
+
+        results: List[Optional[List[Tuple[str, str]]]] = [None] * len(items)
+        for key, indices in groups.items():
+            if key not in self.roots:
+                continue
+            check = self.validator(key)
+            for i in indices:
+                results[i] = self._run(check, items[i][1])
+        return results
+
+    @staticmethod
+    def _run(check: Optional[Check], document: Any) -> List[Tuple[str, str]]:
+        if check is None:
+            return []
+        errors = []
+        check(document, None, errors)
+        return [(format_path(path), message) for path, message in errors[:MAX_DOCUMENT_ERRORS]]
+
+    def stats(self) -> Dict:
+        return {
+            'schemas': len(self.roots),
+            'compiled': len(self._validators),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions
+        }
+
+
+# 每個進程按模式文件共享一個註冊表（工作進程中首次使用時加載）
+_registries: Dict[str, SchemaRegistry] = {}
+_registries_lock = threading.Lock()
+
+
+def load_registry(path: str) -> SchemaRegistry:
+    """返回本進程中模式文件對應的共享註冊表"""
+    with _registries_lock:
+        registry = _registries.get(path)
+        if registry is None:
+            registry = _registries[path] = SchemaRegistry.load(path)
+        return registry
+
+
+def kubernetes_schema_key(manifest: Dict) -> str:
+    """Kubernetes清單的模式鍵：<apiVersion>/<kind>"""
+    return f"{manifest.get('apiVersion')}/{manifest.get('kind')}"
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+# secret_detection.py - Single-pass secret detection for configuration files
+
+import math
+import mmap
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+
+# 每次處理的窗口大小；窗口及其派生緩衝區都能留在CPU二級緩存中
+WINDOW_SIZE = 64 * 1024
+
+# 候選位置前後參與規則匹配的最大字節數（同時受行邊界限制）
+CONTEXT_BEFORE = 256
+CONTEXT_AFTER = 1024
+
+DEFAULT_ENTROPY_THRESHOLD = 3.5
+# 短於此長度的值熵值不可靠，不判為高熵
+MIN_ENTROPY_LENGTH = 12
+
+# 預篩選錨點（小寫）：key/token含"ke"，secret/credential含"cre"，password/passwd/passphrase含"pass"
+KEYWORD_ANCHORS = (b'ke', b'cre', b'pass')
+
+# 所有令牌格式都是至少20個連續令牌字符，用translate映射後只需一次find
+_TOKEN_CHARS = b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-+/'
+_RUN_TABLE = bytes(0x61 if b in _TOKEN_CHARS else 0x20 for b in range(256))
+_RUN_NEEDLE = b'a' * 20
+
+# 敏感鍵名賦值：KEY=value、key: value、"key": "value"（在小寫緩衝區上匹配）
+_ASSIGNMENT_VALUE = rb'["\']?[ \t]*[:=][ \t]*["\']?([^\s"\',;{}]+)'
+_ASSIGNMENT = re.compile(
+    rb'([\w.-]*(?:pass(?:word|wd|phrase)?|secret|token|credentials?|apikey'
+    rb'|(?:api|access|private|secret|client|auth|signing|encryption|master)[_.-]?key)[\w.-]*)'
+    + _ASSIGNMENT_VALUE
+)
+# .env文件中任何含key的變量名（SSH_KEY、LICENSE_KEY等）都是敏感的；YAML/JSON中的key字段太常見，不在此列
+_ENV_ASSIGNMENT = re.compile(
+    rb'([\w.-]*(?:pass(?:word|wd|phrase)?|secret|token|credentials?|key)[\w.-]*)'
+    + _ASSIGNMENT_VALUE
+)
+
+# 已知令牌格式（區分大小寫，在原始緩衝區上匹配）
+TOKEN_RULES: List[Tuple[str, str, str, bytes]] = [
+    ('private_key', 'critical', 'Private key block',
+     rb'-----BEGIN (?:[A-Z0-9]+ )*PRIVATE KEY-----'),
+    ('aws_access_key_id', 'high', 'AWS access key ID',
+     rb'\b(?:AKIA|ASIA)[0-9A-Z]{16}\b'),
+    ('github_token', 'high', 'GitHub token',
+     rb'\bgh[pousr]_[A-Za-z0-9]{36,255}\b'),
+    ('gitlab_token', 'high', 'GitLab personal access token',
+     rb'\bglpat-[A-Za-z0-9_-]{20}\b'),
+    ('slack_token', 'high', 'Slack token',
+     rb'\bxox[baprs]-[0-9A-Za-z-]{10,}'),
+    ('google_api_key', 'high', 'Google API key',
+     rb'\bAIza[0-9A-Za-z_-]{35}'),
+    ('stripe_secret_key', 'high', 'Stripe secret key',
+     rb'\b[sr]k_live_[0-9A-Za-z]{24,}'),
+    ('npm_token', 'high', 'npm access token',
+     rb'\bnpm_[A-Za-z0-9]{36}\b'),
+    ('jwt', 'medium', 'JSON Web Token',
+     rb'\beyJ[A-Za-z0-9_-]{10,}\.eyJ[A-Za-z0-9_-]{10,}\.[A-Za-z0-9_-]{10,}'),
+]
+_TOKENS = re.compile(b'|'.join(b'(?P<%s>%s)' % (rule.encode(), pattern)
+                               for rule, _, _, pattern in TOKEN_RULES))
+_TOKEN_INFO = {rule: (severity, description) for rule, severity, description, _ in TOKEN_RULES}
+
+# 引用其他位置的鍵名（secretName、password_file、tokenUrl等）不含密鑰本身
+_REFERENCE_SUFFIXES = (b'name', b'ref', b'file', b'path', b'dir', b'url', b'type', b'length')
+_PLACEHOLDERS = {
+    b'changeme', b'your_value_here', b'xxx', b'none', b'null', b'true', b'false',
+    b'redacted', b'***', b'todo'
+}
+# 環境變量、模板和YAML標籤引用
+_REFERENCE_PREFIXES = (b'$', b'{{', b'<', b'%', b'!')
+
+
+def shannon_entropy(value: bytes) -> float:
+    """每字節的香農熵（比特）"""
+    if not value:
+        return 0.0
+    length = len(value)
+    return -sum(count / length * math.log2(count / length) for count in Counter(value).values())
+
+
+def is_env_file(path: str) -> bool:
+    """文件名是否匹配.env*"""
+    return os.path.basename(path).startswith('.env')
+
+
+def redact(value: bytes) -> str:
+    """報告中只保留開頭幾個字符"""
+    keep = 4 if len(value) >= MIN_ENTROPY_LENGTH else 1
+    return value[:keep].decode('utf-8', 'replace') + '…'
+
+
+class SecretDetector:
+    """密鑰檢測器
+
+    每個窗口先轉小寫並用bytes.find查找關鍵字錨點，再用translate把令牌字符映射為同一字節、
+    查找長令牌；只有命中的行才運行完整的正則規則和熵計算。大文件通過mmap按窗口讀取。
+    """
+
+    def __init__(self, entropy_threshold: float = DEFAULT_ENTROPY_THRESHOLD):
+        self.entropy_threshold = entropy_threshold
+
+    def scan_file(self, path: str) -> List[Dict]:
+        """掃描單個文件；超過一個窗口的文件使用mmap，不整體讀入內存"""
+        env = is_env_file(path)
+        with open(path, 'rb') as f:
+            f.seek(0, 2)
+            size = f.tell()
+            if size == 0:
+                return []
+            if size <= WINDOW_SIZE:
+                f.seek(0)
+                return self.scan_bytes(f.read(), env)
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return self.scan_bytes(mm, env)
+
+    def scan_bytes(self, data, env: bool = False) -> List[Dict]:
+        """掃描bytes或mmap，返回按位置排序的發現；env為True時按.env文件的鍵名規則匹配"""
+        findings = []
+        size = len(data)
+        offset = 0
+        # 行號只在有發現時才計算，沒有發現的文件不必統計換行
+        line = 1
+        counted = 0
+        while offset < size:
+            end = _window_end(data, offset, size)
+            for pos, finding in self._scan_window(data[offset:end], env):
+                pos += offset
+                line += _count_newlines(data, counted, pos)
+                counted = pos
+                finding['line'] = line
+                finding['column'] = pos - data.rfind(b'\n', 0, pos)
+                findings.append(finding)
+            offset = end
+        return findings
+
+    def _scan_window(self, window: bytes, env: bool = False) -> List[Tuple[int, Dict]]:
+        lower = window.lower()
+        size = len(window)
+        regions = []
+
+        for anchor in KEYWORD_ANCHORS:
+            pos = lower.find(anchor)
+            while pos != -1:
+                region = _region(lower, pos, size)
+                regions.append(region)
+                pos = lower.find(anchor, region[1])
+
+        runs = window.translate(_RUN_TABLE)
+        pos = runs.find(_RUN_NEEDLE)
+        while pos != -1:
+            region = _region(lower, pos, size)
+            regions.append(region)
+            # 跳過整個令牌，避免長令牌被重複命中
+            pos = runs.find(b' ', pos)
+            if pos == -1:
+                break
+            pos = runs.find(_RUN_NEEDLE, max(pos, region[1]))
+
+        if not regions:
+            return []
+
+        found = []
+        for start, end in _merge(regions):
+            found.extend(self._match_region(window, lower, start, end, env))
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def _match_region(self, window: bytes, lower: bytes, start: int, end: int,
+                      env: bool) -> List[Tuple[int, Dict]]:
+        found = []
+        token_spans = []
+        for match in _TOKENS.finditer(window, start, end):
+            rule = match.lastgroup
+            severity, description = _TOKEN_INFO[rule]
+            value = match.group()
+            token_spans.append(match.span())
+            found.append((match.start(), {
+                'rule': rule,
+                'severity': severity,
+                'message': f'{description} found',
+                'match': redact(value),
+                'entropy': round(shannon_entropy(value), 2)
+            }))
+
+        assignment = _ENV_ASSIGNMENT if env else _ASSIGNMENT
+        for match in assignment.finditer(lower, start, end):
+            key = match.group(1)
+            if key.endswith(_REFERENCE_SUFFIXES):
+                continue
+            value_start, value_end = match.span(2)
+            value = window[value_start:value_end]
+            if value.lower() in _PLACEHOLDERS or value.startswith(_REFERENCE_PREFIXES):
+                continue
+            # 值本身是已知令牌時只報告更具體的令牌規則
+            if any(s < value_end and value_start < e for s, e in token_spans):
+                continue
+
+            entropy = shannon_entropy(value)
+            key_name = window[match.start(1):match.end(1)].decode('utf-8', 'replace')
+            if entropy >= self.entropy_threshold and len(value) >= MIN_ENTROPY_LENGTH:
+                severity, message = 'high', f'High-entropy value found for {key_name}'
+            else:
+                severity, message = 'low', f'Sensitive value found for {key_name}'
+            found.append((value_start, {
+                'rule': 'sensitive_assignment',
+                'severity': severity,
+                'message': message,
+                'match': redact(value),
+                'entropy': round(entropy, 2)
+            }))
+        return found
+
+
+class SecretStreamScanner:
+    """增量密鑰檢測：逐塊feed()流式數據（如解壓中的壓縮包成員），按窗口檢測，內存不超過兩個窗口"""
+
+    def __init__(self, detector: SecretDetector, env: bool = False):
+        self.detector = detector
+        self.env = env
+        self.findings: List[Dict] = []
+        self._buffer = bytearray()
+        self._line = 1
+        # 當前窗口起點之前、同一行已處理的字節數（窗口未在換行處結束時）
+        self._column = 0
+
+    def feed(self, data: bytes):
+        self._buffer += data
+        while len(self._buffer) > WINDOW_SIZE:
+            end = _window_end(self._buffer, 0, len(self._buffer))
+            self._scan(bytes(self._buffer[:end]))
+            del self._buffer[:end]
+
+    def close(self) -> List[Dict]:
+        """處理剩餘數據，返回按位置排序的發現"""
+        if self._buffer:
+            self._scan(bytes(self._buffer))
+            self._buffer.clear()
+        return self.findings
+
+    def _scan(self, window: bytes):
+        for pos, finding in self.detector._scan_window(window, self.env):
+            newlines = window.count(b'\n', 0, pos)
+            line_start = window.rfind(b'\n', 0, pos)
+            finding['line'] = self._line + newlines
+            finding['column'] = pos - line_start + (self._column if newlines == 0 else 0)
+            self.findings.append(finding)
+        newlines = window.count(b'\n')
+        self._line += newlines
+        tail = len(window) - window.rfind(b'\n') - 1
+        self._column = tail if newlines else self._column + tail
+
+
+def _window_end(data, offset: int, size: int) -> int:
+    """窗口在換行處結束；單行超過窗口時（如壓縮的JSON）退而在空白或逗號處切分"""
+    limit = offset + WINDOW_SIZE
+    if limit >= size:
+        return size
+    for separator in (b'\n', b' ', b','):
+        cut = data.rfind(separator, offset, limit)
+        if cut != -1:
+            return cut + 1
+    return limit
+
+
+def _count_newlines(data, start: int, end: int) -> int:
+    """按窗口統計換行數（mmap沒有count方法，整段切片又會複製大文件）"""
+    total = 0
+    for offset in range(start, end, WINDOW_SIZE):
+        total += data[offset:min(end, offset + WINDOW_SIZE)].count(b'\n')
+    return total
+
+
+def _region(lower: bytes, pos: int, size: int) -> Tuple[int, int]:
+    """候選位置所在行，前後分別不超過CONTEXT_BEFORE/CONTEXT_AFTER字節"""
+    low = max(0, pos - CONTEXT_BEFORE)
+    high = min(size, pos + CONTEXT_AFTER)
+    start = lower.rfind(b'\n', low, pos)
+    end = lower.find(b'\n', pos, high)
+    return (start + 1 if start != -1 else low), (end if end != -1 else high)
+
+
+def _merge(regions: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """合併重疊區域，保證每段只匹配一次"""
+    regions.sort()
+    merged = [list(regions[0])]
+    for start, end in regions[1:]:
+        if start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return [(start, end) for start, end in merged]
+
+
+def scan_file_secrets(path: str, entropy_threshold: float = DEFAULT_ENTROPY_THRESHOLD) -> Dict:
+    """掃描單個文件（可在工作進程中執行）"""
+    try:
+        return {'findings': SecretDetector(entropy_threshold).scan_file(path)}
+    except OSError as e:
+        return {'findings': [], 'error': str(e)}
@@ -2,225 +2,947 @@
 # security_scanner.py - Comprehensive security scanning tool
 
 import subprocess
+import asyncio
+import fnmatch
+import heapq
 import json
 import os
-from typing import Dict, List, Optional
+import shutil
+import signal
+import tempfile
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
 from datetime import datetime
 
+from advisory_index import AdvisoryIndex, parse_package_lock, parse_requirements
+from dependency_cache import DEFAULT_ADVISORY_TTL, DependencyScanCache, find_dependency_files
+from file_inventory import FileInventory
+from findings_store import FindingsStore, apply_baseline, default_db_path
+from git_revision import GitError, GitRevision, RevisionFile
+from ignore_rules import PROJECT_IGNORE_FILE, IgnoreRules
+from instrumentation import Instrumentation, rusage_peak_rss
+from report_sink import ReportSink, severity_level
+from scan_budget import FilePriority, RunBudget
+from validation_cache import ValidationCache
+
+
+# 寫入SARIF報告的掃描器版本
+SCANNER_VERSION = '1.0.0'
+
+# 單個工具的默認超時（秒）
+DEFAULT_TOOL_TIMEOUT = 1800
+
+# Bandit額外忽略的路徑（.gitignore語法），在項目忽略規則之外生效
+BANDIT_IGNORE_PATTERNS = ['test*', 'venv/']
+
+# Bandit默認掃描的文件模式
+BANDIT_INCLUDES = ['*.py', '*.pyw']
+
+# 增量清單格式變化時遞增
+BANDIT_MANIFEST_VERSION = '1'
+
+# 單次Bandit調用的命令行參數長度上限，超出時拆分為多批
+BANDIT_MAX_ARG_CHARS = 100000
+
+# 預算模式下每個Bandit分片每批掃描的文件數；每批完成後檢查一次預算
+BANDIT_BUDGET_BATCH_FILES = 32
+
+# 各依賴掃描工具讀取的依賴清單和鎖文件（項目根目錄）
+PYTHON_DEPENDENCY_FILES = ['requirements*.txt', 'Pipfile', 'Pipfile.lock', 'poetry.lock',
+                           'pyproject.toml', 'setup.py', 'setup.cfg']
+NODE_DEPENDENCY_FILES = ['package.json', 'package-lock.json', 'npm-shrinkwrap.json']
+DEPENDENCY_FILES = {
+    'safety': PYTHON_DEPENDENCY_FILES,
+    'npm-audit': NODE_DEPENDENCY_FILES,
+    'snyk': NODE_DEPENDENCY_FILES + PYTHON_DEPENDENCY_FILES + ['yarn.lock', 'pnpm-lock.yaml', '.snyk']
+}
+
+
+class ToolRun(NamedTuple):
+    """外部工具的一次執行結果"""
+    returncode: int
+    stdout: str
+    wall_time: float
+    cpu_time: Optional[float]
+    peak_rss_bytes: Optional[int] = None
+
+
+class ToolTimeoutError(Exception):
+    """外部工具執行超時"""
+
 
 class SecurityScanner:
     """安全掃描器 - 整合多種安全工具"""
     
-    def __init__(self, project_path: str):
+    def __init__(self, project_path: str, inventory: Optional[FileInventory] = None,
+                 tool_timeout: Optional[float] = DEFAULT_TOOL_TIMEOUT,
+                 tool_timeouts: Optional[Dict[str, float]] = None,
+                 max_concurrency: int = 4, bandit_shards: int = 1,
+                 bandit_incremental: bool = False, dependency_cache: bool = True,
+                 advisory_ttl: float = DEFAULT_ADVISORY_TTL, advisory_stamp: Optional[str] = None,
+                 advisory_db: Optional[str] = None, instrument: bool = True,
+                 metrics_file: Optional[str] = None, ignore: Optional[IgnoreRules] = None,
+                 stream_report: bool = False, sarif: bool = False, compress_report: bool = False,
+                 findings_db: Optional[str] = None, run_label: Optional[str] = None,
+                 baseline: Optional[str] = None, revision: Optional[str] = None,
+                 diff_base: Optional[str] = None, max_errors: Optional[int] = None,
+                 time_budget: Optional[float] = None):
         self.project_path = project_path
         self.reports_dir = os.path.join(project_path, 'reports', 'security')
         os.makedirs(self.reports_dir, exist_ok=True)
+        self.inventory = inventory
+        # 項目忽略規則（.gitignore、項目忽略文件、命令行模式）決定遍歷範圍和Bandit目標
+        self.ignore = ignore if ignore is not None else IgnoreRules.for_project(project_path)
+        self.bandit_ignore = IgnoreRules(BANDIT_IGNORE_PATTERNS)
+        self.tool_timeout = tool_timeout
+        self.tool_timeouts = tool_timeouts or {}
+        self.max_concurrency = max(1, max_concurrency)
+        # bandit_shards <= 0 表示按CPU核心數分片
+        self.bandit_shards = bandit_shards if bandit_shards > 0 else (os.cpu_count() or 1)
+        self.bandit_incremental = bandit_incremental
+        self.bandit_incremental_stats: Optional[Dict] = None
+        self.dependency_cache: Optional[DependencyScanCache] = None
+        if dependency_cache:
+            self.dependency_cache = DependencyScanCache(
+                os.path.join(self.reports_dir, 'dependency-cache.json'),
+                advisory_ttl, advisory_stamp).load()
+        # 離線漏洞庫（JSON/NDJSON）；指定後以進程內匹配代替需要聯網的依賴掃描工具
+        self.advisory_db = advisory_db
+        self._advisory_index: Optional[AdvisoryIndex] = None
+        # 每個工具的執行耗時，寫入security-summary.json
+        self.timings: Dict[str, Dict] = {}
+        # 目錄遍歷、各工具和寫報告階段的耗時與資源用量
+        self.metrics = Instrumentation(instrument)
+        self.metrics_file = metrics_file
+        # 流式報告：各工具的每條結果解析時即寫出，security-summary.json不再內嵌漏洞列表
+        self.report_sink = None
+        if stream_report or sarif:
+            self.report_sink = ReportSink(
+                'security_scanner', SCANNER_VERSION, project_path,
+                ndjson_path=os.path.join(self.reports_dir, 'security-findings.ndjson') if stream_report else None,
+                sarif_path=os.path.join(self.reports_dir, 'security-report.sarif') if sarif else None,
+                compress=compress_report)
+        # 發現記錄庫：每次運行的全部發現寫入SQLite，可與基線運行比較
+        self.findings_db = findings_db
+        self.run_label = run_label
+        self.baseline = baseline
+        self.findings_run = None
+        # git修訂模式：只用Bandit掃描修訂中（或相對合併基點改動）的Python文件，不遍歷工作樹
+        self.revision = None
+        if revision is not None or diff_base is not None:
+            self.revision = GitRevision(project_path, revision or 'HEAD', diff_base)
+        # 預算模式：錯誤級發現達到上限或時間用完時停止，Bandit按優先級分批掃描，報告標記為截斷
+        self.budget = None
+        if max_errors is not None or time_budget is not None:
+            self.budget = RunBudget(max_errors, time_budget)
+        self.priority: Optional[FilePriority] = None
     
     def run_bandit_scan(self) -> Dict:
         """執行Bandit Python安全掃描"""
-        cmd = [
-            'bandit', 
-            '-r', self.project_path,
-            '-f', 'json',
-            '-o', os.path.join(self.reports_dir, 'bandit-report.json'),
-            '--exclude', '*/test*,*/venv/*,*/.git/*'
-        ]
-        
         try:
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            
-            # 讀取報告
-            report_path = os.path.join(self.reports_dir, 'bandit-report.json')
-            if os.path.exists(report_path):
-                with open(report_path, 'r') as f:
-                    report = json.load(f)
-            else:
-                return {'tool': 'bandit', 'error': 'Report file not created'}
-            
-            # 生成摘要
-            summary = {
-                'tool': 'bandit',
-                'timestamp': datetime.now().isoformat(),
-                'total_issues': len(report.get('results', [])),
-                'high_severity': len([r for r in report.get('results', []) 
-                                    if r.get('issue_severity') == 'HIGH']),
-                'medium_severity': len([r for r in report.get('results', []) 
-                                      if r.get('issue_severity') == 'MEDIUM']),
-                'low_severity': len([r for r in report.get('results', []) 
-                                   if r.get('issue_severity') == 'LOW']),
-                'metrics': report.get('metrics', {})
-            }
-            
-            return summary
-            
+            asyncio.run(self._run_bandit_explicit_async())
+            return self._summarize_bandit()
         except Exception as e:
             print(f"Bandit scan failed: {e}")
             return {'tool': 'bandit', 'error': str(e)}
     
-    def run_safety_scan(self) -> Dict:
-        """執行Safety依賴檢查"""
-        cmd = ['safety', 'check', '--json']
+    def _bandit_targets(self) -> List[Tuple[str, int]]:
+        """從文件清單中列出待掃描的Python文件及其大小（已按忽略規則剪枝）"""
+        inventory = self.get_inventory()
+        # 外部傳入的清單可能沒有登記全部模式
+        patterns = [p for p in BANDIT_INCLUDES if p in inventory.buckets]
+        targets = []
+        for entry in inventory.find(patterns):
+            rel_path = os.path.relpath(entry.path, self.project_path)
+            if not self.bandit_ignore.is_ignored(rel_path):
+                targets.append((entry.path, entry.size))
+        return sorted(targets)
+    
+    def _revision_targets(self) -> List[RevisionFile]:
+        """git修訂模式下待掃描的Python文件（按項目忽略規則和Bandit排除規則篩選）"""
+        return [f for f in self.revision.files()
+                if any(fnmatch.fnmatch(f.path.rsplit('/', 1)[-1], p) for p in BANDIT_INCLUDES)
+                and not self.ignore.is_ignored(f.path) and not self.bandit_ignore.is_ignored(f.path)]
+    
+    def _write_revision_targets(self, root: str) -> List[Tuple[str, int]]:
+        """經一個 git cat-file --batch 進程把待掃描文件的內容寫到root下（Bandit只能讀取文件）"""
+        targets = []
+        for path, size, stream in self.revision.iter_contents(self._revision_targets()):
+            target = os.path.join(root, *path.split('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                shutil.copyfileobj(stream, f)
+            targets.append((target, size))
+        return targets
+    
+    def get_inventory(self) -> FileInventory:
+        """獲取共享文件清單，首次使用時按忽略規則遍歷一次目錄樹"""
+        if self.inventory is None:
+            self.inventory = FileInventory(self.project_path, patterns=BANDIT_INCLUDES,
+                                           ignore=self.ignore).scan()
+        return self.inventory
+    
+    async def _run_bandit_explicit_async(self):
+        """以顯式文件列表執行Bandit（按 --bandit-shards 分片，可選增量）並寫出合併報告"""
+        start = time.monotonic()
+        if self.revision is not None:
+            report, targets = await self._run_bandit_revision_async()
+        elif not self.bandit_incremental:
+            report, targets = await self._run_bandit_targets_async(self._bandit_targets())
+        else:
+            targets = self._bandit_targets()
+            report = await self._run_bandit_incremental_async(targets)
         
-        try:
-            result = subprocess.run(cmd, capture_output=True, text=True, cwd=self.project_path)
+        with open(os.path.join(self.reports_dir, 'bandit-report.json'), 'w') as f:
+            json.dump(report, f, indent=2)
+        
+        shards = [self.timings[k] for k in self.timings if k.startswith('bandit[')]
+        peaks = [t['peak_rss_mb'] for t in shards if t['peak_rss_mb'] is not None]
+        self._record_timing('bandit', time.monotonic() - start,
+                            sum(t['cpu_time'] or 0 for t in shards), None,
+                            peak_rss_bytes=int(max(peaks) * 1024 * 1024) if peaks else None,
+                            files=len(targets), nbytes=sum(size for _, size in targets))
+    
+    async def _run_bandit_revision_async(self) -> Tuple[Dict, List[Tuple[str, int]]]:
+        """掃描git修訂中的Python文件：內容只寫入臨時目錄，報告中的路徑改寫為項目中的路徑"""
+        with tempfile.TemporaryDirectory(dir=self.reports_dir) as root:
+            targets = await asyncio.to_thread(self._write_revision_targets, root)
+            report, targets = await self._run_bandit_targets_async(targets)
+            paths = [path for path, _ in targets]
+            pieces = _split_bandit_report(report, paths)
+        return _assemble_bandit_report(
+            [(os.path.join(self.project_path, os.path.relpath(path, root)), pieces[path]) for path in paths]
+        ), targets
+    
+    async def _run_bandit_incremental_async(self, targets: List[Tuple[str, int]]) -> Dict:
+        """只掃描新增或修改的文件，其餘文件沿用清單中記錄的結果"""
+        version = await asyncio.to_thread(self._bandit_version)
+        manifest = ValidationCache(os.path.join(self.reports_dir, 'bandit-manifest.json'),
+                                   f'{BANDIT_MANIFEST_VERSION}:{version}').load()
+        
+        pieces: Dict[str, Dict] = {}
+        keys: Dict[str, Optional[str]] = {}
+        changed = []
+        for path, size in targets:
+            key = manifest.content_key(path)
+            cached = manifest.get(key, 'bandit') if key is not None else None
+            if cached is None:
+                keys[path] = key
+                changed.append((path, size))
+            else:
+                pieces[path] = cached
+        
+        if changed:
+            # 預算模式下未掃描到的文件既不寫入清單也不出現在報告中
+            report, changed = await self._run_bandit_targets_async(changed)
+            fresh = _split_bandit_report(report, [path for path, _ in changed])
+            for path, _ in changed:
+                pieces[path] = fresh[path]
+                if keys[path] is not None:
+                    manifest.put(keys[path], 'bandit', fresh[path])
+        
+        removed = manifest.prune_paths({path for path, _ in targets})
+        manifest.save()
+        
+        self.bandit_incremental_stats = {
+            'scanned_files': len(changed),
+            'reused_files': len(targets) - len(keys),
+            'removed_files': removed
+        }
+        return _assemble_bandit_report([(path, pieces[path]) for path, _ in targets if path in pieces])
+    
+    def _bandit_version(self) -> str:
+        """Bandit版本，作為增量清單的版本鍵"""
+        result = subprocess.run(['bandit', '--version'], capture_output=True, text=True)
+        lines = result.stdout.splitlines()
+        return lines[0].strip() if lines else 'unknown'
+    
+    async def _run_bandit_targets_async(self, targets: List[Tuple[str, int]]) -> Tuple[Dict, List[Tuple[str, int]]]:
+        """掃描targets，返回(報告, 已掃描的文件)
+        
+        預算模式下按優先級（最近修改、上次有問題、其餘按大小升序）分批掃描，每批完成後把其中的
+        錯誤級結果計入預算；預算耗盡時不再開始下一批，被時間預算終止的一批不計入報告。
+        """
+        if self.budget is None:
+            return await self._run_bandit_files_async(targets), targets
+        
+        if self.priority is not None:
+            inventory = self.get_inventory()
+            sizes = dict(targets)
             
-            # 解析輸出
+            def stat(path):
+                entry = inventory.get(path)
+                return (entry.mtime_ns / 1e9, entry.size) if entry is not None else None
+            targets = [(path, sizes[path]) for path in self.priority.order(list(sizes), stat)]
+        else:
+            targets = sorted(targets, key=lambda t: (t[1], t[0]))
+        
+        batch = BANDIT_BUDGET_BATCH_FILES * self.bandit_shards
+        reports = []
+        scanned = 0
+        pending = 0
+        for start in range(0, len(targets), batch):
+            if self.budget.exhausted(pending):
+                break
             try:
-                report = json.loads(result.stdout) if result.stdout else []
-            except json.JSONDecodeError as e:
-                print(f"Failed to parse Safety output: {e}")
-                return {'tool': 'safety', 'error': f'Invalid JSON output: {str(e)}'}
-            
-            # 保存報告
-            with open(os.path.join(self.reports_dir, 'safety-report.json'), 'w') as f:
-                json.dump(report, f, indent=2)
-            
-            vulnerabilities = report if isinstance(report, list) else []
-            
-            summary = {
-                'tool': 'safety',
-                'timestamp': datetime.now().isoformat(),
-                'total_vulnerabilities': len(vulnerabilities),
-                'packages_affected': len(set([v.get('package', '') for v in vulnerabilities])),
-                'vulnerabilities': vulnerabilities
-            }
-            
-            return summary
+                report = await self._run_bandit_files_async(targets[start:start + batch])
+            except ToolTimeoutError:
+                if not self.budget.exhausted(pending):
+                    raise
+                break
+            reports.append(report)
+            scanned = min(start + batch, len(targets))
+            pending += sum(1 for r in report.get('results', [])
+                           if severity_level(r.get('issue_severity')) == 'error')
+        self.budget.skip('bandit', paths=[path for path, _ in targets[scanned:]])
+        return _merge_bandit_reports(reports), targets[:scanned]
+    
+    async def _run_bandit_files_async(self, targets: List[Tuple[str, int]]) -> Dict:
+        """按字節數均衡分片，並行執行多個Bandit進程後合併報告"""
+        shards = _partition_by_size(targets, self.bandit_shards)
+        semaphore = asyncio.Semaphore(self.bandit_shards)
+        
+        with tempfile.TemporaryDirectory(dir=self.reports_dir) as shard_dir:
+            async def run_shard(index: int, files: List[str]) -> List[Dict]:
+                reports = []
+                async with semaphore:
+                    for batch_index, batch in enumerate(_arg_batches(files, BANDIT_MAX_ARG_CHARS)):
+                        shard_report = os.path.join(shard_dir, f'shard-{index}-{batch_index}.json')
+                        cmd = ['bandit', '-f', 'json', '-o', shard_report, *batch]
+                        await self._run_command_async(f'bandit[{index}]', cmd)
+                        if not os.path.exists(shard_report):
+                            raise RuntimeError(f'Shard {index} report file not created')
+                        with open(shard_report, 'r') as f:
+                            reports.append(json.load(f))
+                return reports
             
+            shard_reports = await asyncio.gather(
+                *(run_shard(i, files) for i, files in enumerate(shards) if files))
+        
+        return _merge_bandit_reports([r for reports in shard_reports for r in reports])
+    
+    def _summarize_bandit(self) -> Dict:
+        """讀取Bandit報告並生成摘要"""
+        # 讀取報告
+        report_path = os.path.join(self.reports_dir, 'bandit-report.json')
+        if os.path.exists(report_path):
+            with open(report_path, 'r') as f:
+                report = json.load(f)
+        else:
+            return {'tool': 'bandit', 'error': 'Report file not created'}
+        
+        # 生成摘要：一次遍歷同時計數並寫出流式報告
+        severities = {'HIGH': 0, 'MEDIUM': 0, 'LOW': 0}
+        for r in report.get('results', []):
+            if r.get('issue_severity') in severities:
+                severities[r['issue_severity']] += 1
+            self._emit('bandit', r, r.get('test_id'), r.get('issue_severity'), r.get('issue_text'),
+                       r.get('filename'), r.get('line_number'), (r.get('col_offset') or 0) + 1)
+        
+        summary = {
+            'tool': 'bandit',
+            'timestamp': datetime.now().isoformat(),
+            'total_issues': len(report.get('results', [])),
+            'high_severity': severities['HIGH'],
+            'medium_severity': severities['MEDIUM'],
+            'low_severity': severities['LOW'],
+            'metrics': report.get('metrics', {})
+        }
+        
+        if self.bandit_incremental_stats is not None:
+            summary['incremental'] = self.bandit_incremental_stats
+        
+        return summary
+    
+    def run_safety_scan(self) -> Dict:
+        """執行Safety依賴檢查"""
+        try:
+            key, cached = self._cached_dependency_scan('safety', self._safety_command())
+            if cached is not None:
+                return self._summarize_safety(cached)
+            result = self._run_command('safety', self._safety_command(), cwd=self.project_path)
+            return self._store_dependency_scan('safety', key, result.stdout,
+                                               self._summarize_safety(result.stdout))
         except Exception as e:
             print(f"Safety scan failed: {e}")
             return {'tool': 'safety', 'error': str(e)}
     
+    def _safety_command(self) -> List[str]:
+        return ['safety', 'check', '--json']
+    
+    def _summarize_safety(self, stdout: str) -> Dict:
+        """解析Safety輸出並生成摘要"""
+        # 解析輸出
+        try:
+            report = json.loads(stdout) if stdout else []
+        except json.JSONDecodeError as e:
+            print(f"Failed to parse Safety output: {e}")
+            return {'tool': 'safety', 'error': f'Invalid JSON output: {str(e)}'}
+        
+        # 保存報告
+        with open(os.path.join(self.reports_dir, 'safety-report.json'), 'w') as f:
+            json.dump(report, f, indent=2)
+        
+        vulnerabilities = report if isinstance(report, list) else []
+        for v in vulnerabilities:
+            self._emit('safety', v, v.get('vulnerability_id') or v.get('id'), v.get('severity'),
+                       v.get('advisory') or f"{v.get('package', '')} {v.get('installed_version', '')}")
+        
+        summary = {
+            'tool': 'safety',
+            'timestamp': datetime.now().isoformat(),
+            'total_vulnerabilities': len(vulnerabilities),
+            'packages_affected': len(set([v.get('package', '') for v in vulnerabilities])),
+            'vulnerabilities': vulnerabilities
+        }
+        
+        return self._without_findings(summary)
+    
     def run_npm_audit(self) -> Dict:
         """執行npm audit掃描"""
         if not os.path.exists(os.path.join(self.project_path, 'package.json')):
             return {'tool': 'npm-audit', 'skipped': 'No package.json found'}
         
-        cmd = ['npm', 'audit', '--json']
-        
         try:
-            result = subprocess.run(
-                cmd, 
-                capture_output=True, 
-                text=True,
-                cwd=self.project_path
-            )
-            
-            report = json.loads(result.stdout) if result.stdout else {}
-            
-            # 保存報告
-            with open(os.path.join(self.reports_dir, 'npm-audit.json'), 'w') as f:
-                json.dump(report, f, indent=2)
-            
-            summary = {
-                'tool': 'npm-audit',
-                'timestamp': datetime.now().isoformat(),
-                'total_vulnerabilities': report.get('metadata', {}).get('vulnerabilities', {}).get('total', 0),
-                'critical': report.get('metadata', {}).get('vulnerabilities', {}).get('critical', 0),
-                'high': report.get('metadata', {}).get('vulnerabilities', {}).get('high', 0),
-                'moderate': report.get('metadata', {}).get('vulnerabilities', {}).get('moderate', 0),
-                'low': report.get('metadata', {}).get('vulnerabilities', {}).get('low', 0)
-            }
-            
-            return summary
-            
+            key, cached = self._cached_dependency_scan('npm-audit', self._npm_audit_command())
+            if cached is not None:
+                return self._summarize_npm_audit(cached)
+            result = self._run_command('npm-audit', self._npm_audit_command(), cwd=self.project_path)
+            return self._store_dependency_scan('npm-audit', key, result.stdout,
+                                               self._summarize_npm_audit(result.stdout))
         except Exception as e:
             print(f"npm audit failed: {e}")
             return {'tool': 'npm-audit', 'error': str(e)}
     
+    def _npm_audit_command(self) -> List[str]:
+        return ['npm', 'audit', '--json']
+    
+    def _summarize_npm_audit(self, stdout: str) -> Dict:
+        """解析npm audit輸出並生成摘要"""
+        report = json.loads(stdout) if stdout else {}
+        
+        # 保存報告
+        with open(os.path.join(self.reports_dir, 'npm-audit.json'), 'w') as f:
+            json.dump(report, f, indent=2)
+        
+        # npm 7+ 的vulnerabilities是以包名為鍵的對象
+        vulnerabilities = report.get('vulnerabilities', {})
+        for name, v in (vulnerabilities.items() if isinstance(vulnerabilities, dict) else []):
+            self._emit('npm-audit', {'package': name, **v}, name, v.get('severity'),
+                       f"{name} {v.get('range', '')}".strip(),
+                       os.path.join(self.project_path, 'package.json'))
+        
+        summary = {
+            'tool': 'npm-audit',
+            'timestamp': datetime.now().isoformat(),
+            'total_vulnerabilities': report.get('metadata', {}).get('vulnerabilities', {}).get('total', 0),
+            'critical': report.get('metadata', {}).get('vulnerabilities', {}).get('critical', 0),
+            'high': report.get('metadata', {}).get('vulnerabilities', {}).get('high', 0),
+            'moderate': report.get('metadata', {}).get('vulnerabilities', {}).get('moderate', 0),
+            'low': report.get('metadata', {}).get('vulnerabilities', {}).get('low', 0)
+        }
+        
+        return summary
+    
     def run_snyk_scan(self) -> Dict:
         """執行Snyk安全掃描"""
         if not self._check_command_exists('snyk'):
             return {'tool': 'snyk', 'skipped': 'Snyk not installed'}
         
-        cmd = ['snyk', 'test', '--json']
-        
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                cwd=self.project_path
-            )
-            
-            report = json.loads(result.stdout) if result.stdout else {}
-            
-            # 保存報告
-            with open(os.path.join(self.reports_dir, 'snyk-report.json'), 'w') as f:
-                json.dump(report, f, indent=2)
-            
-            summary = {
-                'tool': 'snyk',
-                'timestamp': datetime.now().isoformat(),
-                'total_vulnerabilities': len(report.get('vulnerabilities', [])),
-                'unique_count': report.get('uniqueCount', 0),
-                'critical': len([v for v in report.get('vulnerabilities', []) 
-                               if v.get('severity') == 'critical']),
-                'high': len([v for v in report.get('vulnerabilities', []) 
-                           if v.get('severity') == 'high']),
-                'medium': len([v for v in report.get('vulnerabilities', []) 
-                             if v.get('severity') == 'medium']),
-                'low': len([v for v in report.get('vulnerabilities', []) 
-                          if v.get('severity') == 'low'])
-            }
-            
-            return summary
-            
+            key, cached = self._cached_dependency_scan('snyk', self._snyk_command())
+            if cached is not None:
+                return self._summarize_snyk(cached)
+            result = self._run_command('snyk', self._snyk_command(), cwd=self.project_path)
+            return self._store_dependency_scan('snyk', key, result.stdout,
+                                               self._summarize_snyk(result.stdout))
         except Exception as e:
             print(f"Snyk scan failed: {e}")
             return {'tool': 'snyk', 'error': str(e)}
     
+    def _snyk_command(self) -> List[str]:
+        return ['snyk', 'test', '--json']
+    
+    def _summarize_snyk(self, stdout: str) -> Dict:
+        """解析Snyk輸出並生成摘要"""
+        report = json.loads(stdout) if stdout else {}
+        
+        # 保存報告
+        with open(os.path.join(self.reports_dir, 'snyk-report.json'), 'w') as f:
+            json.dump(report, f, indent=2)
+        
+        target = report.get('displayTargetFile')
+        for v in report.get('vulnerabilities', []):
+            self._emit('snyk', v, v.get('id'), v.get('severity'),
+                       f"{v.get('packageName', '')}@{v.get('version', '')}: {v.get('title', '')}",
+                       os.path.join(self.project_path, target) if target else None)
+        
+        summary = {
+            'tool': 'snyk',
+            'timestamp': datetime.now().isoformat(),
+            'total_vulnerabilities': len(report.get('vulnerabilities', [])),
+            'unique_count': report.get('uniqueCount', 0),
+            'critical': len([v for v in report.get('vulnerabilities', [])
+                           if v.get('severity') == 'critical']),
+            'high': len([v for v in report.get('vulnerabilities', [])
+                       if v.get('severity') == 'high']),
+            'medium': len([v for v in report.get('vulnerabilities', [])
+                         if v.get('severity') == 'medium']),
+            'low': len([v for v in report.get('vulnerabilities', [])
+                      if v.get('severity') == 'low'])
+        }
+        
+        return summary
+    
+    def _cached_dependency_scan(self, tool: str, cmd: List[str]) -> Tuple[Optional[str], Optional[str]]:
+        """返回(緩存鍵, 緩存的工具輸出)；依賴文件和工具版本都未變化時可跳過子進程"""
+        if self.dependency_cache is None or tool not in DEPENDENCY_FILES:
+            return None, None
+        
+        version = self._tool_version(cmd[0])
+        if version is None:
+            return None, None
+        
+        files = find_dependency_files(self.project_path, DEPENDENCY_FILES[tool])
+        # Safety未指定-r時檢查的是已安裝的包，因此把當前環境的包列表也納入鍵
+        extra = _installed_distributions() if tool == 'safety' else []
+        try:
+            key = self.dependency_cache.make_key(tool, version, files, extra)
+        except OSError:
+            return None, None
+        return key, self.dependency_cache.get(tool, key)
+    
+    def _store_dependency_scan(self, tool: str, key: Optional[str], stdout: str, summary: Dict) -> Dict:
+        """只緩存成功解析的輸出"""
+        if self.dependency_cache is not None and key is not None and stdout and 'error' not in summary:
+            self.dependency_cache.put(tool, key, stdout)
+        return summary
+    
+    def _tool_version(self, command: str) -> Optional[str]:
+        """工具版本字符串，工具不可用時返回None"""
+        try:
+            result = subprocess.run([command, '--version'], capture_output=True, text=True, timeout=60)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        if result.returncode != 0:
+            return None
+        return result.stdout.strip()
+    
+    def run_offline_dependency_scan(self) -> Dict:
+        """以本地漏洞庫匹配requirements*.txt和package-lock.json中的依賴，不啟動子進程也不需要聯網"""
+        if not self.advisory_db:
+            return {'tool': 'offline-deps', 'skipped': 'No advisory database configured'}
+        
+        start = time.monotonic()
+        cpu_start = time.thread_time()
+        try:
+            summary = self._offline_dependency_scan()
+        except (OSError, ValueError) as e:
+            print(f"Offline dependency scan failed: {e}")
+            summary = {'tool': 'offline-deps', 'error': str(e)}
+        self._record_timing('offline-deps', time.monotonic() - start,
+                            time.thread_time() - cpu_start, None)
+        return summary
+    
+    def _offline_dependency_scan(self) -> Dict:
+        if self._advisory_index is None:
+            self._advisory_index = AdvisoryIndex.from_file(self.advisory_db)
+        index = self._advisory_index
+        
+        dependencies = []
+        unpinned = 0
+        parsed_files = set()
+        for path in find_dependency_files(self.project_path, ['requirements*.txt']):
+            parsed, skipped = parse_requirements(path, parsed_files)
+            dependencies.extend(parsed)
+            unpinned += skipped
+        for path in find_dependency_files(self.project_path, ['package-lock.json', 'npm-shrinkwrap.json']):
+            dependencies.extend(parse_package_lock(path))
+        
+        vulnerabilities = []
+        for dep in dependencies:
+            for advisory in index.match(dep.ecosystem, dep.name, dep.version):
+                vulnerabilities.append({
+                    'package': dep.name,
+                    'installed_version': dep.version,
+                    'ecosystem': dep.ecosystem,
+                    'source': os.path.relpath(dep.source, self.project_path),
+                    'id': advisory['id'],
+                    'severity': advisory['severity'],
+                    'summary': advisory['summary'],
+                    'fixed_in': advisory['fixed_in']
+                })
+        vulnerabilities.sort(key=lambda v: (v['ecosystem'], v['package'], v['installed_version'], v['id']))
+        for v in vulnerabilities:
+            self._emit('offline-deps', v, v['id'], v['severity'],
+                       f"{v['package']} {v['installed_version']}: {v['summary']}",
+                       os.path.join(self.project_path, v['source']))
+        
+        with open(os.path.join(self.reports_dir, 'offline-deps-report.json'), 'w') as f:
+            json.dump(vulnerabilities, f, indent=2, ensure_ascii=False)
+        
+        # 與safety和npm audit的摘要字段一致，_generate_summary無需修改
+        summary = {
+            'tool': 'offline-deps',
+            'timestamp': datetime.now().isoformat(),
+            'total_vulnerabilities': len(vulnerabilities),
+            'packages_affected': len(set((v['ecosystem'], v['package']) for v in vulnerabilities)),
+            'critical': sum(1 for v in vulnerabilities if v['severity'] == 'critical'),
+            'high': sum(1 for v in vulnerabilities if v['severity'] == 'high'),
+            'moderate': sum(1 for v in vulnerabilities if v['severity'] == 'moderate'),
+            'low': sum(1 for v in vulnerabilities if v['severity'] == 'low'),
+            'packages_checked': len(dependencies),
+            'unpinned_requirements': unpinned,
+            'advisory_db': index.stats(),
+            'vulnerabilities': vulnerabilities
+        }
+        
+        return self._without_findings(summary)
+    
+    def _emit(self, tool: str, record: Dict, rule: Optional[str], severity: Optional[str], message: str,
+              file: Optional[str] = None, line: Optional[int] = None, column: Optional[int] = None):
+        """把一條工具結果寫入流式報告和發現記錄庫（都未啟用時不做任何事）"""
+        rule_id = f'{tool}/{rule}' if rule else tool
+        level = severity_level(severity)
+        if self.budget is not None and level == 'error':
+            self.budget.add_error()
+        if self.findings_run is not None:
+            self.findings_run.add(rule_id, level, message, file, line, severity)
+        if self.report_sink is not None:
+            self.report_sink.emit({'tool': tool, **record}, rule_id, level, message, file, line, column)
+    
+    def _without_findings(self, summary: Dict) -> Dict:
+        """流式報告時摘要中不再內嵌漏洞列表"""
+        if self.report_sink is not None:
+            summary.pop('vulnerabilities', None)
+        return summary
+    
     def _check_command_exists(self, command: str) -> bool:
         """檢查命令是否存在"""
         from shutil import which
         return which(command) is not None
     
-    def run_all_scans(self) -> Dict:
-        """執行所有安全掃描"""
+    def _timeout_for(self, tool: str) -> Optional[float]:
+        timeout = self.tool_timeouts.get(tool, self.tool_timeout)
+        # 預算模式下不超過剩餘時間，超時即預算耗盡
+        remaining = self.budget.remaining() if self.budget is not None else None
+        if remaining is not None and (timeout is None or remaining < timeout):
+            return remaining
+        return timeout
+    
+    def _run_command(self, tool: str, cmd: List[str], cwd: Optional[str] = None) -> ToolRun:
+        """同步執行外部工具並記錄耗時"""
+        # 與並發模式共用同一實現，通過wait4取得該工具自身的CPU時間和峰值RSS
+        return asyncio.run(self._run_command_async(tool, cmd, cwd=cwd))
+    
+    async def _run_command_async(self, tool: str, cmd: List[str], cwd: Optional[str] = None) -> ToolRun:
+        """以asyncio等待外部工具結束，支持超時和取消"""
+        timeout = self._timeout_for(tool)
+        loop = asyncio.get_running_loop()
+        start = time.monotonic()
+        
+        # 輸出寫入臨時文件，避免管道緩衝區寫滿阻塞工具
+        with tempfile.TemporaryFile() as out:
+            process = subprocess.Popen(cmd, stdout=out, stderr=subprocess.DEVNULL, cwd=cwd,
+                                       start_new_session=True)
+            try:
+                returncode, usage = await asyncio.wait_for(
+                    _wait_process(process, loop), timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                _kill_process_group(process)
+                process.wait()
+                timed_out = isinstance(e, asyncio.TimeoutError)
+                self._record_timing(tool, time.monotonic() - start, None, None,
+                                    timed_out=timed_out, cancelled=not timed_out)
+                if timed_out and self.budget is not None and self.budget.exhausted():
+                    self.budget.interrupt(tool.split('[')[0])
+                    raise ToolTimeoutError(f'{cmd[0]} stopped: time budget of {self.budget.time_budget}s exhausted')
+                if timed_out:
+                    raise ToolTimeoutError(f'{cmd[0]} timed out after {timeout}s')
+                raise
+            
+            out.seek(0)
+            stdout = out.read().decode('utf-8', errors='replace')
+        
+        run = ToolRun(returncode, stdout, time.monotonic() - start,
+                      usage.ru_utime + usage.ru_stime if usage is not None else None,
+                      rusage_peak_rss(usage) if usage is not None else None)
+        self._record_timing(tool, run.wall_time, run.cpu_time, run.returncode,
+                            peak_rss_bytes=run.peak_rss_bytes)
+        return run
+    
+    def _record_timing(self, tool: str, wall_time: float, cpu_time: Optional[float],
+                       returncode: Optional[int], timed_out: bool = False, cancelled: bool = False,
+                       peak_rss_bytes: Optional[int] = None, files: int = 0, nbytes: int = 0):
+        self.timings[tool] = {
+            'wall_time': round(wall_time, 3),
+            'cpu_time': round(cpu_time, 3) if cpu_time is not None else None,
+            'peak_rss_mb': round(peak_rss_bytes / (1024 * 1024), 1) if peak_rss_bytes is not None else None,
+            'returncode': returncode,
+            'timed_out': timed_out,
+            'cancelled': cancelled
+        }
+        self.metrics.record(f'tool.{tool}', wall_time, cpu_time, files, nbytes, peak_rss_bytes)
+    
+    def _scan_plan(self) -> List[Tuple[str, str, str]]:
+        """按項目內容確定需要執行的掃描：(結果鍵, 工具名, 提示)"""
+        plan = []
+        
+        # git修訂模式只掃描源代碼：依賴掃描檢查的是已安裝的環境和工作樹中的鎖文件
+        if self.revision is not None:
+            if self._has_python_files():
+                plan.append(('bandit', 'bandit', "  🐍 Running Bandit on the git revision..."))
+            return plan
+        
+        # Python安全掃描
+        if self._has_python_files():
+            plan.append(('bandit', 'bandit', "  🐍 Running Bandit..."))
+            if not self.advisory_db:
+                plan.append(('safety', 'safety', "  🛡️ Running Safety..."))
+        
+        # Node.js安全掃描
+        if os.path.exists(os.path.join(self.project_path, 'package.json')) and not self.advisory_db:
+            plan.append(('npm_audit', 'npm-audit', "  📦 Running npm audit..."))
+            plan.append(('snyk', 'snyk', "  🔍 Running Snyk..."))
+        
+        # 離線依賴掃描，代替需要聯網的Safety/npm audit/Snyk
+        if self.advisory_db:
+            plan.append(('offline_deps', 'offline-deps', "  📚 Running offline dependency scan..."))
+        
+        return plan
+    
+    def _tool_spec(self, tool: str) -> Tuple[Optional[Dict], List[str], Optional[str], Callable[[str], Dict], str]:
+        """返回(跳過結果, 命令, 工作目錄, 摘要函數, 失敗提示)"""
+        if tool == 'safety':
+            return None, self._safety_command(), self.project_path, self._summarize_safety, 'Safety scan failed'
+        if tool == 'npm-audit':
+            skipped = None
+            if not os.path.exists(os.path.join(self.project_path, 'package.json')):
+                skipped = {'tool': 'npm-audit', 'skipped': 'No package.json found'}
+            return skipped, self._npm_audit_command(), self.project_path, self._summarize_npm_audit, 'npm audit failed'
+        if tool == 'snyk':
+            skipped = None
+            if not self._check_command_exists('snyk'):
+                skipped = {'tool': 'snyk', 'skipped': 'Snyk not installed'}
+            return skipped, self._snyk_command(), self.project_path, self._summarize_snyk, 'Snyk scan failed'
+        raise ValueError(f'Unknown tool: {tool}')
+    
+    def _budget_skipped(self, tool: str) -> Optional[Dict]:
+        """預算已耗盡時不再啟動工具，返回跳過結果"""
+        if self.budget is None or not self.budget.exhausted():
+            return None
+        self.budget.skip(tool)
+        return {'tool': tool, 'skipped': f'Budget exhausted ({self.budget.reason})'}
+    
+    async def _run_scan_async(self, tool: str, semaphore: asyncio.Semaphore) -> Dict:
+        """在並發上限內執行單個工具；預算模式下取得執行名額時預算已耗盡則跳過"""
+        async with semaphore:
+            skipped = self._budget_skipped(tool)
+            if skipped is not None:
+                return skipped
+            return await self._run_tool_async(tool)
+    
+    async def _run_tool_async(self, tool: str) -> Dict:
+        if tool == 'offline-deps':
+            return await asyncio.to_thread(self.run_offline_dependency_scan)
+        if tool == 'bandit':
+            try:
+                await self._run_bandit_explicit_async()
+                return self._summarize_bandit()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Bandit scan failed: {e}")
+                return {'tool': 'bandit', 'error': str(e)}
+        
+        skipped, cmd, cwd, summarize, failure = self._tool_spec(tool)
+        if skipped is not None:
+            return skipped
+        
+        try:
+            key, cached = await asyncio.to_thread(self._cached_dependency_scan, tool, cmd)
+            if cached is not None:
+                return summarize(cached)
+            result = await self._run_command_async(tool, cmd, cwd=cwd)
+            return self._store_dependency_scan(tool, key, result.stdout, summarize(result.stdout))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"{failure}: {e}")
+            return {'tool': tool, 'error': str(e)}
+    
+    async def _run_scans_async(self, plan: List[Tuple[str, str, str]]) -> Dict:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [asyncio.create_task(self._run_scan_async(tool, semaphore)) for _, tool, _ in plan]
+        try:
+            if self.budget is None:
+                scan_results = await asyncio.gather(*tasks)
+            else:
+                scan_results = await self._gather_within_budget(tasks, [tool for _, tool, _ in plan])
+        except BaseException:
+            # 任一任務被取消時終止其餘工具
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return {key: result for (key, _, _), result in zip(plan, scan_results)}
+    
+    async def _gather_within_budget(self, tasks: List[asyncio.Task], tools: List[str]) -> List[Dict]:
+        """等待全部工具；任一工具完成後預算耗盡時取消其餘仍在執行的工具"""
+        pending = set(tasks)
+        while pending:
+            _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            if pending and self.budget.exhausted():
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                break
+        
+        scan_results = []
+        for task, tool in zip(tasks, tools):
+            if task.cancelled():
+                self.budget.interrupt(tool)
+                scan_results.append({'tool': tool, 'skipped': f'Budget exhausted ({self.budget.reason})'})
+            else:
+                scan_results.append(task.result())
+        return scan_results
+    
+    def run_all_scans(self, concurrent: bool = False, verbose: bool = True) -> Dict:
+        """執行所有安全掃描；verbose為False時不打印進度（批量模式）"""
+        log = print if verbose else (lambda *args: None)
+        log("🔒 Starting comprehensive security scans...")
+        results, plan = self.begin_scans()
+        
+        try:
+            if concurrent:
+                log(f"  🚀 Running {len(plan)} tools concurrently (max {self.max_concurrency})...")
+                results['scans'] = asyncio.run(self._run_scans_async(plan))
+            else:
+                for key, tool, message in plan:
+                    skipped = self._budget_skipped(tool)
+                    if skipped is not None:
+                        results['scans'][key] = skipped
+                        continue
+                    log(message)
+                    results['scans'][key] = self.run_tool(tool)
+        finally:
+            # 中途出錯時也結束輸出文件，已寫出的記錄保持可讀
+            self._close_outputs()
+        
+        return self.finish_scans(results, plan, log)
+    
+    def begin_scans(self) -> Tuple[Dict, List[Tuple[str, str, str]]]:
+        """開始一次運行：記錄庫、預算和執行計劃，返回(待填入各工具結果的報告, 執行計劃)"""
         results = {
             'timestamp': datetime.now().isoformat(),
             'project_path': self.project_path,
             'scans': {}
         }
         
-        print("🔒 Starting comprehensive security scans...")
+        if self.findings_db is not None:
+            self.findings_run = FindingsStore(self.findings_db).begin_run(
+                'security_scanner', self.project_path, self.run_label)
         
-        # Python安全掃描
-        if self._has_python_files():
-            print("  🐍 Running Bandit...")
-            results['scans']['bandit'] = self.run_bandit_scan()
-            
-            print("  🛡️ Running Safety...")
-            results['scans']['safety'] = self.run_safety_scan()
+        if self.budget is not None:
+            self.budget.start()
+            # 上次的報告在本次覆蓋前讀取：其寫入時間之後修改的文件和其中有問題的文件優先掃描
+            if self.revision is None:
+                self.priority = FilePriority.from_reports(
+                    self.project_path, os.path.join(self.reports_dir, 'security-summary.json'),
+                    [os.path.join(self.reports_dir, name) for name in
+                     ('bandit-report.json', 'security-findings.ndjson', 'security-findings.ndjson.gz')],
+                    keys=('filename',))
         
-        # Node.js安全掃描
-        if os.path.exists(os.path.join(self.project_path, 'package.json')):
-            print("  📦 Running npm audit...")
-            results['scans']['npm_audit'] = self.run_npm_audit()
-            
-            print("  🔍 Running Snyk...")
-            results['scans']['snyk'] = self.run_snyk_scan()
+        with self.metrics.phase('walk'):
+            plan = self._scan_plan()
+        if self.revision is None:
+            inventory = self.get_inventory()
+            results['inventory'] = {
+                'files': len(inventory.entries),
+                'directories_scanned': inventory.directories_scanned,
+                'directories_pruned': inventory.directories_pruned,
+                'ignore_sources': self.ignore.sources
+            }
+        return results, plan
+    
+    def run_tool(self, tool: str) -> Dict:
+        """同步執行計劃中的單個工具，返回其摘要"""
+        runners = {
+            'bandit': self.run_bandit_scan,
+            'safety': self.run_safety_scan,
+            'npm-audit': self.run_npm_audit,
+            'snyk': self.run_snyk_scan,
+            'offline-deps': self.run_offline_dependency_scan
+        }
+        return runners[tool]()
+    
+    def _close_outputs(self):
+        if self.report_sink is not None:
+            self.report_sink.close()
+        if self.revision is not None:
+            self.revision.close()
+    
+    def finish_scans(self, results: Dict, plan: List[Tuple[str, str, str]], log: Callable = print) -> Dict:
+        """結束一次運行：生成摘要，寫入記錄庫和 security-summary.json"""
+        self._close_outputs()
+        if self.revision is not None:
+            results['revision'] = self.revision.describe()
         
-        # 生成總體摘要
+        # 按執行計劃排序，分片等子條目（如bandit[0]）緊隨其工具
+        order = {tool: i for i, (_, tool, _) in enumerate(plan)}
+        results['timings'] = dict(sorted(self.timings.items(),
+                                         key=lambda item: (order.get(item[0].split('[')[0], len(order)),
+                                                           '[' in item[0])))
+        
+        if self.dependency_cache is not None:
+            results['dependency_cache'] = self.dependency_cache.stats()
+        
+        # 生成總體摘要（各工具摘要中的計數在解析結果時累計）
         results['summary'] = self._generate_summary(results['scans'])
+        if self.report_sink is not None:
+            results['report_stream'] = self.report_sink.stats()
+        
+        # 有基線時只有新增的錯誤級（critical/high）發現導致失敗
+        if self.findings_run is not None:
+            results['findings_store'] = self.findings_run.complete('security_scanner', self.baseline)
+            self.findings_run = None
+            apply_baseline(results['summary'], results['findings_store'], log)
+        
+        # 截斷的部分報告不能判定為通過
+        if self.budget is not None:
+            results['budget'] = self.budget.stats()
+            if self.budget.truncated:
+                results['summary']['truncated'] = True
+                results['summary']['passed'] = False
+                limit = (f"{self.budget.max_errors} errors" if self.budget.reason == 'max_errors'
+                         else f"{self.budget.time_budget}s")
+                log(f"  ⏱️ Budget of {limit} exhausted after {results['budget']['elapsed']}s, "
+                    f"not completed: {', '.join(dict.fromkeys([*self.budget.skipped, *self.budget.interrupted]))}")
+        
+        # 寫報告本身的耗時只能計入Prometheus指標文件
+        if self.metrics.enabled:
+            results['metrics'] = self.metrics.to_dict()
         
         # 保存總體報告
         summary_file = os.path.join(self.reports_dir, 'security-summary.json')
-        with open(summary_file, 'w') as f:
-            json.dump(results, f, indent=2, ensure_ascii=False)
+        with self.metrics.phase('report_write') as phase:
+            with open(summary_file, 'w') as f:
+                json.dump(results, f, indent=2, ensure_ascii=False)
+                phase.count(1, f.tell())
+        
+        if self.metrics_file:
+            self.metrics.write_prometheus(self.metrics_file, 'security_scanner',
+                                          {'project': os.path.abspath(self.project_path)})
         
-        print(f"\n✅ Security scans completed. Report saved to {summary_file}")
+        log(f"\n✅ Security scans completed. Report saved to {summary_file}")
         
         return results
     
     def _has_python_files(self) -> bool:
-        """檢查項目是否包含Python文件"""
-        for root, dirs, files in os.walk(self.project_path):
-            # 排除常見的依賴目錄
-            dirs[:] = [d for d in dirs if d not in ['venv', '.venv', 'node_modules', '.git']]
-            if any(f.endswith('.py') for f in files):
-                return True
-        return False
+        """檢查項目是否包含Python文件（與Bandit目標共用同一份文件清單）"""
+        if self.revision is not None:
+            return bool(self._revision_targets())
+        return self.get_inventory().has_files('*.py')
     
     def _generate_summary(self, scans: Dict) -> Dict:
         """生成總體摘要"""
@@ -250,12 +972,251 @@ class SecurityScanner:
         }
 
 
+def _partition_by_size(files: List[Tuple[str, int]], shards: int) -> List[List[str]]:
+    """按字節數把文件分成大小均衡的分片（最長處理時間優先的貪心分配）"""
+    buckets: List[List[str]] = [[] for _ in range(max(1, shards))]
+    heap = [(0, i) for i in range(len(buckets))]
+    for path, size in sorted(files, key=lambda f: (-f[1], f[0])):
+        total, index = heapq.heappop(heap)
+        buckets[index].append(path)
+        heapq.heappush(heap, (total + size, index))
+    return [sorted(bucket) for bucket in buckets]
+
+
+def _arg_batches(files: List[str], max_chars: int) -> List[List[str]]:
+    """將文件列表拆分為命令行長度不超過max_chars的批次"""
+    batches, batch, length = [], [], 0
+    for path in files:
+        if batch and length + len(path) + 1 > max_chars:
+            batches.append(batch)
+            batch, length = [], 0
+        batch.append(path)
+        length += len(path) + 1
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def _merge_bandit_reports(reports: List[Dict]) -> Dict:
+    """合併多個Bandit JSON報告：results和errors拼接，metrics逐文件合併並累加_totals"""
+    merged = {
+        'errors': [],
+        'generated_at': datetime.now().isoformat(),
+        'metrics': {'_totals': {}},
+        'results': []
+    }
+    totals = merged['metrics']['_totals']
+    
+    for report in reports:
+        merged['errors'].extend(report.get('errors', []))
+        merged['results'].extend(report.get('results', []))
+        for name, metrics in report.get('metrics', {}).items():
+            if name != '_totals':
+                merged['metrics'][name] = metrics
+                continue
+            for key, value in metrics.items():
+                if isinstance(value, (int, float)):
+                    totals[key] = totals.get(key, 0) + value
+    
+    merged['results'].sort(key=lambda r: (r.get('filename', ''), r.get('line_number', 0),
+                                          r.get('test_id', '')))
+    return merged
+
+
+def _split_bandit_report(report: Dict, paths: List[str]) -> Dict[str, Dict]:
+    """把Bandit報告按文件拆分為 {路徑: {results, metrics, errors}}"""
+    pieces = {path: {'results': [], 'metrics': None, 'errors': []} for path in paths}
+    # Bandit報告中的相對路徑帶有./前綴，按規範化後的路徑對應
+    lookup = {os.path.normpath(path): path for path in paths}
+    for result in report.get('results', []):
+        path = lookup.get(os.path.normpath(result.get('filename') or '.'))
+        if path is not None:
+            pieces[path]['results'].append(result)
+    for error in report.get('errors', []):
+        path = lookup.get(os.path.normpath(error.get('filename') or '.'))
+        if path is not None:
+            pieces[path]['errors'].append(error)
+    for name, metrics in report.get('metrics', {}).items():
+        path = lookup.get(os.path.normpath(name))
+        if path is not None:
+            pieces[path]['metrics'] = metrics
+    return pieces
+
+
+def _assemble_bandit_report(pieces: List[Tuple[str, Dict]]) -> Dict:
+    """由逐文件結果重建完整的Bandit報告，_totals按文件指標重新累加"""
+    report = {
+        'errors': [],
+        'generated_at': datetime.now().isoformat(),
+        'metrics': {'_totals': {}},
+        'results': []
+    }
+    totals = report['metrics']['_totals']
+    
+    for path, piece in pieces:
+        # 內容相同的文件共享緩存結果，回放時改寫為當前路徑
+        report['results'].extend({**r, 'filename': path} for r in piece['results'])
+        report['errors'].extend({**e, 'filename': path} for e in piece['errors'])
+        if piece['metrics'] is not None:
+            report['metrics'][path] = piece['metrics']
+            for key, value in piece['metrics'].items():
+                if isinstance(value, (int, float)):
+                    totals[key] = totals.get(key, 0) + value
+    
+    report['results'].sort(key=lambda r: (r.get('filename', ''), r.get('line_number', 0),
+                                          r.get('test_id', '')))
+    return report
+
+
+def _installed_distributions() -> List[str]:
+    """當前Python環境中已安裝的包（name==version）"""
+    from importlib import metadata
+    return sorted(f"{dist.metadata['Name']}=={dist.version}" for dist in metadata.distributions())
+
+
+def _kill_process_group(process: subprocess.Popen):
+    """終止工具及其派生的全部子進程"""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (ProcessLookupError, PermissionError):
+        process.kill()
+
+
+async def _wait_process(process: subprocess.Popen, loop: asyncio.AbstractEventLoop):
+    """異步等待子進程結束，返回(退出碼, 資源用量)
+    
+    Linux上通過pidfd得到退出通知，其他POSIX平台以WNOHANG輪詢；兩者都用wait4回收，
+    從而讀取該子進程自身（含其已回收的後代）的CPU時間和峰值RSS。沒有wait4的平台不記錄資源用量。
+    """
+    if hasattr(os, 'pidfd_open'):
+        pidfd = os.pidfd_open(process.pid)
+        try:
+            exited = loop.create_future()
+            loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+            try:
+                await exited
+            finally:
+                loop.remove_reader(pidfd)
+        finally:
+            os.close(pidfd)
+        
+        _, status, usage = os.wait4(process.pid, 0)
+        process.returncode = os.waitstatus_to_exitcode(status)
+        return process.returncode, usage
+    
+    if hasattr(os, 'wait4'):
+        while True:
+            pid, status, usage = os.wait4(process.pid, os.WNOHANG)
+            if pid:
+                process.returncode = os.waitstatus_to_exitcode(status)
+                return process.returncode, usage
+            await asyncio.sleep(0.05)
+    
+    while process.poll() is None:
+        await asyncio.sleep(0.05)
+    return process.returncode, None
+
+
 if __name__ == "__main__":
     import sys
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='Comprehensive security scanning tool')
+    parser.add_argument('project_path', nargs='?', default='.')
+    parser.add_argument('--concurrent', action='store_true',
+                        help='Run independent tools in parallel')
+    parser.add_argument('--max-concurrency', type=int, default=4,
+                        help='Maximum number of tools running at once in concurrent mode')
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TOOL_TIMEOUT,
+                        help='Per-tool timeout in seconds (0 = no timeout)')
+    parser.add_argument('--bandit-shards', type=int, default=1,
+                        help='Split Bandit into N parallel processes balanced by file size (0 = all CPU cores)')
+    parser.add_argument('--bandit-incremental', action='store_true',
+                        help='Only rescan Python files changed since the last run (reports/security/bandit-manifest.json)')
+    parser.add_argument('--no-dependency-cache', action='store_true',
+                        help='Always rerun Safety/npm audit/Snyk instead of replaying cached results')
+    parser.add_argument('--advisory-ttl-hours', type=float, default=DEFAULT_ADVISORY_TTL / 3600,
+                        help='Maximum age of cached dependency scan results')
+    parser.add_argument('--advisory-db-stamp',
+                        help='Advisory database version/date; cached results are reused only while it is unchanged')
+    parser.add_argument('--advisory-db',
+                        help='Match dependencies against a local advisory dump (JSON/NDJSON) instead of running Safety/npm audit/Snyk')
+    parser.add_argument('--metrics-file',
+                        help='Also write per-phase metrics to this Prometheus textfile-collector file')
+    parser.add_argument('--no-instrumentation', action='store_true',
+                        help='Do not record per-phase metrics (per-tool timings are always recorded)')
+    parser.add_argument('--ignore', action='append', default=[], metavar='PATTERN',
+                        help='Extra .gitignore-style pattern to skip (repeatable; highest precedence)')
+    parser.add_argument('--ignore-file',
+                        help=f'Read ignore patterns from this file instead of <project>/{PROJECT_IGNORE_FILE}')
+    parser.add_argument('--no-gitignore', action='store_true',
+                        help='Do not apply .gitignore files found during the walk')
+    parser.add_argument('--stream-report', action='store_true',
+                        help='Append every tool finding to reports/security/security-findings.ndjson as it is parsed '
+                             'instead of embedding vulnerability lists in security-summary.json')
+    parser.add_argument('--gzip-report', action='store_true',
+                        help='Gzip-compress the --stream-report NDJSON file')
+    parser.add_argument('--sarif', action='store_true',
+                        help='Stream findings to reports/security/security-report.sarif (SARIF 2.1.0)')
+    parser.add_argument('--findings-db', action='store_true',
+                        help='Record every finding of this run in reports/findings.db (query it with findings_store.py)')
+    parser.add_argument('--run-label',
+                        help='Label this run in the findings database (e.g. the branch name) so it can be used as a baseline')
+    parser.add_argument('--baseline', metavar='RUN',
+                        help='Fail only on critical/high findings that are new since this run '
+                             '(id, label, latest or latest~N); implies --findings-db')
+    parser.add_argument('--rev', metavar='REV',
+                        help='Run Bandit on the Python files of this git revision read from the object database '
+                             'instead of the working tree (default with --diff-base: HEAD); dependency scans are skipped')
+    parser.add_argument('--diff-base', metavar='REV',
+                        help='Only scan files added or modified since the merge base of REV and --rev')
+    parser.add_argument('--max-errors', type=int, metavar='N',
+                        help='Stop as soon as N critical/high findings have been found and write a partial report '
+                             'marked as truncated')
+    parser.add_argument('--time-budget', type=float, metavar='SECONDS',
+                        help='Stop all tools once this many seconds have passed and write a partial report '
+                             'marked as truncated')
+    args = parser.parse_args()
+    if args.metrics_file and args.no_instrumentation:
+        parser.error('--metrics-file requires instrumentation')
+    if args.gzip_report and not args.stream_report:
+        parser.error('--gzip-report requires --stream-report')
+    if args.run_label and not (args.findings_db or args.baseline):
+        parser.error('--run-label requires --findings-db')
+    if (args.rev or args.diff_base) and args.bandit_incremental:
+        parser.error('--rev/--diff-base cannot be combined with --bandit-incremental')
+    if args.max_errors is not None and args.max_errors < 1:
+        parser.error('--max-errors must be at least 1')
+    if args.time_budget is not None and args.time_budget <= 0:
+        parser.error('--time-budget must be positive')
+    if (args.max_errors is not None or args.time_budget is not None) and args.baseline:
+        parser.error('--max-errors/--time-budget cannot be combined with --baseline')
     
-    project_path = sys.argv[1] if len(sys.argv) > 1 else '.'
-    scanner = SecurityScanner(project_path)
-    results = scanner.run_all_scans()
+    ignore = IgnoreRules.for_project(args.project_path, patterns=args.ignore,
+                                     ignore_file=args.ignore_file,
+                                     use_gitignore=not args.no_gitignore)
+    scanner = SecurityScanner(args.project_path, tool_timeout=args.timeout or None,
+                              max_concurrency=args.max_concurrency,
+                              bandit_shards=args.bandit_shards,
+                              bandit_incremental=args.bandit_incremental,
+                              dependency_cache=not args.no_dependency_cache,
+                              advisory_ttl=args.advisory_ttl_hours * 3600,
+                              advisory_stamp=args.advisory_db_stamp,
+                              advisory_db=args.advisory_db,
+                              instrument=not args.no_instrumentation,
+                              metrics_file=args.metrics_file,
+                              ignore=ignore, stream_report=args.stream_report,
+                              sarif=args.sarif, compress_report=args.gzip_report,
+                              findings_db=default_db_path(args.project_path)
+                              if args.findings_db or args.baseline else None,
+                              run_label=args.run_label, baseline=args.baseline,
+                              revision=args.rev, diff_base=args.diff_base,
+                              max_errors=args.max_errors, time_budget=args.time_budget)
+    try:
+        results = scanner.run_all_scans(concurrent=args.concurrent)
+    except GitError as e:
+        print(f"❌ {e}", file=sys.stderr)
+        sys.exit(2)
     
     # 打印摘要
     print("\n" + "="*60)
@@ -264,6 +1225,12 @@ if __name__ == "__main__":
     print(f"Total Issues: {results['summary']['total_issues']}")
     print(f"Critical: {results['summary']['critical']}")
     print(f"High: {results['summary']['high']}")
+    if 'new_findings' in results['summary']:
+        print(f"New Findings: {results['summary']['new_findings']}")
+    if results['summary'].get('truncated'):
+        budget = results['budget']
+        not_completed = ', '.join(dict.fromkeys([*budget['skipped'], *budget['interrupted']]))
+        print(f"Truncated: {budget['reason']} (not completed: {not_completed})")
     print(f"Status: {'✅ PASSED' if results['summary']['passed'] else '❌ FAILED'}")
     
     sys.exit(0 if results['summary']['passed'] else 1)
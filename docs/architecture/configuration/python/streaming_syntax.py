@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+# streaming_syntax.py - Memory-bounded YAML/JSON syntax checks for very large files
+
+import codecs
+import re
+from typing import Optional
+
+import yaml
+
+
+DEFAULT_CHUNK_SIZE = 1 << 20
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_STRING_RUN = re.compile(r'[^"\\\x00-\x1f]*')
+_ESCAPE = re.compile(r'\\(?:["\\/bfnrt]|u[0-9a-fA-F]{4})')
+_NUMBER = re.compile(r'-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][-+]?[0-9]+)?')
+
+# 與json模塊默認行為一致，接受NaN和Infinity
+_LITERALS = ('true', 'false', 'null', 'NaN', 'Infinity', '-Infinity')
+_MAX_LITERAL = max(len(lit) for lit in _LITERALS)
+
+
+def check_yaml_syntax(path: str, loader: type = yaml.SafeLoader) -> Optional[str]:
+    """只遍歷解析事件檢查YAML語法，不構建對象圖
+
+    未定義別名等組合階段的錯誤不在事件層面檢測。
+    """
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return check_yaml_stream(f, loader)
+    except OSError as e:
+        return str(e)
+
+
+def check_yaml_stream(stream, loader: type = yaml.SafeLoader) -> Optional[str]:
+    """對已打開的文本流做事件級YAML語法檢查（如壓縮包成員）"""
+    # 延遲導入，避免與config_validator循環導入
+    from config_validator import format_yaml_error
+
+    try:
+        for _ in yaml.parse(stream, Loader=loader):
+            pass
+        return None
+    except yaml.YAMLError as e:
+        return format_yaml_error(e)
+    except UnicodeDecodeError as e:
+        return str(e)
+
+
+def check_json_syntax(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Optional[str]:
+    """以分塊讀取的增量詞法分析檢查JSON語法，返回與json模塊格式相近的錯誤信息"""
+    try:
+        with open(path, 'rb') as f:
+            return check_json_stream(f, chunk_size)
+    except OSError as e:
+        return str(e)
+
+
+def check_json_stream(stream, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Optional[str]:
+    """對已打開的二進制流做增量JSON語法檢查（如壓縮包成員）"""
+    try:
+        _JSONStreamChecker(stream, chunk_size).run()
+        return None
+    except (_JSONSyntaxError, UnicodeDecodeError) as e:
+        return str(e)
+
+
+class _JSONSyntaxError(ValueError):
+    pass
+
+
+class _JSONStreamChecker:
+    """基於狀態機的增量JSON語法檢查器，內存佔用與文件大小無關"""
+
+    def __init__(self, stream, chunk_size: int):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')('strict')
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+        # 緩衝區起點之前已丟棄的字符數、行號及當前行起點
+        self.offset = 0
+        self.line = 1
+        self.line_start = 0
+
+    def run(self):
+        stack = []
+        state = 'value'
+
+        self._ensure(1)
+        if self.buffer.startswith('\ufeff'):
+            self._fail('Unexpected UTF-8 BOM (decode using utf-8-sig)', 0)
+
+        while True:
+            self._skip_whitespace()
+            if self.pos >= len(self.buffer):
+                if state == 'done':
+                    return
+                if state in ('key', 'key_or_end'):
+                    self._fail('Expecting property name enclosed in double quotes', self.pos)
+                if state == 'colon':
+                    self._fail("Expecting ':' delimiter", self.pos)
+                if state == 'comma_or_end':
+                    self._fail("Expecting ',' delimiter", self.pos)
+                self._fail('Expecting value', self.pos)
+
+            c = self.buffer[self.pos]
+
+            if state in ('value', 'value_or_end'):
+                if state == 'value_or_end' and c == ']':
+                    stack.pop()
+                    self.pos += 1
+                elif c == '{':
+                    stack.append('}')
+                    self.pos += 1
+                    state = 'key_or_end'
+                    continue
+                elif c == '[':
+                    stack.append(']')
+                    self.pos += 1
+                    state = 'value_or_end'
+                    continue
+                else:
+                    self._scan_scalar(c)
+                state = 'comma_or_end' if stack else 'done'
+
+            elif state in ('key', 'key_or_end'):
+                if state == 'key_or_end' and c == '}':
+                    stack.pop()
+                    self.pos += 1
+                    state = 'comma_or_end' if stack else 'done'
+                elif c == '"':
+                    self._scan_string()
+                    state = 'colon'
+                else:
+                    self._fail('Expecting property name enclosed in double quotes', self.pos)
+
+            elif state == 'colon':
+                if c != ':':
+                    self._fail("Expecting ':' delimiter", self.pos)
+                self.pos += 1
+                state = 'value'
+
+            elif state == 'comma_or_end':
+                if c == ',':
+                    self.pos += 1
+                    state = 'key' if stack[-1] == '}' else 'value'
+                elif c == stack[-1]:
+                    stack.pop()
+                    self.pos += 1
+                    state = 'comma_or_end' if stack else 'done'
+                else:
+                    self._fail("Expecting ',' delimiter", self.pos)
+
+            else:
+                self._fail('Extra data', self.pos)
+
+    def _scan_scalar(self, c: str):
+        if c == '"':
+            self._scan_string()
+            return
+
+        self._ensure(_MAX_LITERAL)
+        for literal in _LITERALS:
+            if self.buffer.startswith(literal, self.pos):
+                self.pos += len(literal)
+                return
+
+        if c == '-' or '0' <= c <= '9':
+            while True:
+                m = _NUMBER.match(self.buffer, self.pos)
+                if m is None:
+                    break
+                if m.end() == len(self.buffer) and not self.eof:
+                    # 數字可能跨越分塊邊界
+                    self._fill()
+                    continue
+                self.pos = m.end()
+                return
+
+        self._fail('Expecting value', self.pos)
+
+    def _scan_string(self):
+        start = self.pos
+        # 字符串起點的行列位置只在需要讀入新分塊前計算一次
+        start_position = None
+        self.pos += 1
+        while True:
+            self.pos = _STRING_RUN.match(self.buffer, self.pos).end()
+            if self.pos >= len(self.buffer):
+                if start_position is None:
+                    start_position = self._position(start)
+                if not self._fill():
+                    self._fail_at('Unterminated string starting at', start_position)
+                continue
+
+            c = self.buffer[self.pos]
+            if c == '"':
+                self.pos += 1
+                return
+            if c == '\\':
+                if start_position is None and len(self.buffer) - self.pos < 6:
+                    start_position = self._position(start)
+                self._ensure(6)
+                m = _ESCAPE.match(self.buffer, self.pos)
+                if m is None:
+                    if self.buffer.startswith('\\u', self.pos):
+                        self._fail('Invalid \\uXXXX escape', self.pos + 1)
+                    self._fail('Invalid \\escape', self.pos)
+                self.pos = m.end()
+                continue
+            self._fail('Invalid control character at', self.pos)
+
+    def _skip_whitespace(self):
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or not self._fill():
+                return
+
+    def _ensure(self, length: int):
+        while len(self.buffer) - self.pos < length and self._fill():
+            pass
+
+    def _fill(self) -> bool:
+        """丟棄已消費的文本並讀入下一個分塊，到達文件末尾時返回False"""
+        if self.eof:
+            return False
+
+        consumed = self.buffer[:self.pos]
+        if consumed:
+            newlines = consumed.count('\n')
+            if newlines:
+                self.line += newlines
+                self.line_start = self.offset + consumed.rfind('\n') + 1
+            self.offset += len(consumed)
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+
+        data = self.stream.read(self.chunk_size)
+        if not data:
+            self.eof = True
+            self.buffer += self.decoder.decode(b'', final=True)
+            return False
+        self.buffer += self.decoder.decode(data)
+        return True
+
+    def _position(self, pos: int):
+        absolute = self.offset + pos
+        newlines = self.buffer.count('\n', 0, pos)
+        if newlines:
+            lineno = self.line + newlines
+            colno = pos - self.buffer.rfind('\n', 0, pos)
+        else:
+            lineno = self.line
+            colno = absolute - self.line_start + 1
+        return lineno, colno, absolute
+
+    def _fail(self, message: str, pos: int):
+        self._fail_at(message, self._position(pos))
+
+    def _fail_at(self, message: str, position):
+        lineno, colno, absolute = position
+        raise _JSONSyntaxError(f'{message}: line {lineno} column {colno} (char {absolute})')
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# test_config_validator.py - Regression tests for cached validation results across run options
+
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config_validator import ConfigValidator  # noqa: E402
+
+
+def run(root, **options):
+    validator = ConfigValidator(root, instrument=False, **options)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return validator.run_all_validations()
+
+
+class SyntaxOnlyCacheTest(unittest.TestCase):
+    """只做語法檢查的結果不能被後續的完整運行當作緩存命中"""
+
+    def test_full_run_after_syntax_only_run(self):
+        with tempfile.TemporaryDirectory() as root:
+            # 語法正確，但SafeLoader構造時拒絕
+            with open(os.path.join(root, 'app.yaml'), 'w') as f:
+                f.write('a: !!python/object:os.system {}\n')
+
+            self.assertEqual(run(root, syntax_only=True)['validations']['yaml']['invalid_files'], 0)
+            self.assertEqual(run(root)['validations']['yaml']['invalid_files'], 1)
+            self.assertEqual(run(root, syntax_only=True)['validations']['yaml']['invalid_files'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
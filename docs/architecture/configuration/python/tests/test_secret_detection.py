@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# test_secret_detection.py - Regression tests for sensitive key names in .env files
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from secret_detection import SecretDetector, SecretStreamScanner, scan_file_secrets  # noqa: E402
+
+
+ENV_CONTENT = b'SSH_KEY=abc123\nLICENSE_KEY=XYZ-123-456\nDB_PASSWORD=s3cretpw\nKEY_FILE=/etc/ssh/key\n'
+
+
+def flagged(findings):
+    return [f['message'].rsplit(' ', 1)[-1] for f in findings if f['rule'] == 'sensitive_assignment']
+
+
+class EnvKeyNamesTest(unittest.TestCase):
+    """.env文件中任何含key的變量名都按敏感值檢測（與原來的關鍵字列表一致）"""
+
+    def test_env_file_flags_any_key_name(self):
+        with tempfile.TemporaryDirectory() as root:
+            path = os.path.join(root, '.env')
+            with open(path, 'wb') as f:
+                f.write(ENV_CONTENT)
+            result = scan_file_secrets(path)
+        self.assertEqual(flagged(result['findings']), ['SSH_KEY', 'LICENSE_KEY', 'DB_PASSWORD'])
+
+    def test_stream_scanner_env_member(self):
+        scanner = SecretStreamScanner(SecretDetector(), env=True)
+        scanner.feed(ENV_CONTENT)
+        self.assertEqual(flagged(scanner.close()), ['SSH_KEY', 'LICENSE_KEY', 'DB_PASSWORD'])
+
+    def test_yaml_key_fields_not_flagged(self):
+        findings = SecretDetector().scan_bytes(b'tolerations:\n- key: node-role\nssh_key: abc123\n')
+        self.assertEqual(flagged(findings), [])
+
+    def test_high_entropy_key_graded_high(self):
+        findings = SecretDetector().scan_bytes(b'LICENSE_KEY=Q7vR2kLp9XzW4mNt8Bc3\n', env=True)
+        self.assertEqual([f['severity'] for f in findings], ['high'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# validation_cache.py - Persistent per-file validation result cache
+
+import json
+import os
+import time
+from typing import Dict, Optional
+
+from content_dedup import hash_file
+from file_inventory import FileEntry
+
+
+# mtime距離寫入時間太近時stat數據不可信（同一時間粒度內可能再次修改）
+RACY_MTIME_WINDOW_NS = 2 * 1000 * 1000 * 1000
+
+
+class ValidationCache:
+    """驗證結果緩存 - 以內容哈希加驗證器版本為鍵，跨運行持久化"""
+
+    def __init__(self, cache_file: str, version: str, max_entries: int = 100000):
+        self.cache_file = cache_file
+        self.version = version
+        self.max_entries = max_entries
+        # 路徑 -> {size, mtime_ns, hash, used}
+        self.paths: Dict[str, Dict] = {}
+        # "版本:哈希" -> {checks: {檢查名: 結果}, used}
+        self.blobs: Dict[str, Dict] = {}
+        self.run_seq = 0
+        self.hits = 0
+        self.misses = 0
+        self.hashed_files = 0
+        self.stat_skips = 0
+        self.evicted = 0
+
+    def load(self) -> 'ValidationCache':
+        """讀取緩存文件，版本不符或損壞時從空緩存開始"""
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            data = {}
+
+        if isinstance(data, dict) and data.get('version') == self.version:
+            self.paths = data.get('paths', {})
+            self.blobs = data.get('blobs', {})
+            self.run_seq = data.get('run_seq', 0)
+        self.run_seq += 1
+        return self
+
+    def content_key(self, path: str, entry: Optional[FileEntry] = None) -> Optional[str]:
+        """返回文件內容鍵；stat數據未變時直接沿用上次的哈希"""
+        if entry is not None:
+            size, mtime_ns = entry.size, entry.mtime_ns
+        else:
+            try:
+                st = os.stat(path)
+            except OSError:
+                return None
+            size, mtime_ns = st.st_size, st.st_mtime_ns
+
+        known = self.paths.get(path)
+        if known is not None and known.get('size') == size and known.get('mtime_ns') == mtime_ns:
+            self.stat_skips += 1
+            known['used'] = self.run_seq
+            return f"{self.version}:{known['hash']}"
+
+        try:
+            digest = hash_file(path)
+        except OSError:
+            return None
+        self.hashed_files += 1
+
+        trusted = mtime_ns < time.time_ns() - RACY_MTIME_WINDOW_NS
+        self.paths[path] = {
+            'size': size if trusted else None,
+            'mtime_ns': mtime_ns if trusted else None,
+            'hash': digest,
+            'used': self.run_seq
+        }
+        return f'{self.version}:{digest}'
+
+    def get(self, key: str, check: str) -> Optional[Dict]:
+        """讀取某項檢查的緩存結果"""
+        blob = self.blobs.get(key)
+        result = blob['checks'].get(check) if blob is not None else None
+        if result is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        blob['used'] = self.run_seq
+        return result
+
+    def put(self, key: str, check: str, result: Dict):
+        """記錄某項檢查的結果"""
+        blob = self.blobs.setdefault(key, {'checks': {}})
+        blob['checks'][check] = result
+        blob['used'] = self.run_seq
+
+    def new_run(self):
+        """常駐進程（watch模式）中開始新一輪驗證：按輪次記錄最近使用，淘汰超出上限的條目"""
+        self.run_seq += 1
+        self.evicted += self._evict(self.blobs)
+        self._evict(self.paths)
+
+    def prune_paths(self, keep: set) -> int:
+        """刪除不在keep中的路徑記錄（例如已刪除的文件），返回刪除數量"""
+        removed = [path for path in self.paths if path not in keep]
+        for path in removed:
+            del self.paths[path]
+        return len(removed)
+
+    def save(self):
+        """按最近使用順序淘汰超出上限的條目後寫回磁盤"""
+        self.evicted += self._evict(self.blobs)
+        self._evict(self.paths)
+
+        data = {
+            'version': self.version,
+            'run_seq': self.run_seq,
+            'paths': self.paths,
+            'blobs': self.blobs
+        }
+        tmp_file = self.cache_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_file, self.cache_file)
+
+    def stats(self) -> Dict:
+        """緩存命中統計"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hashed_files': self.hashed_files,
+            'stat_skips': self.stat_skips,
+            'entries': len(self.blobs),
+            'evicted': self.evicted
+        }
+
+    def _evict(self, table: Dict[str, Dict]) -> int:
+        overflow = len(table) - self.max_entries
+        if overflow <= 0:
+            return 0
+        oldest = sorted(table, key=lambda k: table[k].get('used', 0))[:overflow]
+        for key in oldest:
+            del table[key]
+        return overflow
@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+# watch_daemon.py - Watch mode: revalidate changed files and serve the report over a Unix socket
+
+import ctypes
+import ctypes.util
+import errno
+import json
+import os
+import resource
+import selectors
+import signal
+import socket
+import struct
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from file_inventory import FileInventory
+from ignore_rules import PROJECT_IGNORE_FILE, IgnoreRules
+from instrumentation import rusage_peak_rss
+
+
+# 最後一個事件之後等待的秒數；事件持續不斷時最多延遲MAX_DELAY秒
+DEFAULT_DEBOUNCE = 0.2
+MAX_DELAY = 2.0
+
+# inotify不可用時（非Linux、監視數超過fs.inotify.max_user_watches）的輪詢間隔
+DEFAULT_POLL_INTERVAL = 2.0
+
+# 默認套接字位於 reports/config/ 下
+SOCKET_NAME = 'watch.sock'
+
+COMMANDS = ('ping', 'status', 'summary', 'report', 'sync', 'stop')
+
+# 變化時需要重建忽略規則並重新遍歷的文件
+IGNORE_FILE_NAMES = ('.gitignore', PROJECT_IGNORE_FILE)
+
+# <sys/inotify.h>
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+              | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR | IN_DONT_FOLLOW)
+
+# struct inotify_event的定長部分：wd, mask, cookie, len
+_EVENT = struct.Struct('iIII')
+
+_MAX_REQUEST = 1024
+
+
+class InotifyWatcher:
+    """基於inotify的目錄監視
+
+    每個遍歷到的目錄一個監視（inotify不遞歸），被忽略規則剪枝的目錄不佔用監視。
+    目錄的創建、刪除、移動和事件隊列溢出都要求重新遍歷。
+    """
+
+    mode = 'inotify'
+
+    def __init__(self):
+        libc_name = ctypes.util.find_library('c')
+        if libc_name is None:
+            raise OSError(errno.ENOSYS, 'libc not found')
+        self._libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(self._libc, 'inotify_init1'):
+            raise OSError(errno.ENOSYS, 'inotify is not available on this platform')
+        fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.fd = fd
+        # 監視描述符 <-> 目錄路徑
+        self.dirs: Dict[int, str] = {}
+        self._wds: Dict[str, int] = {}
+
+    def fileno(self) -> int:
+        return self.fd
+
+    def sync(self, directories: List[str]):
+        """使監視集合與目錄列表一致；超過系統監視上限時拋出OSError(ENOSPC)"""
+        wanted = set(directories)
+        for path in [p for p in self._wds if p not in wanted]:
+            wd = self._wds.pop(path)
+            # 目錄改名後同一監視可能已登記在新路徑下
+            if self.dirs.get(wd) == path:
+                del self.dirs[wd]
+                self._libc.inotify_rm_watch(self.fd, wd)
+
+        for path in directories:
+            if path in self._wds:
+                continue
+            wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err in (errno.ENOENT, errno.ENOTDIR, errno.EACCES):
+                    # 遍歷之後已被刪除或不可讀
+                    continue
+                raise OSError(err, os.strerror(err), path)
+            previous = self.dirs.get(wd)
+            if previous is not None and previous != path:
+                self._wds.pop(previous, None)
+            self._wds[path] = wd
+            self.dirs[wd] = path
+
+    def read(self) -> Tuple[List[str], bool]:
+        """讀取所有待處理事件，返回(變化的文件路徑, 是否需要重新遍歷)"""
+        paths = []
+        rescan = False
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    rescan = True
+                    continue
+                if mask & IN_IGNORED:
+                    # 目錄已刪除或監視已移除
+                    path = self.dirs.pop(wd, None)
+                    if path is not None and self._wds.get(path) == wd:
+                        del self._wds[path]
+                    continue
+                directory = self.dirs.get(wd)
+                if directory is None:
+                    continue
+                if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                    rescan = True
+                elif mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO):
+                        rescan = True
+                else:
+                    paths.append(os.path.join(directory, name))
+        return paths, rescan
+
+    def watch_count(self) -> int:
+        return len(self.dirs)
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+        self.dirs.clear()
+        self._wds.clear()
+
+
+class PollingWatcher:
+    """stat輪詢：每隔interval秒重新遍歷目錄樹，比較文件的大小和mtime"""
+
+    mode = 'poll'
+
+    def __init__(self, interval: float = DEFAULT_POLL_INTERVAL):
+        self.interval = interval
+        self.next_poll = time.monotonic() + interval
+
+    def sync(self, directories: List[str]):
+        pass
+
+    def watch_count(self) -> int:
+        return 0
+
+    def close(self):
+        pass
+
+
+class WatchDaemon:
+    """常駐驗證進程
+
+    文件清單和驗證結果（持久緩存的內存副本）常駐內存，變化的文件只刷新其stat數據，
+    未變化的文件直接命中緩存，不再打開解析；當前報告序列化後通過Unix套接字提供。
+    每輪驗證前清空本輪的解析緩存等臨時狀態，持久緩存按max_entries淘汰，內存不隨運行時間增長。
+    """
+
+    def __init__(self, validator, socket_path: Optional[str] = None,
+                 ignore_factory: Optional[Callable[[], IgnoreRules]] = None,
+                 debounce: float = DEFAULT_DEBOUNCE, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 force_poll: bool = False):
+        self.validator = validator
+        self.project_path = validator.project_path
+        self.socket_path = socket_path or os.path.join(validator.reports_dir, SOCKET_NAME)
+        self.ignore_factory = ignore_factory or (lambda: IgnoreRules.for_project(self.project_path))
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.watcher = None
+        self.force_poll = force_poll
+        self.generation = 0
+        self.report = b'{}'
+        self.summary: Optional[Dict] = None
+        self.last_run: Dict = {}
+        self.running = False
+        self._selector = None
+        # 待處理的變化：文件路徑、是否需要重新遍歷、首個和最近一個事件的時間
+        self._changed: Set[str] = set()
+        self._rescan = False
+        self._first_event = None
+        self._last_event = None
+
+    def serve_forever(self) -> int:
+        """完成首輪驗證後開始監視和提供服務，直到收到stop命令或SIGINT/SIGTERM"""
+        listener = self._listen()
+        if listener is None:
+            return 1
+
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(listener, selectors.EVENT_READ, 'listen')
+        signal.signal(signal.SIGTERM, signal.default_int_handler)
+        try:
+            self.watcher = PollingWatcher(self.poll_interval)
+            if not self.force_poll:
+                try:
+                    self.watcher = InotifyWatcher()
+                    self._selector.register(self.watcher.fd, selectors.EVENT_READ, 'watch')
+                except OSError as e:
+                    print(f"⚠️ inotify unavailable ({e}), polling every {self.poll_interval}s")
+
+            self._rescan = True
+            self._revalidate()
+            print(f"👀 Watching {self.project_path} ({self.watcher.mode}), serving {self.socket_path}")
+
+            self.running = True
+            while self.running:
+                for key, _ in self._selector.select(self._timeout()):
+                    if key.data == 'watch':
+                        self._note(*self.watcher.read())
+                    else:
+                        self._accept(listener)
+                self._tick()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close(listener)
+        return 0
+
+    def close(self, listener: Optional[socket.socket] = None):
+        """停止監視，保存持久緩存，刪除套接字文件"""
+        if listener is not None:
+            listener.close()
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+        if self.watcher is not None:
+            self.watcher.close()
+        self.validator.close()
+        if self.validator.validation_cache is not None:
+            self.validator.validation_cache.save()
+        print("👋 Watch mode stopped")
+
+    def _listen(self) -> Optional[socket.socket]:
+        """創建套接字；已有守護進程在同一路徑監聽時返回None，殘留的套接字文件直接替換"""
+        if os.path.exists(self.socket_path):
+            try:
+                query(self.socket_path, 'ping', timeout=1.0)
+                print(f"❌ A watch daemon is already listening on {self.socket_path}")
+                return None
+            except OSError:
+                os.unlink(self.socket_path)
+
+        listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        # 報告中含有密鑰檢測結果，套接字只對當前用戶開放
+        umask = os.umask(0o077)
+        try:
+            listener.bind(self.socket_path)
+        finally:
+            os.umask(umask)
+        listener.listen(16)
+        listener.setblocking(False)
+        return listener
+
+    def _timeout(self) -> Optional[float]:
+        """下一個到期時間（防抖結束或輪詢）之前的秒數；沒有待處理事項時無限等待"""
+        deadlines = []
+        if self._first_event is not None:
+            deadlines.append(min(self._last_event + self.debounce, self._first_event + MAX_DELAY))
+        if isinstance(self.watcher, PollingWatcher):
+            deadlines.append(self.watcher.next_poll)
+        if not deadlines:
+            return None
+        return max(0.0, min(deadlines) - time.monotonic())
+
+    def _tick(self):
+        now = time.monotonic()
+        if isinstance(self.watcher, PollingWatcher) and now >= self.watcher.next_poll:
+            self._poll()
+            self.watcher.next_poll = time.monotonic() + self.watcher.interval
+        if self._first_event is not None and (now - self._last_event >= self.debounce
+                                              or now - self._first_event >= MAX_DELAY):
+            self._revalidate()
+
+    def _note(self, paths: List[str], rescan: bool):
+        """登記變化；與驗證無關的文件（編輯器臨時文件、構建產物等）不觸發驗證"""
+        inventory = self.validator.get_inventory()
+        relevant = [p for p in paths
+                    if os.path.basename(p) in IGNORE_FILE_NAMES or inventory.matches(os.path.basename(p))]
+        if not relevant and not rescan:
+            return
+        self._changed.update(relevant)
+        self._rescan = self._rescan or rescan
+        now = time.monotonic()
+        if self._first_event is None:
+            self._first_event = now
+        self._last_event = now
+
+    def _poll(self):
+        """重新遍歷目錄樹；有變化時換用新清單並立即驗證"""
+        current = self.validator.get_inventory()
+        ignore = self.ignore_factory()
+        inventory = FileInventory(self.project_path, patterns=current.patterns, ignore=ignore).scan()
+        changed = set()
+        for path, entry in inventory.entries.items():
+            old = current.entries.get(path)
+            if old is None or old.size != entry.size or old.mtime_ns != entry.mtime_ns:
+                changed.add(path)
+        changed.update(path for path in current.entries if path not in inventory.entries)
+        if not changed:
+            return
+        self.validator.ignore = ignore
+        self.validator.inventory = inventory
+        self._changed.update(changed)
+        self._revalidate()
+
+    def _revalidate(self):
+        """刷新變化文件的清單條目後重新驗證；未變化的文件由持久緩存直接給出結果"""
+        started = time.monotonic()
+        changed, rescan = self._changed, self._rescan
+        self._changed, self._rescan = set(), False
+        self._first_event = self._last_event = None
+
+        validator = self.validator
+        validator.reset_run_state()
+        if not rescan:
+            inventory = validator.get_inventory()
+            for path in changed:
+                if os.path.basename(path) in IGNORE_FILE_NAMES:
+                    rescan = True
+                    break
+                # 新文件需要按忽略規則和遍歷順序登記
+                if not inventory.refresh(path) and os.path.lexists(path):
+                    rescan = True
+                    break
+        if rescan:
+            self._walk()
+
+        results = validator.collect_results(verbose=False, save_cache=False)
+        if validator.validation_cache is not None:
+            # 已刪除文件的路徑記錄不再保留
+            validator.validation_cache.prune_paths(set(validator.get_inventory().entries))
+
+        self.generation += 1
+        self.last_run = {
+            'generation': self.generation,
+            'finished': results['timestamp'],
+            'changed_files': len(changed),
+            'rescanned': rescan,
+            'duration_ms': round((time.monotonic() - started) * 1000, 1)
+        }
+        results['watch'] = self.last_run
+        # 只保留序列化後的報告，結果對象本身不常駐
+        self.report = json.dumps(results, ensure_ascii=False).encode('utf-8')
+        self.summary = results['summary']
+
+        if validator.metrics_file:
+            validator.metrics.write_prometheus(validator.metrics_file, 'config_validator',
+                                               {'project': os.path.abspath(self.project_path)})
+
+        status = '✅' if self.summary['passed'] else '❌'
+        print(f"{status} [{self.generation}] {len(changed)} changed file(s){' + rescan' if rescan else ''}: "
+              f"{self.summary['total_errors']} errors, {self.summary['total_warnings']} warnings "
+              f"({self.last_run['duration_ms']} ms)")
+
+    def _walk(self):
+        """重建忽略規則和文件清單，並使監視集合與遍歷到的目錄一致"""
+        validator = self.validator
+        validator.ignore = self.ignore_factory()
+        validator.inventory = None
+        inventory = validator.get_inventory()
+        try:
+            self.watcher.sync(inventory.directories)
+        except OSError as e:
+            print(f"⚠️ Cannot watch all {len(inventory.directories)} directories ({e}), "
+                  f"polling every {self.poll_interval}s")
+            self._selector.unregister(self.watcher.fd)
+            self.watcher.close()
+            self.watcher = PollingWatcher(self.poll_interval)
+
+    def _accept(self, listener: socket.socket):
+        """處理一個客戶端：讀取一行命令，返回一個JSON文檔後關閉連接"""
+        try:
+            conn, _ = listener.accept()
+        except BlockingIOError:
+            return
+        with conn:
+            conn.settimeout(1.0)
+            try:
+                request = b''
+                while b'\n' not in request and len(request) < _MAX_REQUEST:
+                    data = conn.recv(_MAX_REQUEST)
+                    if not data:
+                        break
+                    request += data
+                conn.sendall(self._respond(request.decode('utf-8', 'replace').strip()))
+            except OSError:
+                # 客戶端超時或提前斷開
+                pass
+
+    def _respond(self, command: str) -> bytes:
+        if command == 'report':
+            return self.report + b'\n'
+        if command == 'sync':
+            # inotify事件在寫入時即已入隊：讀完隊列後立即驗證，不等待防抖
+            if isinstance(self.watcher, InotifyWatcher):
+                self._note(*self.watcher.read())
+            else:
+                self._poll()
+            if self._first_event is not None:
+                self._revalidate()
+            command = 'summary'
+
+        if command == 'ping':
+            response = {'ok': True, 'pid': os.getpid()}
+        elif command == 'summary':
+            response = {'generation': self.generation, 'pending': self._first_event is not None,
+                        'summary': self.summary}
+        elif command == 'status':
+            response = {
+                'project': os.path.abspath(self.project_path),
+                'pid': os.getpid(),
+                'mode': self.watcher.mode,
+                'watches': self.watcher.watch_count(),
+                'files': len(self.validator.get_inventory().entries),
+                'pending_files': len(self._changed),
+                'last_run': self.last_run,
+                'report_bytes': len(self.report),
+                'peak_rss_bytes': rusage_peak_rss(resource.getrusage(resource.RUSAGE_SELF))
+            }
+        elif command == 'stop':
+            self.running = False
+            response = {'ok': True}
+        else:
+            response = {'error': f'Unknown command: {command!r}', 'commands': list(COMMANDS)}
+        return json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n'
+
+
+def query(socket_path: str, command: str, timeout: float = 60.0) -> bytes:
+    """向守護進程發送一條命令並返回原始響應"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall(command.encode('utf-8') + b'\n')
+        chunks = []
+        while True:
+            data = sock.recv(1 << 16)
+            if not data:
+                break
+            chunks.append(data)
+    return b''.join(chunks)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description='Query a config_validator.py --watch daemon (exit status 1 when validation fails)')
+    parser.add_argument('project_path', nargs='?', default='.')
+    parser.add_argument('command', nargs='?', choices=COMMANDS, default='sync',
+                        help='sync (default) applies pending file changes before answering')
+    parser.add_argument('--socket', help=f'Socket path (default: <project>/reports/config/{SOCKET_NAME})')
+    args = parser.parse_args()
+
+    socket_path = args.socket or os.path.join(args.project_path, 'reports', 'config', SOCKET_NAME)
+    try:
+        response = query(socket_path, args.command)
+    except OSError as e:
+        print(f"❌ No watch daemon on {socket_path} ({e}); start one with config_validator.py --watch",
+              file=sys.stderr)
+        sys.exit(2)
+
+    sys.stdout.write(response.decode('utf-8'))
+    if args.command in ('summary', 'sync'):
+        summary = json.loads(response).get('summary') or {}
+        sys.exit(0 if summary.get('passed') else 1)